@@ -0,0 +1,62 @@
+"""add_screener_snapshot
+
+Revision ID: h2b3c4d5e6f7
+Revises: fix_indicator_precision_v2
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'h2b3c4d5e6f7'
+down_revision: Union[str, Sequence[str], None] = 'fix_indicator_precision_v2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+NUMERIC_COLUMNS = [
+    'close',
+    'sma_10', 'sma_21', 'sma_50', 'sma_150', 'sma_200', 'sma_30w', 'sma_40w', 'ema10', 'ema21',
+    'fifty_two_week_high', 'fifty_two_week_low', 'percent_off_52w_high', 'percent_off_52w_low',
+    'rsi_14', 'cci', 'aroon_up', 'aroon_down',
+    'sma_200_1m_ago', 'sma_200_2m_ago', 'sma_200_3m_ago', 'sma_200_4m_ago', 'sma_200_5m_ago',
+]
+
+CONDITION_COLUMNS = [
+    'sma50_gt_sma150', 'sma50_gt_sma200', 'sma150_gt_sma200', 'sma200_gt_sma200_1m_ago',
+    'price_gt_sma18', 'ema10_gt_sma50', 'ema10_gt_sma200', 'ema21_gt_sma50', 'ema21_gt_sma200',
+    'sma200_gt_sma200_2m_ago', 'sma200_gt_sma200_3m_ago', 'sma200_gt_sma200_4m_ago', 'sma200_gt_sma200_5m_ago',
+]
+
+SCREENER_COLUMNS = [
+    'trend_1_month', 'trend_2_months', 'trend_4_months',
+    'trend_5_months', 'trend_5_months_wide', 'power_play',
+]
+
+
+def upgrade() -> None:
+    """Create screener_snapshot (one row per symbol for the latest stock_indicators date)."""
+    op.create_table(
+        'screener_snapshot',
+        sa.Column('symbol', sa.String(length=20), primary_key=True),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('company_name', sa.String(length=255), nullable=True),
+        sa.Column('rs_rating', sa.Integer(), nullable=True),
+        *[sa.Column(col, sa.Numeric(12, 4), nullable=True) for col in NUMERIC_COLUMNS],
+        *[sa.Column(col, sa.Boolean(), nullable=True) for col in CONDITION_COLUMNS],
+        *[sa.Column(col, sa.Boolean(), nullable=False, server_default=sa.false()) for col in SCREENER_COLUMNS],
+        sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.func.now()),
+    )
+    for col in SCREENER_COLUMNS:
+        op.create_index(f'idx_screener_snapshot_{col}', 'screener_snapshot', [col, 'symbol'])
+
+
+def downgrade() -> None:
+    """Drop screener_snapshot."""
+    for col in SCREENER_COLUMNS:
+        op.drop_index(f'idx_screener_snapshot_{col}', table_name='screener_snapshot')
+    op.drop_table('screener_snapshot')
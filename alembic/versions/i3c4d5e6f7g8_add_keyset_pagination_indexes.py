@@ -0,0 +1,35 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: i3c4d5e6f7g8
+Revises: h2b3c4d5e6f7
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'i3c4d5e6f7g8'
+down_revision: Union[str, Sequence[str], None] = 'h2b3c4d5e6f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Indexes matching the keyset (cursor) pagination order of the latest-date routes."""
+    # /rs-v2/latest: ORDER BY rs_rating DESC, symbol لتاريخ واحد
+    op.create_index(
+        'idx_rs_daily_v2_date_rating_symbol', 'rs_daily_v2',
+        ['date', sa.text('rs_rating DESC'), 'symbol'],
+    )
+    # /technical-screener/screener و /screeners/* (الاستعلام المباشر): ORDER BY symbol لتاريخ واحد
+    op.create_index('idx_stock_indicators_date_symbol', 'stock_indicators', ['date', 'symbol'])
+
+
+def downgrade() -> None:
+    """Drop keyset pagination indexes."""
+    op.drop_index('idx_stock_indicators_date_symbol', table_name='stock_indicators')
+    op.drop_index('idx_rs_daily_v2_date_rating_symbol', table_name='rs_daily_v2')
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Query
 from app.core.redis import redis_cache
+from app.core.cache_versions import ALL_DATASETS, bump_versions
 
 import asyncio
 
@@ -7,9 +8,13 @@ router = APIRouter(prefix="/cache", tags=["Cache Management"])
 
 @router.post("/clear/all")
 async def clear_all_cache():
-    """مسح كل الكاش"""
+    """
+    مسح كل الكاش: إصدار جديد لكل مجموعات البيانات بدل FLUSHALL
+    (FLUSHALL كان يحذف أيضاً توكنات المستخدمين وتوكنات الاستعادة والتحقق)
+    """
     try:
-        await redis_cache.flush_all()
+        if not await bump_versions(*ALL_DATASETS):
+            raise RuntimeError("Redis غير متاح")
         await stock_cache.clear_all_cache()
         return {"message": "✅ تم مسح كل الكاش بنجاح"}
     except Exception as e:
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 import json
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.financials import IncomeStatement, BalanceSheet, CashFlow
 
 router = APIRouter(prefix="/financials", tags=["Financials"])
@@ -13,7 +14,7 @@ async def get_financial_data_from_db(
     symbol: str,
     country: str = Query("Saudi Arabia", description="البلد"),
     period: str = Query("annual", regex="^(annual|quarterly)$", description="الفترة: annual or quarterly"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     جلب البيانات المالية من قاعدة البيانات المحلية
@@ -32,23 +33,29 @@ async def get_financial_data_from_db(
             cashflow_filter = CashFlow.quarter.isnot(None)
         
         # جلب البيانات من قاعدة البيانات
-        income_data = db.query(IncomeStatement).filter(
-            IncomeStatement.symbol == symbol,
-            IncomeStatement.country == country,
-            income_filter
-        ).order_by(IncomeStatement.fiscal_date.desc()).limit(6).all()
+        income_data = (await db.execute(
+            select(IncomeStatement).where(
+                IncomeStatement.symbol == symbol,
+                IncomeStatement.country == country,
+                income_filter
+            ).order_by(IncomeStatement.fiscal_date.desc()).limit(6)
+        )).scalars().all()
         
-        balance_data = db.query(BalanceSheet).filter(
-            BalanceSheet.symbol == symbol,
-            BalanceSheet.country == country,
-            balance_filter
-        ).order_by(BalanceSheet.fiscal_date.desc()).limit(6).all()
+        balance_data = (await db.execute(
+            select(BalanceSheet).where(
+                BalanceSheet.symbol == symbol,
+                BalanceSheet.country == country,
+                balance_filter
+            ).order_by(BalanceSheet.fiscal_date.desc()).limit(6)
+        )).scalars().all()
         
-        cashflow_data = db.query(CashFlow).filter(
-            CashFlow.symbol == symbol,
-            CashFlow.country == country,
-            cashflow_filter
-        ).order_by(CashFlow.fiscal_date.desc()).limit(6).all()
+        cashflow_data = (await db.execute(
+            select(CashFlow).where(
+                CashFlow.symbol == symbol,
+                CashFlow.country == country,
+                cashflow_filter
+            ).order_by(CashFlow.fiscal_date.desc()).limit(6)
+        )).scalars().all()
         
         print(f"📈 نتائج الجلب: دخل={len(income_data)}, ميزانية={len(balance_data)}, تدفقات={len(cashflow_data)}")
         
@@ -6,6 +6,8 @@ from pydantic import BaseModel
 from datetime import date
 
 from app.core.database import get_db
+from app.core.cache_versions import INDUSTRY_GROUPS
+from app.core.route_cache import cached_route
 from app.models.industry_group import IndustryGroupHistory
 
 router = APIRouter()
@@ -13,6 +15,7 @@ router = APIRouter()
 from app.schemas.industry_group import IndustryGroupResponse, IndustryGroupStockResponse
 
 @router.get("/latest", response_model=List[IndustryGroupResponse])
+@cached_route("industry_groups:latest", datasets=(INDUSTRY_GROUPS,), response_model=List[IndustryGroupResponse])
 def get_latest_industry_groups(
     db: Session = Depends(get_db)
 ):
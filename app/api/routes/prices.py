@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select
 from typing import List, Optional
 from datetime import date
 
-from app.core.database import get_db
+from app.core.database import get_async_db
+from app.core.cache_versions import PRICES, TECHNICALS
+from app.core.route_cache import cached_route
 from app.models.price import Price
 from app.schemas.price import PriceResponse, LatestPricesResponse
+from app.services import price_history
 
 router = APIRouter(prefix="/prices", tags=["Prices"])
 
@@ -17,136 +20,76 @@ from pathlib import Path
 @router.get("/history/{symbol}")
 async def get_price_history(
     symbol: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     limit: int = Query(10000, le=50000),
+    format: Optional[str] = Query(None, regex="^(json|columnar|msgpack|arrow)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields (e.g. open,high,low,close,rsi_14). 'time' is always included"),
+    from_date: Optional[date] = Query(None, alias="from", description="First bar date (inclusive)"),
+    to_date: Optional[date] = Query(None, alias="to", description="Last bar date (inclusive)"),
+    last: Optional[int] = Query(None, ge=1, le=50000, description="Return only the most recent N bars"),
+    max_points: Optional[int] = Query(None, ge=10, le=10000, description="Downsample to at most N bars (OHLCV buckets + LTTB for indicators)"),
 ):
     """
     Get historical OHLCV + all oscillator data for a symbol.
     prices table: pure OHLCV
     stock_indicators: everything else (RSI, MCAs, SMA, 52w, etc.)
+
+    format (or Accept header):
+    - json (default): list of row objects
+    - columnar: one JSON array per field
+    - msgpack (application/x-msgpack): columnar payload as MessagePack
+    - arrow (application/vnd.apache.arrow.stream): Arrow IPC stream
+
+    fields / from / to / last limit what is read from the DB, so each chart panel
+    only pays for the series and range it draws.
+    max_points downsamples long ranges server-side (cached per symbol/range/resolution).
     """
     try:
-        from app.models.stock_indicators import StockIndicator
+        fmt = price_history.resolve_format(format, request.headers.get('accept'))
+        if not price_history.format_available(fmt):
+            raise HTTPException(status_code=406, detail=f"Format '{fmt}' is not available on this server")
 
-        results = (
-            db.query(Price, StockIndicator)
-            .outerjoin(
-                StockIndicator,
-                (Price.symbol == StockIndicator.symbol) & (Price.date == StockIndicator.date)
+        try:
+            names = price_history.resolve_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        if max_points:
+            cache_key = await price_history.downsample_cache_key(
+                symbol, names, from_date, to_date, last, limit, max_points
             )
-            .filter(Price.symbol == symbol)
-            .order_by(asc(Price.date))  # ترتيب تصاعدي من الأقدم للأحدث
-            .limit(limit)
-            .all()
-        )
+            columns = price_history.get_downsampled(cache_key)
+            if columns is None:
+                names, rows = await price_history.fetch_history(
+                    db, symbol, limit, names=names, start=from_date, end=to_date, last=last
+                )
+                if not rows:
+                    raise HTTPException(status_code=404, detail=f"No price history found for symbol {symbol}")
+                columns = price_history.downsample(price_history.rows_to_columns(names, rows), max_points)
+                price_history.set_downsampled(cache_key, columns)
+
+            if fmt == 'json':
+                data = price_history.columns_to_dicts(columns)
+                return {"symbol": symbol, "count": len(data), "data": data}
+        else:
+            names, rows = await price_history.fetch_history(
+                db, symbol, limit, names=names, start=from_date, end=to_date, last=last
+            )
+
+            if not rows:
+                raise HTTPException(status_code=404, detail=f"No price history found for symbol {symbol}")
+
+            if fmt == 'json':
+                data = price_history.rows_to_dicts(names, rows)
+                return {"symbol": symbol, "count": len(data), "data": data}
 
-        if not results:
-            raise HTTPException(status_code=404, detail=f"No price history found for symbol {symbol}")
-
-        def f(val):
-            return float(val) if val is not None else None
-
-        data = []
-        for price, ind in results:
-            data.append({
-                "time":   price.date.isoformat(),
-                "open":   f(price.open),
-                "high":   f(price.high),
-                "low":    f(price.low),
-                "close":  f(price.close),
-                "volume": int(price.volume_traded) if price.volume_traded is not None else 0,
-                # ── Standard SMAs (from stock_indicators) ──────────────────
-                "sma_10":  f(ind.sma_10)  if ind else None,
-                "sma_21":  f(ind.sma_21)  if ind else None,
-                "sma_50":  f(ind.sma_50)  if ind else None,
-                "sma_150": f(ind.sma_150) if ind else None,
-                "sma_200": f(ind.sma_200) if ind else None,
-                # ── PineScript-exact EMAs (from stock_indicators) ───────────
-                "ema_10":  f(ind.ema10) if ind else None,
-                "ema_21":  f(ind.ema21) if ind else None,
-                # ── Historical 200MA (from stock_indicators) ───────────────
-                "sma_200_1m_ago": f(ind.sma_200_1m_ago) if ind else None,
-                "sma_200_2m_ago": f(ind.sma_200_2m_ago) if ind else None,
-                "sma_200_3m_ago": f(ind.sma_200_3m_ago) if ind else None,
-                "sma_200_4m_ago": f(ind.sma_200_4m_ago) if ind else None,
-                "sma_200_5m_ago": f(ind.sma_200_5m_ago) if ind else None,
-                # ── Weekly SMAs (from stock_indicators) ────────────────────
-                "sma_30w": f(ind.sma_30w) if ind else None,
-                "sma_40w": f(ind.sma_40w) if ind else None,
-                # ── Additional SMAs (from stock_indicators) ────────────────
-                "sma_3": f(ind.sma3_rsi3) if ind else None,
-                "ema_20_sma3": f(ind.ema20_sma3) if ind else None,
-                # ── Price vs SMA % (from stock_indicators) ──────────────────
-                "price_vs_sma_10_percent": f(ind.price_vs_sma_10_percent) if ind else None,
-                "price_vs_sma_21_percent": f(ind.price_vs_sma_21_percent) if ind else None,
-                "price_vs_sma_50_percent": f(ind.price_vs_sma_50_percent) if ind else None,
-                "price_vs_sma_150_percent": f(ind.price_vs_sma_150_percent) if ind else None,
-                "price_vs_sma_200_percent": f(ind.price_vs_sma_200_percent) if ind else None,
-                # ── 52-Week & Volume Stats ──────────────────────────────────
-                "fifty_two_week_high": f(ind.fifty_two_week_high) if ind else None,
-                "fifty_two_week_low":  f(ind.fifty_two_week_low)  if ind else None,
-                "average_volume_50":   f(ind.average_volume_50)   if ind else None,
-                "vol_diff_50_percent": f(ind.vol_diff_50_percent) if ind else None,
-                "percent_off_52w_high": f(ind.percent_off_52w_high) if ind else None,
-                "percent_off_52w_low":  f(ind.percent_off_52w_low)  if ind else None,
-                # ── RSI Daily ──────────────────────────────────────────────
-                "rsi_14":    f(ind.rsi_14)    if ind else None,
-                "sma9_rsi":  f(ind.sma9_rsi)  if ind else None,
-                "wma45_rsi": f(ind.wma45_rsi) if ind else None,
-                # ── RSI Weekly ─────────────────────────────────────────────
-                "rsi_w":       f(ind.rsi_w)       if ind else None,
-                "sma9_rsi_w":  f(ind.sma9_rsi_w)  if ind else None,
-                "wma45_rsi_w": f(ind.wma45_rsi_w) if ind else None,
-                # ── CCI Daily ──────────────────────────────────────────────
-                "cci":       f(ind.cci)       if ind else None,
-                "cci_ema20": f(ind.cci_ema20) if ind else None,
-                # ── CCI Weekly ─────────────────────────────────────────────
-                "cci_w":       f(ind.cci_w)       if ind else None,
-                "cci_ema20_w": f(ind.cci_ema20_w) if ind else None,
-                # ── CFG Daily ──────────────────────────────────────────────
-                "cfg":       f(ind.cfg_daily) if ind else None,
-                "cfg_sma4":  f(ind.cfg_sma4)  if ind else None,
-                "cfg_ema45": f(ind.cfg_ema45) if ind else None,
-                # ── CFG Weekly ─────────────────────────────────────────────
-                "cfg_w":       f(ind.cfg_w)       if ind else None,
-                "cfg_sma4_w":  f(ind.cfg_sma4_w)  if ind else None,
-                "cfg_ema45_w": f(ind.cfg_ema45_w) if ind else None,
-                # ── THE.NUMBER Daily ───────────────────────────────────────
-                "the_number":    f(ind.the_number)    if ind else None,
-                "the_number_hl": f(ind.the_number_hl) if ind else None,
-                "the_number_ll": f(ind.the_number_ll) if ind else None,
-                # ── THE.NUMBER Weekly ──────────────────────────────────────
-                "the_number_w":    f(ind.the_number_w)    if ind else None,
-                "the_number_hl_w": f(ind.the_number_hl_w) if ind else None,
-                "the_number_ll_w": f(ind.the_number_ll_w) if ind else None,
-                # ── STAMP Daily ────────────────────────────────────────────
-                "stamp_s9rsi":   f(ind.stamp_s9rsi)   if ind else None,
-                "stamp_e45cfg":  f(ind.stamp_e45cfg)  if ind else None,
-                "stamp_e45rsi":  f(ind.stamp_e45rsi)  if ind else None,
-                "stamp_e20sma3": f(ind.stamp_e20sma3) if ind else None,
-                # ── STAMP Weekly ───────────────────────────────────────────
-                "stamp_s9rsi_w":  f(ind.stamp_s9rsi_w)  if ind else None,
-                "stamp_e45cfg_w": f(ind.stamp_e45cfg_w) if ind else None,
-                "stamp_e45rsi_w": f(ind.stamp_e45rsi_w) if ind else None,
-                "stamp_e20sma3_w": f(ind.stamp_e20sma3_w) if ind else None,
-                # ── Price MAs from indicators ──────────────────────────────
-                "sma4":  f(ind.sma4)  if ind else None,
-                "sma9":  f(ind.sma9_close) if ind else None,
-                "sma18": f(ind.sma18) if ind else None,
-                "wma45_close": f(ind.wma45_close) if ind else None,
-                # ── Weekly price MAs ─────────────────────────────────────
-                "sma4_w":  f(ind.sma4_w)  if ind else None,
-                "sma9_w":  f(ind.sma9_w)  if ind else None,
-                "sma18_w": f(ind.sma18_w) if ind else None,
-                "wma45_close_w": f(ind.wma45_close_w) if ind else None,
-                # ── Aroon ─────────────────────────────────────────────────
-                "aroon_up":   f(ind.aroon_up)   if ind else None,
-                "aroon_down": f(ind.aroon_down) if ind else None,
-                "aroon_up_w":   f(ind.aroon_up_w)   if ind else None,
-                "aroon_down_w": f(ind.aroon_down_w) if ind else None,
-            })
-
-        return {"symbol": symbol, "count": len(data), "data": data}
+            columns = price_history.rows_to_columns(names, rows)
+
+        return Response(
+            content=price_history.encode_columns(fmt, symbol, columns),
+            media_type=price_history.FORMAT_MEDIA_TYPES[fmt],
+        )
 
     except HTTPException:
         raise
@@ -156,8 +99,9 @@ async def get_price_history(
 
 
 @router.get("/latest", response_model=LatestPricesResponse)
+@cached_route("prices:latest", datasets=(PRICES, TECHNICALS), response_model=LatestPricesResponse)
 async def get_latest_prices(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     limit: int = Query(500, le=1000)
 ):
     """
@@ -166,7 +110,9 @@ async def get_latest_prices(
     """
     try:
         # 1. Find the latest date
-        latest_date_row = db.query(Price.date).order_by(desc(Price.date)).first()
+        latest_date_row = (await db.execute(
+            select(Price.date).order_by(desc(Price.date)).limit(1)
+        )).first()
         
         if not latest_date_row:
             return LatestPricesResponse(date=date.today(), count=0, data=[])
@@ -174,7 +120,9 @@ async def get_latest_prices(
         latest_date = latest_date_row[0]
         
         # 2. Query data for that date
-        results = db.query(Price).filter(Price.date == latest_date).limit(limit).all()
+        results = (await db.execute(
+            select(Price).where(Price.date == latest_date).limit(limit)
+        )).scalars().all()
 
         # 3. Load TradingView Symbols Mapping
         tv_mapping = {}
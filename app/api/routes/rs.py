@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select
 from typing import List, Optional
 from datetime import date
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.models.rs_daily import RSDaily
 from app.schemas.rs import RSResponse, RSLatestResponse
 from app.core.limiter import limiter
@@ -18,14 +18,16 @@ async def get_latest_rs(
     request: Request,
     min_rs: Optional[int] = Query(None, ge=0, le=99, description="الحد الأدنى لـ RS Rating"),
     limit: int = Query(100, le=500),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     الحصول على آخر RS Rating لكل الأسهم مع التقييم السابق.
     """
     try:
         # 1. معرفة آخر تاريخين متاحين
-        dates_row = db.query(RSDaily.date).distinct().order_by(desc(RSDaily.date)).limit(2).all()
+        dates_row = (await db.execute(
+            select(RSDaily.date).distinct().order_by(desc(RSDaily.date)).limit(2)
+        )).all()
         
         if not dates_row:
             return RSLatestResponse(data=[], total_count=0, date=date.today())
@@ -36,20 +38,22 @@ async def get_latest_rs(
         # 2. الحصول على التقييمات السابقة (إذا وجدت)
         prev_ratings = {}
         if prev_date:
-            prev_results = db.query(RSDaily.symbol, RSDaily.rs_rating).filter(RSDaily.date == prev_date).all()
+            prev_results = (await db.execute(
+                select(RSDaily.symbol, RSDaily.rs_rating).where(RSDaily.date == prev_date)
+            )).all()
             prev_ratings = {r.symbol: r.rs_rating for r in prev_results}
         
         # 3. بناء الاستعلام للبيانات الحالية
-        query = db.query(RSDaily).filter(RSDaily.date == latest_date)
+        query = select(RSDaily).where(RSDaily.date == latest_date)
         
         if min_rs is not None:
-            query = query.filter(RSDaily.rs_rating >= min_rs)
+            query = query.where(RSDaily.rs_rating >= min_rs)
         
         # الترتيب حسب RS Rating بشكل افتراضي
         query = query.order_by(desc(RSDaily.rs_rating))
         
         # تنفيذ الاستعلام مع الحد الأقصى
-        results = query.limit(limit).all()
+        results = (await db.execute(query.limit(limit))).scalars().all()
         
         # 4. دمج التقييمات السابقة
         for r in results:
@@ -73,22 +77,22 @@ async def get_rs_history(
     symbol: str,
     from_date: Optional[date] = Query(None),
     to_date: Optional[date] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     الحصول على تاريخ RS لسهم معين.
     """
     symbol_str = str(symbol).strip()
     
-    query = db.query(RSDaily).filter(RSDaily.symbol == symbol_str)
+    query = select(RSDaily).where(RSDaily.symbol == symbol_str)
     
     if from_date:
-        query = query.filter(RSDaily.date >= from_date)
+        query = query.where(RSDaily.date >= from_date)
     if to_date:
-        query = query.filter(RSDaily.date <= to_date)
+        query = query.where(RSDaily.date <= to_date)
     
     # ترتيب حسب التاريخ
-    results = query.order_by(RSDaily.date).all()
+    results = (await db.execute(query.order_by(RSDaily.date))).scalars().all()
     
     return results or []
 
@@ -101,29 +105,31 @@ async def advanced_screener(
     min_rank_6m: Optional[int] = Query(None, description="Minimum 6 Month Rank"),
     sort_by: str = Query("rs_rating", regex="^(rs_rating|rank_3m|rank_6m|rank_12m|return_3m|return_12m)$"),
     limit: int = Query(50, le=200),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     فلترة متقدمة للأسهم بناءً على الرتب والفترات
     """
     # آخر تاريخ
-    latest_date_row = db.query(RSDaily.date).order_by(desc(RSDaily.date)).first()
+    latest_date_row = (await db.execute(
+        select(RSDaily.date).order_by(desc(RSDaily.date)).limit(1)
+    )).first()
     if not latest_date_row:
         return RSLatestResponse(data=[], total_count=0, date=date.today())
     
     latest_date = latest_date_row[0]
     
-    query = db.query(RSDaily).filter(RSDaily.date == latest_date)
+    query = select(RSDaily).where(RSDaily.date == latest_date)
     
     # تطبيق الفلاتر
     if min_rs > 0:
-        query = query.filter(RSDaily.rs_rating >= min_rs)
+        query = query.where(RSDaily.rs_rating >= min_rs)
     
     if min_rank_3m is not None:
-        query = query.filter(RSDaily.rank_3m >= min_rank_3m)
+        query = query.where(RSDaily.rank_3m >= min_rank_3m)
         
     if min_rank_6m is not None:
-        query = query.filter(RSDaily.rank_6m >= min_rank_6m)
+        query = query.where(RSDaily.rank_6m >= min_rank_6m)
     
     # الترتيب
     if hasattr(RSDaily, sort_by):
@@ -132,7 +138,7 @@ async def advanced_screener(
     else:
         query = query.order_by(desc(RSDaily.rs_rating))
         
-    results = query.limit(limit).all()
+    results = (await db.execute(query.limit(limit))).scalars().all()
     
     return RSLatestResponse(
         data=results,
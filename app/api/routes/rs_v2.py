@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import desc, text
 from typing import List, Optional
 from datetime import date
 from pydantic import BaseModel
 
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.limiter import limiter
+from app.core.cache_versions import IBD, RS
+from app.core.pagination import CURSOR_DESCRIPTION, INCLUDE_TOTAL_DESCRIPTION, decode_cursor, encode_cursor
+from app.core.route_cache import cached_route
 from fastapi import Request
 
 router = APIRouter(prefix="/rs-v2", tags=["Relative Strength V2"])
@@ -41,8 +44,9 @@ class RSV2Item(BaseModel):
 
 class RSV2LatestResponse(BaseModel):
     data: List[RSV2Item]
-    total_count: int
+    total_count: Optional[int] = None  # None في صفحات الـ cursor (إلا مع include_total)
     date: date
+    next_cursor: Optional[str] = None
 
 
 class RSV2StatsResponse(BaseModel):
@@ -55,6 +59,7 @@ class RSV2StatsResponse(BaseModel):
 
 @router.get("/latest", response_model=RSV2LatestResponse)
 @limiter.limit("200/minute")
+@cached_route("rs_v2:latest", datasets=(RS, IBD), response_model=RSV2LatestResponse)
 async def get_latest_rs_v2(
     request: Request,
     min_rs: Optional[int] = Query(None, ge=0, le=99, description="Minimum RS Rating"),
@@ -62,14 +67,20 @@ async def get_latest_rs_v2(
     industry: Optional[str] = Query(None, description="Filter by industry group"),
     limit: int = Query(100, le=1000),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(False, description=INCLUDE_TOTAL_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get latest RS ratings from the V2 table (new calculation method).
+    Ordered by rs_rating DESC (NULLs first, as before) then symbol - pass next_cursor to get the next page.
     """
+    after = decode_cursor(cursor, 2) if cursor else None
+    if after is not None and after[0] is not None and not isinstance(after[0], int):
+        raise HTTPException(status_code=400, detail="❌ cursor غير صالح")
     try:
         # Get latest date - use explicit date casting to handle timestamp/date conversion
-        result = db.execute(text("SELECT COALESCE(MAX(date), CURRENT_DATE)::date as latest_date FROM rs_daily_v2"))
+        result = await db.execute(text("SELECT COALESCE(MAX(date), CURRENT_DATE)::date as latest_date FROM rs_daily_v2"))
         latest_date = result.scalar()
         
         if not latest_date:
@@ -99,12 +110,26 @@ async def get_latest_rs_v2(
             query += " AND industry_group ILIKE :industry"
             params["industry"] = f"%{industry}%"
         
-        query += " ORDER BY rs_rating DESC LIMIT :limit OFFSET :offset"
-        params["limit"] = limit
-        params["offset"] = offset
+        if after is not None:
+            # الصف التالي لـ (rs_rating, symbol) بنفس ترتيب ORDER BY (DESC يضع NULL أولاً)
+            params["after_symbol"] = after[1]
+            if after[0] is None:
+                query += " AND ((rs_rating IS NULL AND symbol > :after_symbol) OR rs_rating IS NOT NULL)"
+            else:
+                query += " AND (rs_rating < :after_rs OR (rs_rating = :after_rs AND symbol > :after_symbol))"
+                params["after_rs"] = after[0]
+        
+        # صف إضافي لمعرفة وجود صفحة تالية بدون COUNT
+        query += " ORDER BY rs_rating DESC, symbol LIMIT :limit"
+        params["limit"] = limit + 1
+        if after is None and offset:
+            query += " OFFSET :offset"
+            params["offset"] = offset
         
-        result = db.execute(text(query), params)
+        result = await db.execute(text(query), params)
         rows = result.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
         
         data = [RSV2Item(
             symbol=row[0],
@@ -128,12 +153,16 @@ async def get_latest_rs_v2(
             acc_dis_rating=row[18]
         ) for row in rows]
         
-        # Get total count
-        count_query = "SELECT COUNT(*) FROM rs_daily_v2 WHERE CAST(date AS DATE) = CAST(:latest_date AS DATE)"
-        count_result = db.execute(text(count_query), {"latest_date": latest_date})
-        total_count = count_result.scalar()
+        next_cursor = encode_cursor(rows[-1][2], rows[-1][0]) if has_more and rows else None
+        
+        # Get total count (الصفحة الأولى فقط - الرد كله في route cache حتى تحديث RS)
+        total_count = None
+        if after is None or include_total:
+            count_query = "SELECT COUNT(*) FROM rs_daily_v2 WHERE CAST(date AS DATE) = CAST(:latest_date AS DATE)"
+            count_result = await db.execute(text(count_query), {"latest_date": latest_date})
+            total_count = count_result.scalar()
         
-        return RSV2LatestResponse(data=data, total_count=total_count, date=latest_date)
+        return RSV2LatestResponse(data=data, total_count=total_count, date=latest_date, next_cursor=next_cursor)
         
     except Exception as e:
         import traceback
@@ -149,7 +178,7 @@ async def get_rs_history_v2(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     limit: int = Query(365, le=10000),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get RS history for a specific symbol from V2 table.
@@ -176,7 +205,7 @@ async def get_rs_history_v2(
         query += " ORDER BY date DESC LIMIT :limit"
         params["limit"] = limit
         
-        result = db.execute(text(query), params)
+        result = await db.execute(text(query), params)
         rows = result.fetchall()
         
         data = [{
@@ -208,7 +237,7 @@ async def get_rs_history_v2(
 @limiter.limit("60/minute")
 async def get_rs_stats_v2(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get statistics about the RS V2 data.
@@ -223,7 +252,7 @@ async def get_rs_stats_v2(
                 AVG(rs_rating) as avg_rs
             FROM rs_daily_v2
         """
-        result = db.execute(text(stats_query))
+        result = await db.execute(text(stats_query))
         row = result.fetchone()
         
         return RSV2StatsResponse(
@@ -244,7 +273,7 @@ async def get_rs_stats_v2(
 @limiter.limit("30/minute")
 async def get_industries_v2(
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get all unique industry groups.
@@ -258,7 +287,7 @@ async def get_industries_v2(
             GROUP BY industry_group
             ORDER BY count DESC
         """
-        result = db.execute(text(query))
+        result = await db.execute(text(query))
         rows = result.fetchall()
         
         return {"industries": [{"name": row[0], "count": row[1]} for row in rows]}
@@ -273,7 +302,7 @@ async def get_top_movers_v2(
     request: Request,
     days: int = Query(5, ge=1, le=30),
     limit: int = Query(20, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get stocks with biggest RS changes over specified days.
@@ -288,7 +317,7 @@ async def get_top_movers_v2(
             prev AS (
                 SELECT symbol, rs_rating as prev_rs
                 FROM rs_daily_v2
-                WHERE date = (SELECT MAX(date) - :days FROM rs_daily_v2)
+                WHERE date = (SELECT MAX(date) - CAST(:days AS INTEGER) FROM rs_daily_v2)
             )
             SELECT l.symbol, l.current_rs, p.prev_rs, (l.current_rs - p.prev_rs) as change
             FROM latest l
@@ -296,7 +325,7 @@ async def get_top_movers_v2(
             ORDER BY ABS(l.current_rs - p.prev_rs) DESC
             LIMIT :limit
         """
-        result = db.execute(text(query), {"days": days, "limit": limit})
+        result = await db.execute(text(query), {"days": days, "limit": limit})
         rows = result.fetchall()
         
         return {
@@ -14,7 +14,9 @@ import os
 import json
 
 from app.core.database import get_db
+from app.core.cache_versions import bump_versions, financials_dataset, versioned_key
 from app.core.redis import redis_cache
+from app.core.route_cache import json_response, render_json
 from app.models.scraped_reports import Company, FinancialReport, ExcelReport, PeriodType, ReportType
 from app.schemas.scraped_financials import (
     IngestRequest, IngestResponse, BulkIngestRequest, BulkIngestResponse,
@@ -106,13 +108,8 @@ async def ingest_scraped_data(
         
         db.commit()
         
-        # 3. Invalidate Redis cache for this symbol
-        cache_keys = [
-            f"scraper:financials:{request.company_symbol}",
-            f"scraper:table:{request.company_symbol}:*"
-        ]
-        for key in cache_keys:
-            await redis_cache.delete(key)
+        # 3. Invalidate Redis cache for this symbol (financials + all table variants)
+        await bump_versions(financials_dataset(request.company_symbol))
         
         print(f"✅ Ingested {len(request.reports)} reports for {request.company_symbol} (Created: {created_count}, Updated: {updated_count})")
         
@@ -171,11 +168,15 @@ async def get_historical_financials(
     Groups data by report type (balance_sheets, income_statements, cash_flows).
     """
     try:
-        # Check Redis cache first
-        cache_key = f"scraper:financials:{symbol}"
-        cached = await redis_cache.get(cache_key)
-        if cached:
-            return cached
+        # Check Redis cache first (versioned per symbol - bumped on ingest)
+        cache_key = await versioned_key(
+            f"scraper:financials:{symbol}:{period_type.value if period_type else 'all'}",
+            [financials_dataset(symbol)]
+        )
+        # الإصدار جزء من المفتاح → نسخة local_cache آمنة (تُحذف أيضاً عند زيادته)
+        cached = await redis_cache.get(cache_key, datasets=[financials_dataset(symbol)]) if cache_key else None
+        if isinstance(cached, bytes):
+            return json_response(cached)
         
         # Get company info
         company = db.query(Company).filter(Company.symbol == symbol).first()
@@ -218,10 +219,12 @@ async def get_historical_financials(
             cash_flows=cash_flows
         )
         
-        # Cache for 1 hour
-        await redis_cache.set(cache_key, response.model_dump_json(), expire=3600)
+        # Cache the final response bytes for 1 hour (hits skip model validation and encoding)
+        body = render_json(response.model_dump(mode='json', by_alias=True))
+        if cache_key:
+            await redis_cache.set(cache_key, body, expire=3600, datasets=[financials_dataset(symbol)])
         
-        return response
+        return json_response(body)
         
     except Exception as e:
         print(f"❌ Error getting financials for {symbol}: {e}")
@@ -242,10 +245,13 @@ async def get_financial_table(
     """
     try:
         # Cache key
-        cache_key = f"scraper:table:{symbol}:{report_type.value}:{period_type.value}:{limit}"
-        cached = await redis_cache.get(cache_key)
-        if cached:
-            return cached
+        cache_key = await versioned_key(
+            f"scraper:table:{symbol}:{report_type.value}:{period_type.value}:{limit}",
+            [financials_dataset(symbol)]
+        )
+        cached = await redis_cache.get(cache_key, datasets=[financials_dataset(symbol)]) if cache_key else None
+        if isinstance(cached, bytes):
+            return json_response(cached)
         
         # Query reports
         reports = db.query(FinancialReport).filter(
@@ -290,10 +296,12 @@ async def get_financial_table(
             rows=rows
         )
         
-        # Cache for 30 minutes
-        await redis_cache.set(cache_key, response.model_dump_json(), expire=1800)
+        # Cache the final response bytes for 30 minutes
+        body = render_json(response.model_dump(mode='json', by_alias=True))
+        if cache_key:
+            await redis_cache.set(cache_key, body, expire=1800, datasets=[financials_dataset(symbol)])
         
-        return response
+        return json_response(body)
         
     except HTTPException:
         raise
@@ -5,13 +5,22 @@ Stock Screeners API Endpoints
 
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc, func
-from typing import List, Optional
+from sqlalchemy import func
+from typing import Optional
 from datetime import date
+import numpy as np
 
 from app.core.database import get_db
+from app.core.cache_versions import RS, STOCK_INDICATORS, TECHNICALS
+from app.core.pagination import CURSOR_DESCRIPTION, INCLUDE_TOTAL_DESCRIPTION, decode_symbol_cursor, encode_cursor
+from app.core.route_cache import cached_route
 from app.models.stock_indicators import StockIndicator
-from app.models.rs_daily import RSDaily
+from app.schemas.screener import ScreenerRunRequest
+from app.services.screener_dsl import (
+    SCREENER_DEFINITIONS, SCREENER_TITLES, SCREENERS, CompiledScreener, ScreenerDefinitionError, compile_screener,
+)
+from app.services.screener_engine import screener_engine, screener_indices
+from app.services.screener_snapshot import query_screener_live, read_screener_snapshot
 
 router = APIRouter(prefix="/screeners", tags=["Stock Screeners"])
 
@@ -89,26 +98,91 @@ def get_latest_date(db: Session) -> date:
     return db.query(func.max(StockIndicator.date)).scalar()
 
 
-def get_rs_map(db: Session, target_date) -> dict:
+def run_screener(
+    db: Session,
+    name: Optional[str],
+    limit: int,
+    offset: int,
+    target_date: Optional[str],
+    screener: Optional[CompiledScreener] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+) -> dict:
     """
-    جلب RS Rating من rs_daily_v2 لكل سهم في تاريخ محدد.
-    Returns: dict {symbol: rs_rating}
+    تشغيل screener محفوظ (name) أو مخصص (screener مترجم من screener_dsl):
+    - آخر تاريخ → قناع NumPy على اللقطة في الذاكرة (screener_engine) بدون استعلام
+    - ثم screener_snapshot (الشروط و RS محسوبة مسبقاً) إذا تعذّر تحميل المحرك
+    - تاريخ محدد (أو snapshot غير مبني) → استعلام مباشر على stock_indicators
+    النتائج مرتبة بالرمز: cursor (next_cursor السابق) يبدأ بعد آخر رمز بدلاً من offset،
+    والعدد الكلي من قاعدة البيانات يُحسب في الصفحة الأولى فقط (أو مع include_total)
     """
-    rows = (
-        db.query(RSDaily.symbol, RSDaily.rs_rating)
-        .filter(RSDaily.date == target_date)
-        .all()
-    )
-    return {row.symbol: row.rs_rating for row in rows}
+    if screener is None:
+        screener = SCREENERS[name]
+    after = decode_symbol_cursor(cursor)
+
+    if not target_date:
+        cs = screener_engine.get(db)
+        if cs is not None:
+            rows = cs.view('screener_rows', lambda c: [
+                screener_to_dict(ind, rs_rating) for ind, rs_rating in zip(c.rows, c.rs_ratings)
+            ])
+            # المحفوظة تُحسب مرة لكل لقطة، والمخصصة تُحسب لكل طلب (~ميكروثوانٍ)
+            matches = screener_indices(cs, name) if name else screener.indices(cs)
+            # اللقطة مرتبة بالرمز → بداية الصفحة بعد آخر رمز بـ searchsorted
+            start = int(np.searchsorted(cs.symbols[matches], after, side='right')) if after is not None else offset
+            page = matches[start:start + limit]
+            has_more = start + limit < len(matches)
+            return {
+                'data': [rows[i] for i in page],
+                'total': len(matches),
+                'count': len(page),
+                'next_cursor': encode_cursor(cs.symbols[page[-1]]) if has_more and len(page) else None,
+            }
+
+        snapshot = read_screener_snapshot(
+            db, name, limit, offset, after=after, with_total=include_total,
+        ) if name else None
+        if snapshot is not None:
+            rows, total, has_more = snapshot
+            return {
+                'data': [screener_to_dict(row, row.rs_rating) for row in rows],
+                'total': total,
+                'count': len(rows),
+                'next_cursor': encode_cursor(rows[-1].symbol) if has_more and rows else None,
+            }
+
+    latest = target_date or get_latest_date(db)
+    query = query_screener_live(db, screener, latest)
+
+    total = query.count() if after is None or include_total else None
+    if after is not None:
+        query = query.filter(StockIndicator.symbol > after)
+    query = query.order_by(StockIndicator.symbol)
+    if after is None and offset:
+        query = query.offset(offset)
+    # صف إضافي لمعرفة وجود صفحة تالية
+    results = query.limit(limit + 1).all()
+    has_more = len(results) > limit
+    results = results[:limit]
+
+    return {
+        'data': [screener_to_dict(ind, rs_rating) for ind, rs_rating in results],
+        'total': total,
+        'count': len(results),
+        'next_cursor': encode_cursor(results[-1][0].symbol) if has_more and results else None,
+    }
 
 
 # ============ SCREENER 1: TREND - 1 MONTH ============
 @router.get("/trend-1-month")
+@cached_route("screeners:trend_1_month", datasets=(TECHNICALS, STOCK_INDICATORS, RS))
 def get_trend_1_month(
     db: Session = Depends(get_db),
     limit: int = Query(500, ge=1, le=5000),
     offset: int = Query(0, ge=0),
-    target_date: Optional[str] = Query(None)
+    target_date: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(False, description=INCLUDE_TOTAL_DESCRIPTION),
 ):
     """
     🎯 Trend - 1 Month Screener
@@ -127,55 +201,24 @@ def get_trend_1_month(
     ✅ Price Vs 30w SMA:  > 0.00%
     ✅ Price Vs 40w SMA:  > 0.00%
     """
-    if target_date:
-        latest = target_date
-    else:
-        latest = get_latest_date(db)
-
-    # Fetch RS map for the date
-    rs_map = get_rs_map(db, latest)
-    # Only keep symbols with RS > 69
-    rs_symbols = {sym for sym, rating in rs_map.items() if rating is not None and rating > 69}
-
-    query = db.query(StockIndicator).filter(StockIndicator.date == latest)
-
-    query = query.filter(
-        and_(
-            StockIndicator.symbol.in_(rs_symbols),          # RS 12M > 69
-            StockIndicator.sma_50 > StockIndicator.sma_150, # SMA50 > SMA150
-            StockIndicator.sma_50 > StockIndicator.sma_200, # SMA50 > SMA200
-            StockIndicator.sma_150 > StockIndicator.sma_200,# SMA150 > SMA200
-            StockIndicator.sma_200 > StockIndicator.sma_200_1m_ago,  # 200 > 200 1M ago
-            StockIndicator.percent_off_52w_low > 30.0,      # Off Low > 30%
-            StockIndicator.percent_off_52w_high > -25.0,    # Off High > -25%
-            StockIndicator.price_vs_sma_50_percent > 0.0,   # Price > 50d SMA
-            StockIndicator.price_vs_sma_150_percent > 0.0,  # Price > 150d SMA
-            StockIndicator.price_vs_sma_200_percent > 0.0,  # Price > 200d SMA
-            StockIndicator.sma_30w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_30w,  # Price > 30w SMA
-            StockIndicator.sma_40w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_40w,  # Price > 40w SMA
-        )
-    )
-
-    total = query.count()
-    results = query.order_by(StockIndicator.symbol).offset(offset).limit(limit).all()
+    result = run_screener(db, 'trend_1_month', limit, offset, target_date, cursor=cursor, include_total=include_total)
 
     return {
         'screener': 'Trend - 1 Month',
-        'data': [screener_to_dict(ind, rs_map.get(ind.symbol)) for ind in results],
-        'total': total,
-        'count': len(results),
+        **result,
     }
 
 
 # ============ SCREENER 2: TREND - 2 MONTHS ============
 @router.get("/trend-2-months")
+@cached_route("screeners:trend_2_months", datasets=(TECHNICALS, STOCK_INDICATORS, RS))
 def get_trend_2_months(
     db: Session = Depends(get_db),
     limit: int = Query(500, ge=1, le=5000),
     offset: int = Query(0, ge=0),
-    target_date: Optional[str] = Query(None)
+    target_date: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(False, description=INCLUDE_TOTAL_DESCRIPTION),
 ):
     """
     🎯 Trend - 2 Months Screener
@@ -195,54 +238,24 @@ def get_trend_2_months(
     ✅ Price Vs 30w SMA:  > 0.00%
     ✅ Price Vs 40w SMA:  > 0.00%
     """
-    if target_date:
-        latest = target_date
-    else:
-        latest = get_latest_date(db)
-
-    rs_map = get_rs_map(db, latest)
-    rs_symbols = {sym for sym, rating in rs_map.items() if rating is not None and rating > 69}
-
-    query = db.query(StockIndicator).filter(StockIndicator.date == latest)
-
-    query = query.filter(
-        and_(
-            StockIndicator.symbol.in_(rs_symbols),
-            StockIndicator.sma_50 > StockIndicator.sma_150,
-            StockIndicator.sma_50 > StockIndicator.sma_200,
-            StockIndicator.sma_150 > StockIndicator.sma_200,
-            StockIndicator.sma_200 > StockIndicator.sma_200_2m_ago,          # 200 > 200 2M ago
-            StockIndicator.sma_200_1m_ago > StockIndicator.sma_200_2m_ago,   # 1M ago > 2M ago (chain)
-            StockIndicator.percent_off_52w_high > -25.0,
-            StockIndicator.percent_off_52w_low > 30.0,
-            StockIndicator.price_vs_sma_50_percent > 0.0,
-            StockIndicator.price_vs_sma_150_percent > 0.0,
-            StockIndicator.price_vs_sma_200_percent > 0.0,
-            StockIndicator.sma_30w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_30w,
-            StockIndicator.sma_40w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_40w,
-        )
-    )
-
-    total = query.count()
-    results = query.order_by(StockIndicator.symbol).offset(offset).limit(limit).all()
+    result = run_screener(db, 'trend_2_months', limit, offset, target_date, cursor=cursor, include_total=include_total)
 
     return {
         'screener': 'Trend - 2 Months',
-        'data': [screener_to_dict(ind, rs_map.get(ind.symbol)) for ind in results],
-        'total': total,
-        'count': len(results),
+        **result,
     }
 
 
 # ============ SCREENER 3: TREND - 4 MONTHS ============
 @router.get("/trend-4-months")
+@cached_route("screeners:trend_4_months", datasets=(TECHNICALS, STOCK_INDICATORS, RS))
 def get_trend_4_months(
     db: Session = Depends(get_db),
     limit: int = Query(500, ge=1, le=5000),
     offset: int = Query(0, ge=0),
-    target_date: Optional[str] = Query(None)
+    target_date: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(False, description=INCLUDE_TOTAL_DESCRIPTION),
 ):
     """
     🎯 Trend - 4 Months Screener
@@ -264,59 +277,24 @@ def get_trend_4_months(
     ✅ Price Vs 30w SMA:  > 0.00%
     ✅ Price Vs 40w SMA:  > 0.00%
     """
-    if target_date:
-        latest = target_date
-    else:
-        latest = get_latest_date(db)
-
-    rs_map = get_rs_map(db, latest)
-    rs_symbols = {sym for sym, rating in rs_map.items() if rating is not None and rating > 69}
-
-    query = db.query(StockIndicator).filter(StockIndicator.date == latest)
-
-    query = query.filter(
-        and_(
-            StockIndicator.symbol.in_(rs_symbols),
-            StockIndicator.sma_50 > StockIndicator.sma_150,
-            StockIndicator.sma_50 > StockIndicator.sma_200,
-            StockIndicator.sma_150 > StockIndicator.sma_200,
-            StockIndicator.sma_200 > StockIndicator.sma_200_1m_ago,           # 200 > 200 1M ago
-            StockIndicator.sma_200 > StockIndicator.sma_200_2m_ago,           # 200 > 200 2M ago
-            StockIndicator.sma_200 > StockIndicator.sma_200_3m_ago,           # 200 > 200 3M ago
-            StockIndicator.sma_200 > StockIndicator.sma_200_4m_ago,           # 200 > 200 4M ago
-            StockIndicator.sma_200_1m_ago > StockIndicator.sma_200_2m_ago,   # chain: 1M > 2M
-            StockIndicator.sma_200_2m_ago > StockIndicator.sma_200_3m_ago,   # chain: 2M > 3M
-            StockIndicator.sma_200_3m_ago > StockIndicator.sma_200_4m_ago,   # chain: 3M > 4M
-            StockIndicator.percent_off_52w_high > -25.0,
-            StockIndicator.percent_off_52w_low > 30.0,
-            StockIndicator.price_vs_sma_50_percent > 0.0,
-            StockIndicator.price_vs_sma_150_percent > 0.0,
-            StockIndicator.price_vs_sma_200_percent > 0.0,
-            StockIndicator.sma_30w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_30w,
-            StockIndicator.sma_40w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_40w,
-        )
-    )
-
-    total = query.count()
-    results = query.order_by(StockIndicator.symbol).offset(offset).limit(limit).all()
+    result = run_screener(db, 'trend_4_months', limit, offset, target_date, cursor=cursor, include_total=include_total)
 
     return {
         'screener': 'Trend - 4 Months',
-        'data': [screener_to_dict(ind, rs_map.get(ind.symbol)) for ind in results],
-        'total': total,
-        'count': len(results),
+        **result,
     }
 
 
 # ============ SCREENER 4: TREND - 5 MONTHS ============
 @router.get("/trend-5-months")
+@cached_route("screeners:trend_5_months", datasets=(TECHNICALS, STOCK_INDICATORS, RS))
 def get_trend_5_months(
     db: Session = Depends(get_db),
     limit: int = Query(500, ge=1, le=5000),
     offset: int = Query(0, ge=0),
-    target_date: Optional[str] = Query(None)
+    target_date: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(False, description=INCLUDE_TOTAL_DESCRIPTION),
 ):
     """
     🎯 Trend - 5 Months Screener
@@ -339,57 +317,24 @@ def get_trend_5_months(
     ✅ Price Vs 30w SMA:  > 0.00%
     ✅ Price Vs 40w SMA:  > 0.00%
     """
-    if target_date:
-        latest = target_date
-    else:
-        latest = get_latest_date(db)
-
-    rs_map = get_rs_map(db, latest)
-    rs_symbols = {sym for sym, rating in rs_map.items() if rating is not None and rating > 69}
-
-    query = db.query(StockIndicator).filter(StockIndicator.date == latest)
-
-    query = query.filter(
-        and_(
-            StockIndicator.symbol.in_(rs_symbols),
-            StockIndicator.sma_50 > StockIndicator.sma_150,
-            StockIndicator.sma_50 > StockIndicator.sma_200,
-            StockIndicator.sma_150 > StockIndicator.sma_200,
-            StockIndicator.sma_200 > StockIndicator.sma_200_5m_ago,          # 200 > 200 5M ago
-            StockIndicator.sma_200_1m_ago > StockIndicator.sma_200_2m_ago,   # chain: 1M > 2M
-            StockIndicator.sma_200_2m_ago > StockIndicator.sma_200_3m_ago,   # chain: 2M > 3M
-            StockIndicator.sma_200_3m_ago > StockIndicator.sma_200_4m_ago,   # chain: 3M > 4M
-            StockIndicator.sma_200_4m_ago > StockIndicator.sma_200_5m_ago,   # chain: 4M > 5M
-            StockIndicator.percent_off_52w_high > -25.0,
-            StockIndicator.percent_off_52w_low > 30.0,
-            StockIndicator.price_vs_sma_50_percent > 0.0,
-            StockIndicator.price_vs_sma_150_percent > 0.0,
-            StockIndicator.price_vs_sma_200_percent > 0.0,
-            StockIndicator.sma_30w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_30w,
-            StockIndicator.sma_40w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_40w,
-        )
-    )
-
-    total = query.count()
-    results = query.order_by(StockIndicator.symbol).offset(offset).limit(limit).all()
+    result = run_screener(db, 'trend_5_months', limit, offset, target_date, cursor=cursor, include_total=include_total)
 
     return {
         'screener': 'Trend - 5 Months',
-        'data': [screener_to_dict(ind, rs_map.get(ind.symbol)) for ind in results],
-        'total': total,
-        'count': len(results),
+        **result,
     }
 
 
 # ============ SCREENER 5: TREND - 5 MONTHS WIDE ============
 @router.get("/trend-5-months-wide")
+@cached_route("screeners:trend_5_months_wide", datasets=(TECHNICALS, STOCK_INDICATORS, RS))
 def get_trend_5_months_wide(
     db: Session = Depends(get_db),
     limit: int = Query(500, ge=1, le=5000),
     offset: int = Query(0, ge=0),
-    target_date: Optional[str] = Query(None)
+    target_date: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(False, description=INCLUDE_TOTAL_DESCRIPTION),
 ):
     """
     🎯 Trend - 5 Months Wide Screener
@@ -403,47 +348,24 @@ def get_trend_5_months_wide(
     ✅ Price Vs 30w SMA:  > 0.00%
     ✅ Price Vs 40w SMA:  > 0.00%
     """
-    if target_date:
-        latest = target_date
-    else:
-        latest = get_latest_date(db)
-
-    rs_map = get_rs_map(db, latest)
-
-    query = db.query(StockIndicator).filter(StockIndicator.date == latest)
-
-    query = query.filter(
-        and_(
-            StockIndicator.sma_50 > StockIndicator.sma_200,
-            StockIndicator.sma_200 > StockIndicator.sma_200_5m_ago,
-            StockIndicator.price_vs_sma_50_percent > 0.0,
-            StockIndicator.price_vs_sma_150_percent > 0.0,
-            StockIndicator.price_vs_sma_200_percent > 0.0,
-            StockIndicator.sma_30w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_30w,
-            StockIndicator.sma_40w.isnot(None),
-            StockIndicator.close > StockIndicator.sma_40w,
-        )
-    )
-
-    total = query.count()
-    results = query.order_by(StockIndicator.symbol).offset(offset).limit(limit).all()
+    result = run_screener(db, 'trend_5_months_wide', limit, offset, target_date, cursor=cursor, include_total=include_total)
 
     return {
         'screener': 'Trend - 5 Months Wide',
-        'data': [screener_to_dict(ind, rs_map.get(ind.symbol)) for ind in results],
-        'total': total,
-        'count': len(results),
+        **result,
     }
 
 
 # ============ SCREENER 6: POWER PLAY ============
 @router.get("/power-play")
+@cached_route("screeners:power_play", datasets=(TECHNICALS, STOCK_INDICATORS, RS))
 def get_power_play(
     db: Session = Depends(get_db),
     limit: int = Query(500, ge=1, le=5000),
     offset: int = Query(0, ge=0),
-    target_date: Optional[str] = Query(None)
+    target_date: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(False, description=INCLUDE_TOTAL_DESCRIPTION),
 ):
     """
     🎯 Power Play Screener
@@ -455,40 +377,63 @@ def get_power_play(
     ✅ Price Vs 50d SMA:  > 0.00%
     ✅ Price Vs 200d SMA: > 0.00%
     """
-    if target_date:
-        latest = target_date
-    else:
-        latest = get_latest_date(db)
-
-    rs_map = get_rs_map(db, latest)
-
-    query = db.query(StockIndicator).filter(StockIndicator.date == latest)
-
-    # Power Play uses price_vs_sma percentages and percent_change columns
-    # NULL guards ensure we only filter stocks that have calculated change data
-    query = query.filter(
-        and_(
-            StockIndicator.price_vs_sma_50_percent.isnot(None),
-            StockIndicator.price_vs_sma_200_percent.isnot(None),
-            StockIndicator.percent_change_20d.isnot(None),
-            StockIndicator.percent_change_15d.isnot(None),
-            StockIndicator.percent_change_126d.isnot(None),
-            StockIndicator.price_vs_sma_50_percent > 0.0,    # Price > 50d SMA
-            StockIndicator.price_vs_sma_200_percent > 0.0,   # Price > 200d SMA
-            StockIndicator.percent_change_20d > -25.0,        # % Change 20d > -25%
-            StockIndicator.percent_change_15d >= -15.0,       # % Change 15d >= -15%
-            StockIndicator.percent_change_15d <= 5.0,         # % Change 15d <= +5%
-            StockIndicator.percent_change_126d > 85.0,        # % Change 126d > +85%
-        )
-    )
-
-    total = query.count()
-    results = query.order_by(StockIndicator.symbol).offset(offset).limit(limit).all()
+    result = run_screener(db, 'power_play', limit, offset, target_date, cursor=cursor, include_total=include_total)
 
     return {
         'screener': 'Power Play',
-        'data': [screener_to_dict(ind, rs_map.get(ind.symbol)) for ind in results],
-        'total': total,
-        'count': len(results),
+        **result,
         'description': 'Power Play: أسهم أعلى من SMA 50 وSMA 200 مع شروط تغير السعر',
     }
+
+
+# ============ CUSTOM SCREENERS ============
+@router.get("/definitions")
+def get_screener_definitions():
+    """
+    تعريفات الـ Screeners المحفوظة (نفس صيغة conditions في POST /screeners/run)
+    """
+    return SCREENER_DEFINITIONS
+
+
+@router.post("/run")
+def run_custom_screener(
+    request: ScreenerRunRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    🎯 تشغيل screener محفوظ بالاسم أو screener مخصص من قائمة شروط
+
+    Body:
+    - name: اسم screener محفوظ (trend_1_month, power_play, ...)
+    - أو conditions: [{"column": "sma_50", "op": ">", "ref": "sma_200"},
+                      {"column": "rs_rating", "op": ">=", "value": 80}, ...]
+    - op: > >= < <= = != not_null
+    """
+    if request.name:
+        if request.name not in SCREENERS:
+            raise HTTPException(status_code=404, detail=f"❌ Screener غير موجود: {request.name}")
+        result = run_screener(
+            db, request.name, request.limit, request.offset, request.target_date,
+            cursor=request.cursor, include_total=request.include_total,
+        )
+        return {
+            'screener': SCREENER_TITLES[request.name],
+            **result,
+        }
+
+    if not request.conditions:
+        raise HTTPException(status_code=400, detail="❌ يجب تحديد name أو conditions")
+
+    try:
+        screener = compile_screener(c.model_dump() for c in request.conditions)
+    except ScreenerDefinitionError as e:
+        raise HTTPException(status_code=400, detail=f"❌ {e}")
+
+    result = run_screener(
+        db, None, request.limit, request.offset, request.target_date, screener=screener,
+        cursor=request.cursor, include_total=request.include_total,
+    )
+    return {
+        'screener': 'Custom',
+        **result,
+    }
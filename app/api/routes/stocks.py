@@ -6,6 +6,7 @@ from sqlalchemy import update
 # ⭐ استيرادات واضحة
 
 from app.services.rs_rating import calculate_all_rs_ratings
+from app.core.cache_versions import QUOTES, bump_versions
 from app.core.redis import redis_cache
 from app.core.database import get_db
 
@@ -154,12 +155,11 @@ async def calculate_and_save_rs_task(symbols: List[str]):
         finally:
             db.close()
         
-        # مسح الكاش
-        try:
-            await redis_cache.delete("tadawul:all:Saudi Arabia")
-            print("✅ Cleared Redis cache")
-        except Exception as e:
-            print(f"⚠️ Could not clear Redis cache: {e}")
+        # إبطال الكاش: إصدار جديد لبيانات stock_quotes (المفاتيح القديمة تنتهي بالـ TTL)
+        if await bump_versions(QUOTES):
+            print("✅ Invalidated quotes cache")
+        else:
+            print("⚠️ Could not invalidate quotes cache")
         
         print("🎉 RS & Change calculation task completed")
         
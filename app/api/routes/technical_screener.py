@@ -1,15 +1,23 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import desc, func, tuple_
 from typing import List, Optional, Dict, Any
+import numpy as np
 from datetime import date
 
 from app.core.database import get_db
+from app.core.cache_versions import STOCK_INDICATORS, TECHNICALS
+from app.core.pagination import (
+    CURSOR_DESCRIPTION, INCLUDE_TOTAL_DESCRIPTION, decode_cursor, decode_symbol_cursor, encode_cursor,
+)
+from app.core.route_cache import cached_route
 from app.models.stock_indicators import StockIndicator
+from app.services.screener_engine import screener_engine
 
 router = APIRouter()
 
 @router.get("/technical-screener/screener")
+@cached_route("technical_screener", datasets=(TECHNICALS, STOCK_INDICATORS))
 def get_technical_screener_data(
     db: Session = Depends(get_db),
     limit: int = Query(500, ge=1, le=5000),
@@ -18,12 +26,49 @@ def get_technical_screener_data(
     min_score: Optional[int] = Query(None, ge=0),
     passing_only: bool = Query(False),
     latest_only: bool = Query(True),
-    target_date: Optional[str] = Query(None, description="Filter by specific date (YYYY-MM-DD). Defaults to latest date.")
+    target_date: Optional[str] = Query(None, description="Filter by specific date (YYYY-MM-DD). Defaults to latest date."),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    include_total: bool = Query(False, description=INCLUDE_TOTAL_DESCRIPTION),
 ):
     """
     Returns technical screener rows from stock_indicators only.
     All PineScript-exact values (EMA, SMA, CCI, Aroon, RSI, etc.) come from this single table.
+    Latest-date requests are served from the in-memory screener engine (no DB round-trip).
+    Rows are ordered by symbol - pass next_cursor to get the next page.
     """
+    # بدون تاريخ محدد ولا latest_only: عدة تواريخ لكل رمز → المفتاح (symbol, date)
+    all_dates = not target_date and not latest_only
+    if all_dates:
+        after = decode_cursor(cursor, 2) if cursor else None
+        try:
+            after_date = date.fromisoformat(after[0]) if after else None
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="❌ cursor غير صالح")
+    else:
+        after = decode_symbol_cursor(cursor)
+    if not target_date and latest_only:
+        cs = screener_engine.get(db)
+        if cs is not None:
+            rows = cs.view('technical_rows', lambda c: [indicator_to_dict(ind) for ind in c.rows])
+            mask = np.ones(len(cs), dtype=bool)
+            if symbol:
+                mask &= cs.symbols == symbol
+            if min_score is not None:
+                mask &= cs.column('score') >= min_score
+            if passing_only:
+                mask &= cs.column('final_signal') == 1
+            matches = np.flatnonzero(mask)
+            # اللقطة مرتبة بالرمز → بداية الصفحة بعد آخر رمز بـ searchsorted
+            start = int(np.searchsorted(cs.symbols[matches], after, side='right')) if after is not None else offset
+            page = matches[start:start + limit]
+            has_more = start + limit < len(matches)
+            return {
+                'data': [rows[i] for i in page],
+                'total': len(matches),
+                'date': str(cs.date),
+                'next_cursor': encode_cursor(cs.symbols[page[-1]]) if has_more and len(page) else None,
+            }
+
     query = db.query(StockIndicator)
 
     # Determine target date
@@ -46,15 +91,33 @@ def get_technical_screener_data(
     if passing_only:
         query = query.filter(StockIndicator.final_signal == True)
 
-    query = query.order_by(StockIndicator.symbol)
+    # العدد الكلي في الصفحة الأولى فقط (أو عند الطلب)
+    total = query.count() if after is None or include_total else None
 
-    total = query.count()
-    results = query.offset(offset).limit(limit).all()
+    if all_dates:
+        if after is not None:
+            query = query.filter(tuple_(StockIndicator.symbol, StockIndicator.date) > tuple_(after[1], after_date))
+        query = query.order_by(StockIndicator.symbol, StockIndicator.date)
+    else:
+        if after is not None:
+            query = query.filter(StockIndicator.symbol > after)
+        query = query.order_by(StockIndicator.symbol)
+    if after is None and offset:
+        query = query.offset(offset)
+    # صف إضافي لمعرفة وجود صفحة تالية
+    results = query.limit(limit + 1).all()
+    has_more = len(results) > limit
+    results = results[:limit]
+    next_cursor = None
+    if has_more and results:
+        last = results[-1]
+        next_cursor = encode_cursor(str(last.date), last.symbol) if all_dates else encode_cursor(last.symbol)
 
     return {
         'data': [indicator_to_dict(ind) for ind in results],
         'total': total,
-        'date': result_date
+        'date': result_date,
+        'next_cursor': next_cursor,
     }
 
 def indicator_to_dict(ind: StockIndicator) -> dict:
@@ -0,0 +1,234 @@
+"""
+Cache Versions - إصدار (generation) لكل مجموعة بيانات في Redis: cache:version:{dataset}
+
+- كل مرحلة في الـ pipeline تزيد إصدار البيانات التي كتبتها بعد الـ commit
+  (bump_dataset_versions من الـ scripts، أو bump_versions من داخل الـ API)
+- المفاتيح المخزنة تتضمن إصدارات البيانات التي تعتمد عليها (versions_tag)
+  → بعد أي تحديث يُقرأ مفتاح جديد والقديم ينتهي وحده بالـ TTL
+  فلا حاجة إلى DEL بنمط (wildcard) أو KEYS أو FLUSHALL على كل Redis
+- كل زيادة تُنشر على قناة pub/sub (INVALIDATION_CHANNEL): كل worker مشترك يحتفظ
+  بالإصدارات في الذاكرة (بدون MGET لكل طلب) ويحذف مدخلات local_cache المرتبطة بها
+"""
+
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.local_cache import local_cache
+from app.core.redis import redis_cache
+
+logger = logging.getLogger(__name__)
+
+VERSION_PREFIX = "cache:version"
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+# ============ مجموعات البيانات (مرحلة الـ pipeline → الجداول التي تكتبها) ============
+PRICES = "prices"                      # prices (scraping اليومي)
+RS = "rs"                              # rs_daily_v2 (rs_rating, returns, ranks)
+TECHNICALS = "technicals"              # TechnicalCalculator → prices.change + stock_indicators (market stats)
+IBD = "ibd"                            # rs_daily_v2 (group RS, Acc/Dis)
+INDUSTRY_GROUPS = "industry_groups"    # industry_group_history
+STOCK_INDICATORS = "stock_indicators"  # stock_indicators + screener_snapshot
+QUOTES = "quotes"                      # stock_quotes (RS / Change% من /stocks/calculate-rs)
+
+PIPELINE_DATASETS = (PRICES, RS, TECHNICALS, IBD, INDUSTRY_GROUPS, STOCK_INDICATORS)
+ALL_DATASETS = (*PIPELINE_DATASETS, QUOTES)
+
+
+def financials_dataset(symbol: str) -> str:
+    """البيانات المالية المسحوبة (scraper) لها إصدار لكل شركة"""
+    return f"financials:{symbol}"
+
+
+def version_key(dataset: str) -> str:
+    return f"{VERSION_PREFIX}:{dataset}"
+
+
+# ============ نسخة الإصدارات داخل الـ worker (صالحة فقط أثناء الاشتراك في pub/sub) ============
+_local_versions: Dict[str, str] = {}
+_generation = 0  # يزيد مع كل رسالة إبطال - يمنع حفظ نتيجة MGET قرأت إصداراً قديماً
+_subscribed = False
+_listener_task: Optional[asyncio.Task] = None
+
+
+def _apply_invalidation(datasets: Iterable[str]):
+    global _generation
+    datasets = [d for d in datasets if d]
+    _generation += 1
+    for dataset in datasets:
+        _local_versions.pop(dataset, None)
+    local_cache.invalidate_datasets(datasets)
+
+
+def _reset_local_versions():
+    global _generation
+    _generation += 1
+    _local_versions.clear()
+
+
+async def get_versions(datasets: Iterable[str]) -> Optional[List[str]]:
+    """
+    الإصدارات الحالية بنفس الترتيب ("0" إذا لم يُزد الإصدار بعد) - استعلام MGET واحد
+    None إذا كان Redis غير متاح (المستدعي لا يستخدم الـ cache)
+    """
+    datasets = list(datasets)
+    if _subscribed:
+        try:
+            return [_local_versions[d] for d in datasets]
+        except KeyError:
+            pass
+    if not await redis_cache.ensure_connection():
+        return None
+    if not datasets:
+        return []
+    generation = _generation
+    try:
+        values = await redis_cache.redis_client.mget([version_key(d) for d in datasets])
+    except Exception as e:
+        print(f"❌ خطأ في جلب إصدارات الكاش: {e}")
+        return None
+    versions = [v or "0" for v in values]
+    if _subscribed and generation == _generation:
+        _local_versions.update(zip(datasets, versions))
+    return versions
+
+
+async def versions_tag(datasets: Iterable[str]) -> Optional[str]:
+    """جزء المفتاح الذي يمثل الإصدارات، مثل 'v12.4'"""
+    versions = await get_versions(datasets)
+    return None if versions is None else "v" + ".".join(versions)
+
+
+async def versioned_key(base: str, datasets: Iterable[str]) -> Optional[str]:
+    """{base}:{versions_tag} - أو None إذا كان Redis غير متاح"""
+    tag = await versions_tag(datasets)
+    return None if tag is None else f"{base}:{tag}"
+
+
+async def bump_versions(*datasets: str) -> bool:
+    """زيادة الإصدار من داخل الـ API (async) - لا يرمي استثناء إذا كان Redis غير متاح"""
+    if not datasets or not await redis_cache.ensure_connection():
+        return False
+    try:
+        pipe = redis_cache.redis_client.pipeline(transaction=False)
+        for dataset in datasets:
+            pipe.incr(version_key(dataset))
+        pipe.publish(INVALIDATION_CHANNEL, ",".join(datasets))
+        await pipe.execute()
+        # هذا الـ worker لا ينتظر رسالته من Redis
+        _apply_invalidation(datasets)
+        return True
+    except Exception as e:
+        print(f"❌ خطأ في تحديث إصدار الكاش {datasets}: {e}")
+        return False
+
+
+_sync_client = None
+
+
+def _sync_redis():
+    """عميل Redis متزامن (scripts وكود الـ threadpool) - يُنشأ مرة واحدة لكل عملية"""
+    global _sync_client
+    if _sync_client is None:
+        import redis
+
+        _sync_client = redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=2, socket_timeout=2)
+    return _sync_client
+
+
+def read_dataset_versions(datasets: Iterable[str]) -> Optional[List[str]]:
+    """
+    مثل get_versions لكن sync (للكود الذي يعمل في الـ threadpool مثل screener_engine)
+    - من نسخة الـ worker أثناء الاشتراك في pub/sub، وإلا MGET مباشر
+    - None إذا كان Redis غير متاح
+    """
+    datasets = list(datasets)
+    if _subscribed:
+        try:
+            return [_local_versions[d] for d in datasets]
+        except KeyError:
+            pass
+    if not settings.REDIS_URL:
+        return None
+    if not datasets:
+        return []
+    try:
+        values = _sync_redis().mget([version_key(d) for d in datasets])
+    except Exception as e:
+        logger.warning(f"⚠️ Cache versions not read ({', '.join(datasets)}): {e}")
+        return None
+    return [v.decode() if isinstance(v, bytes) else (v or "0") for v in values]
+
+
+def bump_dataset_versions(*datasets: str) -> bool:
+    """
+    زيادة الإصدار من الـ scripts (sync) بعد commit كل مرحلة
+    فشل Redis لا يوقف الـ pipeline (المفاتيح القديمة تنتهي بالـ TTL على أي حال)
+    """
+    if not datasets or not settings.REDIS_URL:
+        return False
+    try:
+        pipe = _sync_redis().pipeline(transaction=False)
+        for dataset in datasets:
+            pipe.incr(version_key(dataset))
+        pipe.publish(INVALIDATION_CHANNEL, ",".join(datasets))
+        pipe.execute()
+        logger.info(f"✅ Cache versions bumped: {', '.join(datasets)}")
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Cache versions not bumped ({', '.join(datasets)}): {e}")
+        return False
+
+
+async def listen_for_invalidations():
+    """
+    الاشتراك في INVALIDATION_CHANNEL طوال عمر الـ worker
+    - أثناء الاشتراك تُقرأ الإصدارات من الذاكرة وتُحدَّث برسائل الإبطال
+    - عند انقطاع الاتصال تُنسى الإصدارات المحلية (العودة إلى MGET) ثم إعادة المحاولة
+    """
+    global _subscribed
+    while True:
+        pubsub = None
+        try:
+            if await redis_cache.ensure_connection():
+                pubsub = redis_cache.redis_client.pubsub()
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # أي زيادة قبل اكتمال الاشتراك لم تصلنا → نبدأ بدون إصدارات محلية
+                _reset_local_versions()
+                _subscribed = True
+                logger.info("✅ Subscribed to cache invalidation channel")
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        _apply_invalidation(message['data'].split(','))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Cache invalidation listener disconnected: {e}")
+        finally:
+            _subscribed = False
+            _reset_local_versions()
+            if pubsub is not None:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+        await asyncio.sleep(settings.ROUTE_CACHE_RETRY_SECONDS)
+
+
+def start_invalidation_listener():
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.ensure_future(listen_for_invalidations())
+
+
+async def stop_invalidation_listener():
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except asyncio.CancelledError:
+            pass
+        _listener_task = None
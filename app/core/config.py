@@ -13,6 +13,29 @@ class Settings:
         self.CACHE_EXPIRE_SECONDS = int(os.getenv("CACHE_EXPIRE_SECONDS", "300"))
         self.STOCK_PRICE_CACHE_SECONDS = int(os.getenv("STOCK_PRICE_CACHE_SECONDS", "300"))
         self.API_KEY = os.getenv("TWELVE_DATA_API_KEY")
+        
+        # مخزن الأسعار العمودي (date × symbol .npy) للحسابات الدفعية
+        self.PRICE_STORE_DIR = os.getenv(
+            "PRICE_STORE_DIR",
+            os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "price_store")
+        )
+        # محرك الـ screeners في الذاكرة: أقصى مدة (ثوانٍ) قبل التحقق من وجود تاريخ/تحديث جديد
+        self.SCREENER_ENGINE_CHECK_SECONDS = int(os.getenv("SCREENER_ENGINE_CHECK_SECONDS", "60"))
+        # مدة cache نتائج /api/prices/history بعد التقليص (max_points) في local_cache داخل كل worker
+        self.PRICE_HISTORY_CACHE_SECONDS = int(os.getenv("PRICE_HISTORY_CACHE_SECONDS", "300"))
+        # cache المسارات الثقيلة في Redis (app/core/route_cache.py)
+        self.ROUTE_CACHE_TTL_SECONDS = int(os.getenv("ROUTE_CACHE_TTL_SECONDS", "300"))
+        self.ROUTE_CACHE_STALE_SECONDS = int(os.getenv("ROUTE_CACHE_STALE_SECONDS", "3600"))
+        self.ROUTE_CACHE_LOCK_SECONDS = int(os.getenv("ROUTE_CACHE_LOCK_SECONDS", "10"))
+        self.ROUTE_CACHE_RETRY_SECONDS = int(os.getenv("ROUTE_CACHE_RETRY_SECONDS", "30"))
+        # طبقة cache في ذاكرة كل worker أمام Redis (app/core/local_cache.py)
+        self.LOCAL_CACHE_MAX_MB = int(os.getenv("LOCAL_CACHE_MAX_MB", "64"))
+        self.LOCAL_CACHE_TTL_SECONDS = int(os.getenv("LOCAL_CACHE_TTL_SECONDS", "300"))
+        # قيم RedisCache (msgpack) الأكبر من هذا الحد تُضغط بـ zstd
+        self.REDIS_COMPRESS_MIN_BYTES = int(os.getenv("REDIS_COMPRESS_MIN_BYTES", "1024"))
+        # عمليات حساب المؤشرات (scripts/shared_frame.py): 0 = كل الأنوية، وعدد الأسهم لكل مهمة (0 = تلقائي)
+        self.INDICATOR_WORKERS = int(os.getenv("INDICATOR_WORKERS", "0"))
+        self.INDICATOR_CHUNK_SYMBOLS = int(os.getenv("INDICATOR_CHUNK_SYMBOLS", "0"))
         self.BASE_URL = "https://api.twelvedata.com"
         
         # إعدادات إضافية مهمة للإنتاج
@@ -1,6 +1,8 @@
 # app/core/database.py
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -39,4 +41,60 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# ============ Async (asyncpg) - لمسارات القراءة في FastAPI ============
+# الـ engine المتزامن أعلاه يبقى للـ scripts، والـ async يُنشأ عند أول طلب فقط
+# حتى لا تحتاج الـ scripts إلى asyncpg
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def _async_url_and_args(url: str):
+    """
+    postgresql://...?sslmode=require → postgresql+asyncpg://... + connect_args={'ssl': 'require'}
+    (asyncpg لا يفهم sslmode في الـ URL)
+    """
+    u = make_url(url)
+    if not u.drivername.startswith('postgresql'):
+        return u, {}
+    query = dict(u.query)
+    sslmode = query.pop('sslmode', None)
+    u = u.set(drivername='postgresql+asyncpg', query=query)
+    return u, ({'ssl': sslmode} if sslmode else {})
+
+
+def get_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        url, connect_args = _async_url_and_args(settings.DATABASE_URL)
+        _async_engine = create_async_engine(
+            url,
+            pool_size=15,
+            max_overflow=20,
+            pool_timeout=30,
+            pool_recycle=3600,
+            pool_pre_ping=True,
+            echo=False,
+            connect_args=connect_args,
+        )
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+async def get_async_db():
+    """Dependency لمسارات async def - لا يحجز الـ event loop أثناء الاستعلام"""
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine, _AsyncSessionLocal = None, None
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Local Cache - طبقة cache داخل ذاكرة كل worker أمام Redis
+
+- LRU محدود بالحجم (بايت، حسب حجم القيمة كما خُزنت في Redis) + مدة صلاحية
+- القيم تُحفظ ككائنات Python جاهزة → الـ hit لا يحتاج رحلة شبكة ولا json.loads
+- كل مدخل مرتبط بمجموعات البيانات التي يعتمد عليها؛ عند زيادة إصدار أي منها
+  (رسالة pub/sub من cache_versions) تُحذف المدخلات المرتبطة بها فوراً
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+
+
+class _Entry(NamedTuple):
+    expires: float
+    size: int
+    datasets: Tuple[str, ...]
+    value: Any
+
+
+class LocalCache:
+    def __init__(self, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_bytes = settings.LOCAL_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        self.ttl = settings.LOCAL_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._items: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.get_entry(key)
+        return entry[0] if entry else None
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, int]]:
+        """القيمة + حجمها (بنفس شكل RedisCache.get_entry)"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._items.move_to_end(key)
+            return entry.value, entry.size
+
+    def set(self, key: str, value: Any, size: int, datasets: Iterable[str] = (), ttl: Optional[float] = None):
+        """size: حجم القيمة بالبايت (كما في Redis) - القيم الأكبر من ربع الحد لا تُحفظ محلياً"""
+        if self.max_bytes <= 0 or size > self.max_bytes // 4:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = _Entry(time.monotonic() + ttl, size, tuple(datasets), value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._items))
+                self._remove(oldest)
+
+    def invalidate_datasets(self, datasets: Iterable[str]) -> int:
+        """حذف كل المدخلات المعتمدة على أي من datasets → عدد المحذوف"""
+        datasets = set(datasets)
+        with self._lock:
+            stale = [key for key, entry in self._items.items() if datasets.intersection(entry.datasets)]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        entry = self._items.pop(key)
+        self._bytes -= entry.size
+
+
+# نسخة واحدة لكل worker
+local_cache = LocalCache()
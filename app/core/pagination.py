@@ -0,0 +1,40 @@
+"""
+Keyset (cursor) Pagination - الصفحة التالية تبدأ بعد آخر صف (sort key, symbol) بدلاً من OFFSET
+→ تكلفة الصفحة العميقة = تكلفة الأولى (فهرس يبدأ من الموضع مباشرة) ولا COUNT(*) لكل صفحة
+
+الـ cursor نص base64url معتم (opaque) يحمل قيم آخر صف: مثلاً [rs_rating, symbol] أو [symbol]
+العميل يرسل next_cursor من الرد السابق كما هو
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, List, Optional
+
+from fastapi import HTTPException
+
+CURSOR_DESCRIPTION = "next_cursor من الصفحة السابقة (keyset pagination - يتجاهل offset)"
+INCLUDE_TOTAL_DESCRIPTION = "حساب العدد الكلي في صفحات الـ cursor (الصفحة الأولى تتضمنه دائماً)"
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """قيم الـ cursor (عددها size) - 400 إذا كان تالفاً"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError, binascii.Error):
+        values = None
+    # آخر قيمة دائماً الرمز (symbol) - مفتاح كسر التعادل
+    if not isinstance(values, list) or len(values) != size or not isinstance(values[-1], str):
+        raise HTTPException(status_code=400, detail="❌ cursor غير صالح")
+    return values
+
+
+def decode_symbol_cursor(cursor: Optional[str]) -> Optional[str]:
+    """cursor لنتائج مرتبة بالرمز فقط → آخر symbol (أو None للصفحة الأولى)"""
+    return decode_cursor(cursor, 1)[0] if cursor else None
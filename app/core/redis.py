@@ -1,12 +1,64 @@
 import redis.asyncio as redis
 import os
 import json
-from typing import Any, Optional, List
+import msgpack
+from typing import Any, Iterable, Optional, List, Tuple
 from app.core.config import settings
+from app.core.local_cache import local_cache
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:  # الضغط اختياري - بدونه تُخزن القيم بـ msgpack فقط
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+# ============ Codec القيم المخزنة: بايت أول يحدد الصيغة ============
+# (أقل من 0x20 وليس مسافة بيضاء → لا يتعارض مع القيم القديمة المخزنة كنص JSON)
+FORMAT_MSGPACK = b'\x01'
+FORMAT_MSGPACK_ZSTD = b'\x02'
+FORMAT_TEXT = b'\x03'  # نص كما هو (توكنات ...)
+FORMAT_BYTES = b'\x04'  # bytes كما هي (ردود JSON جاهزة للإرسال)
+
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if ZSTD_AVAILABLE else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if ZSTD_AVAILABLE else None
+
+
+def encode_value(value: Any) -> bytes:
+    """dict/list → msgpack (+ zstd فوق REDIS_COMPRESS_MIN_BYTES)، bytes كما هي، غير ذلك → نص"""
+    if isinstance(value, bytes):
+        return FORMAT_BYTES + value
+    if not isinstance(value, (dict, list)):
+        return FORMAT_TEXT + str(value).encode('utf-8')
+    packed = msgpack.packb(value, default=str, use_bin_type=True)
+    if ZSTD_AVAILABLE and len(packed) >= settings.REDIS_COMPRESS_MIN_BYTES:
+        return FORMAT_MSGPACK_ZSTD + _zstd_compressor.compress(packed)
+    return FORMAT_MSGPACK + packed
+
+
+def decode_value(raw: bytes) -> Any:
+    tag, body = raw[:1], raw[1:]
+    if tag == FORMAT_MSGPACK:
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    if tag == FORMAT_BYTES:
+        return body
+    if tag == FORMAT_MSGPACK_ZSTD:
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstandard غير مثبت - لا يمكن فك قيمة مضغوطة")
+        return msgpack.unpackb(_zstd_decompressor.decompress(body), raw=False, strict_map_key=False)
+    # FORMAT_TEXT أو قيمة قديمة (نص JSON بدون بايت الصيغة): نفس السلوك السابق
+    text = (body if tag == FORMAT_TEXT else raw).decode('utf-8')
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
 
 class RedisCache:
     def __init__(self):
         self.redis_client = None
+        # نفس الـ Redis بدون decode_responses - للقيم المخزنة عبر set/get (bytes)
+        self.binary_client = None
         self.is_connected = False
     
     async def init_redis(self):
@@ -21,6 +73,15 @@ class RedisCache:
                 retry_on_timeout=False,
                 max_connections=50
             )
+            self.binary_client = redis.from_url(
+                settings.REDIS_URL,
+                decode_responses=False,
+                socket_connect_timeout=2,
+                socket_timeout=2,
+                socket_keepalive=True,
+                retry_on_timeout=False,
+                max_connections=50
+            )
 
             await self.redis_client.ping()
             self.is_connected = True
@@ -29,6 +90,7 @@ class RedisCache:
         except Exception as e:
             print(f"❌ فشل الاتصال بـ Redis: {e}")
             self.redis_client = None
+            self.binary_client = None
             self.is_connected = False
             return False
 
@@ -37,31 +99,51 @@ class RedisCache:
             return await self.init_redis()
         return True
     
-    async def set(self, key: str, value: Any, expire: int = 86400) -> bool:
+    async def set(self, key: str, value: Any, expire: int = 86400, datasets: Optional[Iterable[str]] = None) -> bool:
+        return await self.set_entry(key, value, expire, datasets) > 0
+
+    async def set_entry(self, key: str, value: Any, expire: int = 86400, datasets: Optional[Iterable[str]] = None) -> int:
+        """
+        تخزين القيمة → حجمها المخزن بالبايت (0 عند الفشل)
+        datasets (اختياري): المفتاح versioned على هذه المجموعات → نسخة أيضاً في local_cache
+        تُحذف عند زيادة إصدار أي منها (بدون datasets: Redis فقط، مثل التوكنات)
+        القيمة المحلية مشتركة بين الطلبات → لا تُعدَّل بعد القراءة
+        """
         if not await self.ensure_connection():
-            return False
+            return 0
         try:
-            if isinstance(value, (dict, list)):
-                serialized_value = json.dumps(value, ensure_ascii=False, default=str)
-            else:
-                serialized_value = str(value)
-            result = await self.redis_client.set(key, serialized_value, ex=expire)
-            return result
+            payload = encode_value(value)
+            result = await self.binary_client.set(key, payload, ex=expire)
+            if result and datasets is not None:
+                local_cache.set(key, value, len(payload), datasets, ttl=expire)
+            return len(payload) if result else 0
         except Exception as e:
             print(f"❌ خطأ في تخزين الكاش: {e}")
-            return False
+            return 0
     
-    async def get(self, key: str) -> Optional[Any]:
+    async def get(self, key: str, datasets: Optional[Iterable[str]] = None) -> Optional[Any]:
+        entry = await self.get_entry(key, datasets)
+        return entry[0] if entry else None
+
+    async def get_entry(self, key: str, datasets: Optional[Iterable[str]] = None) -> Optional[Tuple[Any, int]]:
+        """
+        القيمة + حجمها المخزن بالبايت
+        datasets (اختياري): local_cache أولاً (بدون رحلة شبكة ولا فك ترميز)، والـ hit من Redis يُحفظ فيه
+        """
+        if datasets is not None:
+            entry = local_cache.get_entry(key)
+            if entry is not None:
+                return entry
         if not await self.ensure_connection():
             return None
         try:
-            value = await self.redis_client.get(key)
-            if value is None:
+            raw = await self.binary_client.get(key)
+            if raw is None:
                 return None
-            try:
-                return json.loads(value)
-            except json.JSONDecodeError:
-                return value
+            value = decode_value(raw)
+            if datasets is not None:
+                local_cache.set(key, value, len(raw), datasets)
+            return value, len(raw)
         except Exception as e:
             print(f"❌ خطأ في جلب الكاش: {e}")
             return None
@@ -0,0 +1,346 @@
+"""
+Route Cache - cache قراءة (read-through) لمسارات FastAPI الثقيلة فوق Redis
+
+@router.get(...)
+@limiter.limit(...)
+@cached_route("rs_v2:latest", datasets=(RS, IBD))
+async def handler(...): ...
+
+- المفتاح: route:{namespace}:{إصدارات datasets}:{hash(query params بعد التطبيع)}
+  → كل مرحلة في الـ pipeline تزيد إصدار بياناتها (app/core/cache_versions.py)
+    فتصبح المفاتيح المعتمدة عليها فقط غير مستخدمة
+- single-flight: طلبات الـ miss المتزامنة في نفس الـ worker تنتظر استعلاماً واحداً،
+  وبين الـ workers قفل Redis (SET NX PX) يمنع تكرار نفس الاستعلام
+- stale-while-revalidate: بعد ttl تُعاد النسخة القديمة فوراً ويُحدَّث الـ cache في الخلفية
+  (حتى ttl + stale_ttl)
+- يُخزَّن الرد النهائي (bytes JSON) ويُعاد عند الـ hit كـ Response مباشرة
+  → بدون بناء Pydantic models ولا JSON encoding
+- conditional GET: ETag ضعيف من إصدارات datasets + query params (نفس مكونات المفتاح)
+  → If-None-Match المطابق يُرد عليه بـ 304 قبل أي قراءة من Redis أو Postgres
+  (البيانات تتغير مرة في اليوم التداولي، فمعظم طلبات الـ polling تنتهي هنا)
+  و Last-Modified = وقت بناء الرد (If-Modified-Since للعملاء بدون ETag)
+- طبقتان: local_cache في ذاكرة الـ worker (بدون شبكة ولا فك ترميز) ثم Redis
+- إذا كان Redis غير متاح يُستدعى الـ handler مباشرة
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.params import Depends as DependsParam
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache_versions import versions_tag
+from app.core.config import settings
+from app.core.local_cache import local_cache
+from app.core.redis import redis_cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "route"
+LOCK_PREFIX = "cache:lock"
+# المتصفح يحتفظ بالرد لكن يعيد التحقق (If-None-Match) في كل طلب
+CACHE_CONTROL = "no-cache"
+# اسم المعامل المضاف لتوقيع المسار عندما لا يستقبل الـ handler الـ Request بنفسه
+REQUEST_PARAM = "_cache_request"
+
+# الطلبات المنتظرة لنفس المفتاح داخل هذا الـ worker → نفس الـ Task
+_inflight: Dict[str, asyncio.Task] = {}
+# مهام التحديث في الخلفية (stale-while-revalidate) - المرجع يمنع الـ garbage collector من إيقافها
+_refreshing: Dict[str, asyncio.Task] = {}
+# عدم محاولة الاتصال بـ Redis في كل طلب عندما يكون متوقفاً
+_redis_retry_at = 0.0
+
+
+async def _redis_available() -> bool:
+    global _redis_retry_at
+    if redis_cache.is_connected and redis_cache.redis_client:
+        return True
+    if time.monotonic() < _redis_retry_at:
+        return False
+    if await redis_cache.ensure_connection():
+        return True
+    _redis_retry_at = time.monotonic() + settings.ROUTE_CACHE_RETRY_SECONDS
+    return False
+
+
+def _dependency_params(signature: inspect.Signature) -> Dict[str, Callable]:
+    """المعاملات القادمة من Depends(...) (مثل db) → دالة الـ dependency"""
+    return {
+        name: param.default.dependency
+        for name, param in signature.parameters.items()
+        if isinstance(param.default, DependsParam)
+    }
+
+
+def _query_params(signature: inspect.Signature, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """معاملات الطلب التي تحدد النتيجة: بدون Depends/Request/Response وبدون القيم الفارغة"""
+    params = {}
+    for name, param in signature.parameters.items():
+        if isinstance(param.default, DependsParam) or param.annotation in (Request, Response):
+            continue
+        value = kwargs.get(name)
+        if value is not None:
+            params[name] = value
+    return params
+
+
+def build_cache_key(namespace: str, version: str, params: Dict[str, Any]) -> str:
+    payload = json.dumps(jsonable_encoder(params), sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+    return f"{KEY_PREFIX}:{namespace}:{version}:{digest}"
+
+
+def render_json(data: Any) -> bytes:
+    """نفس bytes التي يرسلها FastAPI لهذه البيانات (JSONResponse.render)"""
+    return JSONResponse(content=data).body
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def make_weak_etag(key: str) -> str:
+    """ETag ضعيف من مفتاح الـ cache (namespace + إصدارات datasets + hash المعاملات) - لا يحتاج الـ body"""
+    return 'W/"' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:20] + '"'
+
+
+def json_response(body: bytes, etag: Optional[str] = None, last_modified: Optional[float] = None) -> Response:
+    """رد JSON جاهز (bytes) - FastAPI لا يمرره على response_model ولا يعيد ترميزه"""
+    headers = {"ETag": etag or make_etag(body)}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+        headers["Cache-Control"] = CACHE_CONTROL
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """مقارنة ضعيفة (RFC 9110): البادئة W/ لا تؤثر على التطابق"""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def _not_modified_since(if_modified_since: str, modified: float) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since is None or since.tzinfo is None:
+        return False
+    # تاريخ HTTP بدقة ثانية
+    return int(modified) <= since.timestamp()
+
+
+def _request_param(signature: inspect.Signature) -> Optional[str]:
+    for name, param in signature.parameters.items():
+        if param.annotation is Request:
+            return name
+    return None
+
+
+def _is_envelope(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get('body'), bytes)
+
+
+class cached_route:
+    """
+    Decorator لمسار FastAPI (sync أو async) يعيد نتيجة قابلة للتحويل إلى JSON
+
+    datasets: مجموعات البيانات التي تعتمد عليها النتيجة (cache_versions.PRICES, RS, ...)
+    ttl: مدة اعتبار النتيجة حديثة (ثوانٍ)
+    stale_ttl: مدة إضافية تُخدم فيها النتيجة القديمة أثناء التحديث في الخلفية
+    response_model: نفس response_model المسار - الرد المخزن يُبنى به مرة واحدة (يحوّل كائنات ORM
+                    ويحذف الحقول الزائدة كما يفعل FastAPI)
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        datasets: Iterable[str],
+        ttl: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        response_model: Any = None,
+    ):
+        self.namespace = namespace
+        self.datasets = tuple(datasets)
+        self.ttl = settings.ROUTE_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.stale_ttl = settings.ROUTE_CACHE_STALE_SECONDS if stale_ttl is None else stale_ttl
+        self.adapter = TypeAdapter(response_model) if response_model is not None else None
+
+    def __call__(self, func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        dependencies = _dependency_params(signature)
+        is_async = asyncio.iscoroutinefunction(func)
+
+        async def call_handler(kwargs: Dict[str, Any]) -> bytes:
+            result = await func(**kwargs) if is_async else await run_in_threadpool(func, **kwargs)
+            if self.adapter is not None:
+                result = self.adapter.validate_python(result, from_attributes=True)
+                return render_json(self.adapter.dump_python(result, mode='json', by_alias=True))
+            return render_json(jsonable_encoder(result))
+
+        async def call_with_fresh_dependencies(kwargs: Dict[str, Any]) -> bytes:
+            """
+            الحساب المشترك (single-flight / التحديث في الخلفية) قد يعيش بعد انتهاء الطلب
+            الذي بدأه، لذلك يستخدم sessions خاصة به من نفس دوال الـ dependency (get_db / get_async_db)
+            """
+            kwargs = dict(kwargs)
+            cleanups = []
+            try:
+                for name, dependency in dependencies.items():
+                    if inspect.isasyncgenfunction(dependency):
+                        gen = dependency()
+                        kwargs[name] = await gen.__anext__()
+                        cleanups.append(gen.aclose)
+                    elif inspect.isgeneratorfunction(dependency):
+                        gen = dependency()
+                        kwargs[name] = next(gen)
+                        cleanups.append(functools.partial(run_in_threadpool, gen.close))
+                    elif inspect.iscoroutinefunction(dependency):
+                        kwargs[name] = await dependency()
+                    else:
+                        kwargs[name] = dependency()
+                return await call_handler(kwargs)
+            finally:
+                for cleanup in reversed(cleanups):
+                    await cleanup()
+
+        request_param = _request_param(signature)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.get(request_param) if request_param else kwargs.pop(REQUEST_PARAM, None)
+            if args or not await _redis_available():
+                return await func(*args, **kwargs) if is_async else await run_in_threadpool(func, *args, **kwargs)
+
+            version = await versions_tag(self.datasets)
+            if version is None:
+                return await func(**kwargs) if is_async else await run_in_threadpool(func, **kwargs)
+            key = build_cache_key(self.namespace, version, _query_params(signature, kwargs))
+            etag = make_weak_etag(key)
+            if_none_match = request.headers.get('if-none-match') if request is not None else None
+            if if_none_match and _etag_matches(if_none_match, etag):
+                return not_modified_response(etag)
+
+            envelope = local_cache.get(key)
+            if envelope is None:
+                entry = await redis_cache.get_entry(key)
+                if entry and _is_envelope(entry[0]):
+                    envelope = entry[0]
+                    self._keep_local(key, envelope, entry[1])
+
+            if envelope is not None:
+                if envelope.get('fresh_until', 0) < time.time():
+                    self._revalidate(key, kwargs, call_with_fresh_dependencies, envelope)
+            else:
+                envelope = await self._single_flight(key, lambda: call_with_fresh_dependencies(kwargs))
+
+            modified = envelope.get('modified', time.time())
+            if_modified_since = request.headers.get('if-modified-since') if request is not None else None
+            if if_modified_since and not if_none_match and _not_modified_since(if_modified_since, modified):
+                return not_modified_response(etag)
+            return json_response(envelope['body'], etag, modified)
+
+        if request_param is None:
+            # FastAPI يقرأ توقيع wrapper → يمرر الـ Request في هذا المعامل (لا يظهر في OpenAPI)
+            extra = inspect.Parameter(REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+            wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), extra])
+        return wrapper
+
+    def _keep_local(self, key: str, envelope: dict, size: int):
+        # لا يبقى محلياً بعد انتهائه في Redis (size=0: لم يُخزن في Redis)
+        if not size:
+            return
+        ttl = envelope.get('fresh_until', 0) + self.stale_ttl - time.time()
+        local_cache.set(key, envelope, size, self.datasets, ttl=ttl)
+
+    def _revalidate(self, key: str, kwargs: Dict[str, Any], call: Callable, previous: dict):
+        if key in _inflight or key in _refreshing:
+            return
+        task = asyncio.ensure_future(self._fill(key, lambda: call(kwargs), wait=False, previous=previous))
+        _refreshing[key] = task
+        task.add_done_callback(lambda _: _refreshing.pop(key, None))
+        task.add_done_callback(_log_background_failure)
+
+    async def _single_flight(self, key: str, call: Callable) -> dict:
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fill(key, call, wait=True))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        # shield: إلغاء طلب واحد (انقطاع العميل) لا يلغي الحساب للمنتظرين الآخرين
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: str, call: Callable, wait: bool, previous: Optional[dict] = None) -> Optional[dict]:
+        """
+        يحسب الرد ويخزنه تحت قفل Redis → {'fresh_until', 'modified', 'body'}
+        - wait=True (miss): إذا كان worker آخر يحسب نفس المفتاح ننتظر نتيجته لفترة قصيرة
+        - wait=False (تحديث في الخلفية): إذا كان القفل مأخوذاً فالتحديث جارٍ بالفعل
+        previous: النسخة القديمة - إذا لم يتغير الـ body يبقى Last-Modified كما هو
+        """
+        client = redis_cache.redis_client
+        lock_key = f"{LOCK_PREFIX}:{key}"
+        token = uuid.uuid4().hex
+        lock_ms = settings.ROUTE_CACHE_LOCK_SECONDS * 1000
+
+        try:
+            acquired = await client.set(lock_key, token, nx=True, px=lock_ms)
+        except Exception:
+            acquired = True  # Redis تعطل بين الخطوات → نحسب بدون قفل
+
+        if not acquired:
+            if not wait:
+                return None
+            deadline = time.monotonic() + settings.ROUTE_CACHE_LOCK_SECONDS
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                envelope = await redis_cache.get(key)
+                if _is_envelope(envelope) and envelope.get('fresh_until', 0) >= time.time():
+                    return envelope
+            # الـ worker الآخر تأخر أو فشل → نحسب بأنفسنا
+
+        try:
+            body = await call()
+            now = time.time()
+            modified = previous['modified'] if previous and previous.get('body') == body and 'modified' in previous else now
+            envelope = {'fresh_until': now + self.ttl, 'modified': modified, 'body': body}
+            size = await redis_cache.set_entry(key, envelope, expire=self.ttl + self.stale_ttl)
+            self._keep_local(key, envelope, size)
+            return envelope
+        finally:
+            if acquired:
+                try:
+                    # حذف القفل فقط إذا كان ما زال لنا (قد ينتهي ويأخذه worker آخر)
+                    if await client.get(lock_key) == token:
+                        await client.delete(lock_key)
+                except Exception:
+                    pass
+
+
+def _log_background_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"⚠️ Background cache refresh failed: {task.exception()}")
+
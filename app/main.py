@@ -5,7 +5,8 @@ from app.api.routes import stocks, financials, cache, auth, contact, rs, rs_v2,
 # ... (Previous code)
 
 from app.core.redis import redis_cache
-from app.core.database import create_tables
+from app.core.cache_versions import QUOTES, bump_versions, start_invalidation_listener, stop_invalidation_listener
+from app.core.database import create_tables, dispose_async_engine
 from app.services.rs_rating import calculate_all_rs_ratings
 import asyncio
 from app.core.config import settings 
@@ -64,7 +65,7 @@ async def _calculate_and_save_rs(symbols: list):
         finally:
             db.close()
             
-        await redis_cache.delete("tadawul:all:Saudi Arabia")
+        await bump_versions(QUOTES)
         
     except Exception as e:
         print(f"❌ Error in background RS calculation: {e}")
@@ -137,9 +138,19 @@ async def startup_event():
     else:
         print("✅ Redis cache initialized successfully")
     
+    # إبطال local_cache عبر Redis pub/sub (يعيد المحاولة وحده إذا كان Redis متوقفاً)
+    start_invalidation_listener()
+    
     # Scheduler removed in favor of Render Cron Job
     # The daily update script is now run independently.
 
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_invalidation_listener()
+    await dispose_async_engine()
+
+
 @app.get("/")
 async def root():
     return {
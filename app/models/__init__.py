@@ -8,3 +8,4 @@ from app.models.stock_indicators import StockIndicator
 from app.models.financial_metrics import CompanyFinancialMetric
 from app.models.financial_metric_categories import FinancialMetricCategory
 from app.models.company_metric_display_settings import CompanyMetricDisplaySetting
+from app.models.screener_snapshot import ScreenerSnapshot
@@ -48,6 +48,7 @@ class RSDaily(Base):
     __table_args__ = (
         Index('idx_rs_daily_v2_symbol_date', 'symbol', 'date', unique=True),
         Index('idx_rs_daily_v2_date_rating', 'date', text('rs_rating DESC')),
+        Index('idx_rs_daily_v2_date_rating_symbol', 'date', text('rs_rating DESC'), 'symbol'),
         Index('idx_rs_daily_v2_date_rank_3m', 'date', text('rank_3m DESC')),
         Index('idx_rs_daily_v2_date_rank_12m', 'date', text('rank_12m DESC'))
     )
@@ -0,0 +1,88 @@
+"""
+Screener Snapshot Model
+صف واحد لكل سهم لآخر تاريخ في stock_indicators مع RS Rating مدمج
+وشروط كل Screener محسوبة مسبقاً - يُحدَّث في نهاية الـ pipeline الليلي
+"""
+
+from sqlalchemy import Column, String, Date, Integer, Numeric, Boolean, DateTime, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class ScreenerSnapshot(Base):
+    __tablename__ = "screener_snapshot"
+
+    symbol = Column(String(20), primary_key=True)
+    date = Column(Date, nullable=False)
+    company_name = Column(String(255), nullable=True)
+
+    # RS 12M من rs_daily_v2 لنفس التاريخ
+    rs_rating = Column(Integer, nullable=True)
+
+    # ============ Price & Moving Averages ============
+    close = Column(Numeric(12, 4), nullable=True)
+    sma_10 = Column(Numeric(12, 4), nullable=True)
+    sma_21 = Column(Numeric(12, 4), nullable=True)
+    sma_50 = Column(Numeric(12, 4), nullable=True)
+    sma_150 = Column(Numeric(12, 4), nullable=True)
+    sma_200 = Column(Numeric(12, 4), nullable=True)
+    sma_30w = Column(Numeric(12, 4), nullable=True)
+    sma_40w = Column(Numeric(12, 4), nullable=True)
+    ema10 = Column(Numeric(12, 4), nullable=True)
+    ema21 = Column(Numeric(12, 4), nullable=True)
+
+    # ============ 52-Week Stats ============
+    fifty_two_week_high = Column(Numeric(12, 4), nullable=True)
+    fifty_two_week_low = Column(Numeric(12, 4), nullable=True)
+    percent_off_52w_high = Column(Numeric(12, 4), nullable=True)
+    percent_off_52w_low = Column(Numeric(12, 4), nullable=True)
+
+    # ============ Technical Indicators ============
+    rsi_14 = Column(Numeric(12, 4), nullable=True)
+    cci = Column(Numeric(12, 4), nullable=True)
+    aroon_up = Column(Numeric(12, 4), nullable=True)
+    aroon_down = Column(Numeric(12, 4), nullable=True)
+
+    # ============ Historical 200MA ============
+    sma_200_1m_ago = Column(Numeric(12, 4), nullable=True)
+    sma_200_2m_ago = Column(Numeric(12, 4), nullable=True)
+    sma_200_3m_ago = Column(Numeric(12, 4), nullable=True)
+    sma_200_4m_ago = Column(Numeric(12, 4), nullable=True)
+    sma_200_5m_ago = Column(Numeric(12, 4), nullable=True)
+
+    # ============ Boolean Conditions ============
+    sma50_gt_sma150 = Column(Boolean, default=False)
+    sma50_gt_sma200 = Column(Boolean, default=False)
+    sma150_gt_sma200 = Column(Boolean, default=False)
+    sma200_gt_sma200_1m_ago = Column(Boolean, default=False)
+    price_gt_sma18 = Column(Boolean, default=False)
+    ema10_gt_sma50 = Column(Boolean, default=False)
+    ema10_gt_sma200 = Column(Boolean, default=False)
+    ema21_gt_sma50 = Column(Boolean, default=False)
+    ema21_gt_sma200 = Column(Boolean, default=False)
+    sma200_gt_sma200_2m_ago = Column(Boolean, default=False)
+    sma200_gt_sma200_3m_ago = Column(Boolean, default=False)
+    sma200_gt_sma200_4m_ago = Column(Boolean, default=False)
+    sma200_gt_sma200_5m_ago = Column(Boolean, default=False)
+
+    # ============ Screener Results (محسوبة مسبقاً) ============
+    trend_1_month = Column(Boolean, nullable=False, default=False)
+    trend_2_months = Column(Boolean, nullable=False, default=False)
+    trend_4_months = Column(Boolean, nullable=False, default=False)
+    trend_5_months = Column(Boolean, nullable=False, default=False)
+    trend_5_months_wide = Column(Boolean, nullable=False, default=False)
+    power_play = Column(Boolean, nullable=False, default=False)
+
+    updated_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index('idx_screener_snapshot_trend_1_month', 'trend_1_month', 'symbol'),
+        Index('idx_screener_snapshot_trend_2_months', 'trend_2_months', 'symbol'),
+        Index('idx_screener_snapshot_trend_4_months', 'trend_4_months', 'symbol'),
+        Index('idx_screener_snapshot_trend_5_months', 'trend_5_months', 'symbol'),
+        Index('idx_screener_snapshot_trend_5_months_wide', 'trend_5_months_wide', 'symbol'),
+        Index('idx_screener_snapshot_power_play', 'power_play', 'symbol'),
+    )
+
+    def __repr__(self):
+        return f"<ScreenerSnapshot(symbol={self.symbol}, date={self.date}, rs={self.rs_rating})>"
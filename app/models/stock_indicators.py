@@ -256,6 +256,7 @@ class StockIndicator(Base):
         UniqueConstraint('symbol', 'date', name='uix_stock_indicators_symbol_date'),
         Index('idx_stock_indicators_symbol', 'symbol'),
         Index('idx_stock_indicators_date', 'date'),
+        Index('idx_stock_indicators_date_symbol', 'date', 'symbol'),
         Index('idx_stock_indicators_score', 'score'),
         Index('idx_stock_indicators_final_signal', 'final_signal'),
         Index('idx_stock_indicators_trend_signal', 'trend_signal'),
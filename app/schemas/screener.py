@@ -0,0 +1,28 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Union
+
+
+class ScreenerCondition(BaseModel):
+    """
+    شرط واحد في screener مخصص:
+    {"column": "sma_50", "op": ">", "ref": "sma_200"} أو {"column": "rs_rating", "op": ">", "value": 69}
+    أو {"column": "sma_30w", "op": "not_null"}
+    """
+    column: str
+    op: str
+    value: Optional[Union[bool, float]] = None
+    ref: Optional[str] = None
+
+
+class ScreenerRunRequest(BaseModel):
+    """
+    تشغيل screener محفوظ (name) أو مخصص (conditions)
+    """
+    name: Optional[str] = None
+    conditions: Optional[List[ScreenerCondition]] = None
+    limit: int = Field(500, ge=1, le=5000)
+    offset: int = Field(0, ge=0)
+    target_date: Optional[str] = None
+    # keyset pagination: next_cursor من الرد السابق (يتجاهل offset)
+    cursor: Optional[str] = None
+    include_total: bool = False
@@ -0,0 +1,423 @@
+"""
+Price History Service
+بيانات /api/prices/history/{symbol} كأعمدة مباشرة من الـ cursor (بدون كائنات ORM أو dicts لكل صف)
+
+الصيغ:
+- json      : {"symbol", "count", "data": [{time, open, ...}, ...]}  (الافتراضي - كما كان)
+- columnar  : {"symbol", "count", "columns": {"time": [...], "open": [...], ...}}
+- msgpack   : نفس بنية columnar بترميز MessagePack
+- arrow     : Arrow IPC stream (عمود لكل حقل) - يتطلب pyarrow
+
+fields= / from / to / last تحدد الأعمدة والصفوف المقروءة من قاعدة البيانات نفسها
+max_points يقلّص عدد الشموع (OHLCV بالتجميع، والمؤشرات بـ LTTB) مع cache في local_cache لكل
+(symbol, الحقول, النطاق, الدقة, إصدارات PRICES / TECHNICALS)
+"""
+
+import io
+import json
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Float, asc, cast, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache_versions import PRICES, TECHNICALS, versions_tag
+from app.core.config import settings
+from app.core.local_cache import local_cache
+from app.models.price import Price
+from app.models.stock_indicators import StockIndicator as SI
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+
+# اسم الحقل في الاستجابة → العمود في قاعدة البيانات (الترتيب = ترتيب الاستجابة)
+HISTORY_FIELDS = {
+    'time': Price.date,
+    'open': Price.open,
+    'high': Price.high,
+    'low': Price.low,
+    'close': Price.close,
+    'volume': Price.volume_traded,
+    # ── Standard SMAs ──────────────────
+    'sma_10': SI.sma_10,
+    'sma_21': SI.sma_21,
+    'sma_50': SI.sma_50,
+    'sma_150': SI.sma_150,
+    'sma_200': SI.sma_200,
+    # ── PineScript-exact EMAs ───────────
+    'ema_10': SI.ema10,
+    'ema_21': SI.ema21,
+    # ── Historical 200MA ───────────────
+    'sma_200_1m_ago': SI.sma_200_1m_ago,
+    'sma_200_2m_ago': SI.sma_200_2m_ago,
+    'sma_200_3m_ago': SI.sma_200_3m_ago,
+    'sma_200_4m_ago': SI.sma_200_4m_ago,
+    'sma_200_5m_ago': SI.sma_200_5m_ago,
+    # ── Weekly SMAs ────────────────────
+    'sma_30w': SI.sma_30w,
+    'sma_40w': SI.sma_40w,
+    # ── Additional SMAs ────────────────
+    'sma_3': SI.sma3_rsi3,
+    'ema_20_sma3': SI.ema20_sma3,
+    # ── Price vs SMA % ──────────────────
+    'price_vs_sma_10_percent': SI.price_vs_sma_10_percent,
+    'price_vs_sma_21_percent': SI.price_vs_sma_21_percent,
+    'price_vs_sma_50_percent': SI.price_vs_sma_50_percent,
+    'price_vs_sma_150_percent': SI.price_vs_sma_150_percent,
+    'price_vs_sma_200_percent': SI.price_vs_sma_200_percent,
+    # ── 52-Week & Volume Stats ──────────────────────────────────
+    'fifty_two_week_high': SI.fifty_two_week_high,
+    'fifty_two_week_low': SI.fifty_two_week_low,
+    'average_volume_50': SI.average_volume_50,
+    'vol_diff_50_percent': SI.vol_diff_50_percent,
+    'percent_off_52w_high': SI.percent_off_52w_high,
+    'percent_off_52w_low': SI.percent_off_52w_low,
+    # ── RSI Daily ──────────────────────────────────────────────
+    'rsi_14': SI.rsi_14,
+    'sma9_rsi': SI.sma9_rsi,
+    'wma45_rsi': SI.wma45_rsi,
+    # ── RSI Weekly ─────────────────────────────────────────────
+    'rsi_w': SI.rsi_w,
+    'sma9_rsi_w': SI.sma9_rsi_w,
+    'wma45_rsi_w': SI.wma45_rsi_w,
+    # ── CCI Daily ──────────────────────────────────────────────
+    'cci': SI.cci,
+    'cci_ema20': SI.cci_ema20,
+    # ── CCI Weekly ─────────────────────────────────────────────
+    'cci_w': SI.cci_w,
+    'cci_ema20_w': SI.cci_ema20_w,
+    # ── CFG Daily ──────────────────────────────────────────────
+    'cfg': SI.cfg_daily,
+    'cfg_sma4': SI.cfg_sma4,
+    'cfg_ema45': SI.cfg_ema45,
+    # ── CFG Weekly ─────────────────────────────────────────────
+    'cfg_w': SI.cfg_w,
+    'cfg_sma4_w': SI.cfg_sma4_w,
+    'cfg_ema45_w': SI.cfg_ema45_w,
+    # ── THE.NUMBER Daily ───────────────────────────────────────
+    'the_number': SI.the_number,
+    'the_number_hl': SI.the_number_hl,
+    'the_number_ll': SI.the_number_ll,
+    # ── THE.NUMBER Weekly ──────────────────────────────────────
+    'the_number_w': SI.the_number_w,
+    'the_number_hl_w': SI.the_number_hl_w,
+    'the_number_ll_w': SI.the_number_ll_w,
+    # ── STAMP Daily ────────────────────────────────────────────
+    'stamp_s9rsi': SI.stamp_s9rsi,
+    'stamp_e45cfg': SI.stamp_e45cfg,
+    'stamp_e45rsi': SI.stamp_e45rsi,
+    'stamp_e20sma3': SI.stamp_e20sma3,
+    # ── STAMP Weekly ───────────────────────────────────────────
+    'stamp_s9rsi_w': SI.stamp_s9rsi_w,
+    'stamp_e45cfg_w': SI.stamp_e45cfg_w,
+    'stamp_e45rsi_w': SI.stamp_e45rsi_w,
+    'stamp_e20sma3_w': SI.stamp_e20sma3_w,
+    # ── Price MAs from indicators ──────────────────────────────
+    'sma4': SI.sma4,
+    'sma9': SI.sma9_close,
+    'sma18': SI.sma18,
+    'wma45_close': SI.wma45_close,
+    # ── Weekly price MAs ─────────────────────────────────────
+    'sma4_w': SI.sma4_w,
+    'sma9_w': SI.sma9_w,
+    'sma18_w': SI.sma18_w,
+    'wma45_close_w': SI.wma45_close_w,
+    # ── Aroon ─────────────────────────────────────────────────
+    'aroon_up': SI.aroon_up,
+    'aroon_down': SI.aroon_down,
+    'aroon_up_w': SI.aroon_up_w,
+    'aroon_down_w': SI.aroon_down_w,
+}
+
+FORMAT_MEDIA_TYPES = {
+    'json': 'application/json',
+    'columnar': 'application/json',
+    'msgpack': 'application/x-msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+ACCEPT_FORMATS = {
+    'application/x-msgpack': 'msgpack',
+    'application/msgpack': 'msgpack',
+    'application/vnd.apache.arrow.stream': 'arrow',
+}
+
+
+def resolve_format(fmt: Optional[str], accept: Optional[str]) -> str:
+    """?format= له الأولوية، ثم Accept header، ثم json"""
+    if fmt:
+        return fmt
+    for part in (accept or '').split(','):
+        media_type = part.split(';')[0].strip().lower()
+        if media_type in ACCEPT_FORMATS:
+            return ACCEPT_FORMATS[media_type]
+    return 'json'
+
+
+def format_available(fmt: str) -> bool:
+    if fmt == 'msgpack':
+        return MSGPACK_AVAILABLE
+    if fmt == 'arrow':
+        return ARROW_AVAILABLE
+    return True
+
+
+def _select_expr(name: str, column):
+    # NUMERIC → float8 في SQL: القاعدة ترجع float مباشرة بدلاً من Decimal لكل خلية
+    if name in ('time', 'volume'):
+        return column.label(name)
+    return cast(column, Float).label(name)
+
+
+def resolve_fields(fields: Optional[str]) -> List[str]:
+    """
+    fields=close,sma_50,rsi_14 → أسماء الحقول بترتيب HISTORY_FIELDS (time دائماً أولاً)
+    بدون fields → كل الحقول
+    """
+    if not fields:
+        return list(HISTORY_FIELDS)
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = requested - HISTORY_FIELDS.keys()
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add('time')
+    return [name for name in HISTORY_FIELDS if name in requested]
+
+
+async def fetch_history(
+    db: AsyncSession,
+    symbol: str,
+    limit: int,
+    names: Optional[List[str]] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    last: Optional[int] = None,
+) -> Tuple[List[str], List[tuple]]:
+    """
+    صفوف التاريخ (tuples بترتيب names) من prices + stock_indicators
+    - names: الحقول المطلوبة فقط (لا join على stock_indicators إذا لم يُطلب أي مؤشر)
+    - start / end: حدود التاريخ (شاملة)
+    - last: آخر N شمعة بدلاً من أول limit شمعة
+    Returns: (names, rows) بترتيب تصاعدي حسب التاريخ
+    """
+    names = names or list(HISTORY_FIELDS)
+    stmt = select(*[_select_expr(name, HISTORY_FIELDS[name]) for name in names]).select_from(Price)
+    if any(HISTORY_FIELDS[name].class_ is SI for name in names):
+        stmt = stmt.outerjoin(SI, (Price.symbol == SI.symbol) & (Price.date == SI.date))
+
+    stmt = stmt.where(Price.symbol == symbol)
+    if start:
+        stmt = stmt.where(Price.date >= start)
+    if end:
+        stmt = stmt.where(Price.date <= end)
+
+    if last:
+        # أحدث N شمعة ثم عكس الترتيب
+        rows = (await db.execute(stmt.order_by(desc(Price.date)).limit(last))).all()
+        rows.reverse()
+    else:
+        # ترتيب تصاعدي من الأقدم للأحدث
+        rows = (await db.execute(stmt.order_by(asc(Price.date)).limit(limit))).all()
+    return names, rows
+
+
+def rows_to_dicts(names: Sequence[str], rows: Sequence[tuple]) -> List[dict]:
+    """الصيغة الافتراضية: dict لكل شمعة (time كنص ISO و volume = 0 إذا كان فارغاً)"""
+    time_idx = names.index('time')
+    volume_idx = names.index('volume') if 'volume' in names else None
+    data = []
+    for row in rows:
+        item = dict(zip(names, row))
+        item['time'] = row[time_idx].isoformat()
+        if volume_idx is not None:
+            volume = row[volume_idx]
+            item['volume'] = int(volume) if volume is not None else 0
+        data.append(item)
+    return data
+
+
+def rows_to_columns(names: Sequence[str], rows: Sequence[tuple]) -> Dict[str, np.ndarray]:
+    """
+    تحويل الصفوف إلى أعمدة NumPy:
+    time → datetime64[D]، volume → int64 (فارغ = 0)، الباقي → float64 (NaN = null)
+    """
+    columns = {}
+    for name, values in zip(names, zip(*rows)):
+        if name == 'time':
+            columns[name] = np.array(values, dtype='datetime64[D]')
+        elif name == 'volume':
+            columns[name] = np.array([0 if v is None else v for v in values], dtype=np.int64)
+        else:
+            columns[name] = np.array(values, dtype=np.float64)
+    return columns
+
+
+def columns_to_dicts(columns: Dict[str, np.ndarray]) -> List[dict]:
+    """أعمدة → نفس صيغة rows_to_dicts (للاستجابة الافتراضية بعد التقليص)"""
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*[_to_list(columns[name]) for name in names])]
+
+
+# ============ Downsampling (max_points) ============
+
+# تجميع OHLCV داخل كل bucket: أول open، أعلى high، أدنى low، آخر close، مجموع volume
+OHLCV_FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+
+def _bucket_bounds(n: int, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """تقسيم n شمعة إلى max_points مجموعة متتالية غير فارغة بأحجام متقاربة"""
+    bounds = np.linspace(0, n, max_points + 1).astype(np.int64)
+    return bounds[:-1], bounds[1:]
+
+
+def _lttb_indices(x: np.ndarray, values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets على نفس الـ buckets لكل السلاسل معاً
+    x: (n,)   values: (n, S)   → فهرس الشمعة المختارة (B, S)
+    في كل bucket نختار النقطة التي تصنع أكبر مثلث مع النقطة المختارة السابقة
+    ومتوسط الـ bucket التالي (NaN = bucket بلا قيم → يبقى NaN)
+    """
+    n_buckets, n_series = len(starts), values.shape[1]
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_y = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0) / counts
+    mean_x = np.add.reduceat(x, starts) / (ends - starts)
+
+    series = np.arange(n_series)
+    out = np.empty((n_buckets, n_series), dtype=np.int64)
+    prev_x = np.full(n_series, x[0])
+    prev_y = values[0].copy()
+    for b in range(n_buckets):
+        lo, hi = starts[b], ends[b]
+        if b + 1 < n_buckets:
+            next_x, next_y = mean_x[b + 1], mean_y[b + 1]
+        else:
+            next_x, next_y = x[-1], values[-1]
+        next_y = np.where(np.isnan(next_y), mean_y[b], next_y)
+        prev_y = np.where(np.isnan(prev_y), mean_y[b], prev_y)
+
+        block_x = x[lo:hi, None]
+        area = np.abs((prev_x - next_x) * (values[lo:hi] - prev_y) - (prev_x - block_x) * (next_y - prev_y))
+        idx = np.argmax(np.where(np.isnan(area), -1.0, area), axis=0) + lo
+
+        out[b] = idx
+        prev_x = x[idx]
+        prev_y = values[idx, series]
+    return out
+
+
+def downsample(columns: Dict[str, np.ndarray], max_points: int) -> Dict[str, np.ndarray]:
+    """
+    تقليص الأعمدة إلى max_points شمعة على الأكثر:
+    - time = تاريخ أول شمعة في الـ bucket
+    - OHLCV = first / max / min / last / sum
+    - باقي المؤشرات = LTTB (تحافظ على القمم والقيعان المرئية)
+    """
+    n = len(columns['time'])
+    if n <= max_points:
+        return columns
+    starts, ends = _bucket_bounds(n, max_points)
+
+    out = {}
+    for name, arr in columns.items():
+        if name == 'time':
+            out[name] = arr[starts]
+        elif name == 'open':
+            out[name] = arr[starts]
+        elif name == 'high':
+            out[name] = np.fmax.reduceat(arr, starts)
+        elif name == 'low':
+            out[name] = np.fmin.reduceat(arr, starts)
+        elif name == 'close':
+            out[name] = arr[ends - 1]
+        elif name == 'volume':
+            out[name] = np.add.reduceat(arr, starts)
+
+    indicators = [name for name in columns if name not in OHLCV_FIELDS]
+    if indicators:
+        values = np.column_stack([columns[name] for name in indicators])
+        x = columns['time'].astype(np.int64).astype(np.float64)
+        picked = _lttb_indices(x, values, starts, ends)
+        for j, name in enumerate(indicators):
+            out[name] = values[picked[:, j], j]
+
+    # نفس ترتيب الحقول الأصلي
+    return {name: out[name] for name in columns}
+
+
+# الأعمدة بعد التقليص تُحفظ في local_cache (محدود بالبايت) مرتبطة بـ PRICES و TECHNICALS
+# → تُحذف فور زيادة أي إصدار منهما، والمفتاح يتضمن الإصدارات أيضاً
+HISTORY_DATASETS = (PRICES, TECHNICALS)
+
+
+async def downsample_cache_key(
+    symbol: str,
+    names: Sequence[str],
+    start: Optional[date],
+    end: Optional[date],
+    last: Optional[int],
+    limit: int,
+    max_points: int,
+) -> str:
+    """(symbol, الحقول, النطاق, الدقة, إصدارات البيانات) → مفتاح local_cache"""
+    tag = await versions_tag(HISTORY_DATASETS)
+    return f"price_history:{symbol}:{','.join(names)}:{start}:{end}:{last}:{limit}:{max_points}:{tag or 'v-'}"
+
+
+def get_downsampled(key: str) -> Optional[Dict[str, np.ndarray]]:
+    return local_cache.get(key)
+
+
+def set_downsampled(key: str, columns: Dict[str, np.ndarray]):
+    size = sum(arr.nbytes for arr in columns.values())
+    local_cache.set(key, columns, size, datasets=HISTORY_DATASETS, ttl=settings.PRICE_HISTORY_CACHE_SECONDS)
+
+
+def _to_list(arr: np.ndarray) -> list:
+    """مصفوفة → list مع None مكان NaN (JSON / MessagePack لا يدعمان NaN كـ null)"""
+    if arr.dtype.kind == 'M':
+        return np.datetime_as_string(arr, unit='D').tolist()
+    if arr.dtype.kind != 'f':
+        return arr.tolist()
+    nan = np.isnan(arr)
+    if not nan.any():
+        return arr.tolist()
+    out = arr.astype(object)
+    out[nan] = None
+    return out.tolist()
+
+
+def encode_columns(fmt: str, symbol: str, columns: Dict[str, np.ndarray]) -> bytes:
+    """ترميز الأعمدة حسب الصيغة المطلوبة (columnar / msgpack / arrow)"""
+    count = len(next(iter(columns.values()))) if columns else 0
+
+    if fmt == 'arrow':
+        table = pa.table({
+            name: pa.array(arr, mask=np.isnan(arr)) if arr.dtype.kind == 'f' else pa.array(arr)
+            for name, arr in columns.items()
+        })
+        table = table.replace_schema_metadata({'symbol': symbol, 'count': str(count)})
+        sink = io.BytesIO()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue()
+
+    payload = {
+        'symbol': symbol,
+        'count': count,
+        'columns': {name: _to_list(arr) for name, arr in columns.items()},
+    }
+    if fmt == 'msgpack':
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,339 @@
+"""
+Columnar Price Store
+مخزن أسعار عمودي على القرص: مصفوفة (تاريخ × رمز) لكل حقل بصيغة .npy
+
+Batch calculators (RS, technicals, IBD, historical indicators) read OHLCV from
+memory-mapped matrices instead of re-running pd.read_sql over the whole
+prices table. The nightly pipeline only appends the new trading day.
+
+Layout (settings.PRICE_STORE_DIR):
+    dates.npy           datetime64[D]  (n_dates,)   global trading calendar, ascending
+    symbols.json        {"symbols": [...], "meta": {symbol: {company_name, ...}}}
+    <field>.npy         float64        (n_dates, n_symbols), NaN = no row in prices
+"""
+import io
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# store field -> prices column
+FIELDS = {
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'close': 'close',
+    'volume': 'volume_traded',
+}
+META_FIELDS = ('company_name', 'industry_group', 'sector', 'industry', 'sub_industry')
+
+
+class PriceStore:
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.PRICE_STORE_DIR)
+        self.dates: Optional[np.ndarray] = None
+        self.symbols: Optional[np.ndarray] = None
+        self.meta: Dict[str, Dict[str, Optional[str]]] = {}
+        self._symbol_pos: Dict[str, int] = {}
+        self._matrices: Dict[str, np.ndarray] = {}
+
+    # ------------------------------------------------------------------ #
+    # Read side
+    # ------------------------------------------------------------------ #
+    def exists(self) -> bool:
+        return (self.root / 'dates.npy').exists() and (self.root / 'symbols.json').exists() and \
+            all((self.root / f'{field}.npy').exists() for field in FIELDS)
+
+    def open(self) -> 'PriceStore':
+        """Load the index files; field matrices are memory-mapped lazily."""
+        self.dates = np.load(self.root / 'dates.npy')
+        with open(self.root / 'symbols.json', 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self.symbols = np.array(index['symbols'], dtype=object)
+        self.meta = index.get('meta', {})
+        self._symbol_pos = {s: i for i, s in enumerate(self.symbols)}
+        self._matrices = {}
+        return self
+
+    @property
+    def last_date(self):
+        if self.dates is None or len(self.dates) == 0:
+            return None
+        return pd.Timestamp(self.dates[-1]).date()
+
+    def matrix(self, field: str) -> np.ndarray:
+        """Read-only (n_dates, n_symbols) memmap for a field."""
+        if field not in self._matrices:
+            self._matrices[field] = np.load(self.root / f'{field}.npy', mmap_mode='r')
+        return self._matrices[field]
+
+    def _row_slice(self, start=None, end=None) -> slice:
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start).date()), 'left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end).date()), 'right'))
+        return slice(lo, hi)
+
+    def _columns(self, symbols: Optional[Sequence[str]]):
+        if symbols is None:
+            return slice(None), self.symbols
+        cols = [self._symbol_pos[s] for s in symbols if s in self._symbol_pos]
+        return np.array(cols, dtype=np.intp), self.symbols[cols]
+
+    def frame(self, field: str, start=None, end=None, symbols: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Wide frame (Rows=Date, Cols=Symbol). Without a symbol filter the values are a view of the memmap."""
+        rows = self._row_slice(start, end)
+        cols, col_symbols = self._columns(symbols)
+        values = self.matrix(field)[rows]
+        if not isinstance(cols, slice):
+            values = values[:, cols]
+        return pd.DataFrame(
+            values,
+            index=pd.DatetimeIndex(self.dates[rows], name='date'),
+            columns=pd.Index(col_symbols, name='symbol'),
+            copy=False,
+        )
+
+    def long_frame(
+        self,
+        fields: Sequence[str] = tuple(FIELDS),
+        start=None,
+        end=None,
+        symbols: Optional[Sequence[str]] = None,
+        include_meta: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Long frame shaped like `SELECT symbol, date, <fields> FROM prices ORDER BY symbol, date`.
+        Rows exist where close is present; columns use the prices names (volume -> volume_traded).
+        """
+        rows = self._row_slice(start, end)
+        cols, col_symbols = self._columns(symbols)
+
+        def block(field):
+            values = self.matrix(field)[rows]
+            return values if isinstance(cols, slice) else values[:, cols]
+
+        # Transposed (symbol, date) order gives ORDER BY symbol, date for free
+        present = ~np.isnan(block('close')).T
+        sym_idx, date_idx = np.nonzero(present)
+
+        data = {
+            'symbol': np.asarray(col_symbols)[sym_idx],
+            'date': pd.DatetimeIndex(self.dates[rows][date_idx]),
+        }
+        for field in fields:
+            data[FIELDS[field]] = block(field).T[present]
+
+        df = pd.DataFrame(data)
+        if include_meta:
+            for meta_col in META_FIELDS:
+                mapping = {s: m.get(meta_col) for s, m in self.meta.items()}
+                df[meta_col] = df['symbol'].map(mapping)
+        return df
+
+    # ------------------------------------------------------------------ #
+    # Write side
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _read_prices(engine, where: str = '', params: Optional[dict] = None) -> pd.DataFrame:
+        query = f"""
+            SELECT symbol, date, {', '.join(FIELDS.values())}, {', '.join(META_FIELDS)}
+            FROM prices
+            {where}
+            ORDER BY date, symbol
+        """
+        with engine.connect() as conn:
+            df = pd.read_sql(text(query), conn, params=params or {})
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    @staticmethod
+    def _pivot(df: pd.DataFrame, field: str, dates: np.ndarray, symbols: np.ndarray) -> np.ndarray:
+        wide = df.pivot(index='date', columns='symbol', values=FIELDS[field])
+        wide = wide.reindex(index=pd.DatetimeIndex(dates), columns=symbols)
+        return np.ascontiguousarray(wide.to_numpy(dtype=np.float64))
+
+    def _update_meta(self, df: pd.DataFrame):
+        latest = df.drop_duplicates(subset=['symbol'], keep='last')
+        for rec in latest[['symbol', *META_FIELDS]].itertuples(index=False):
+            self.meta[str(rec[0])] = {
+                col: (None if pd.isna(val) else str(val)) for col, val in zip(META_FIELDS, rec[1:])
+            }
+
+    def _write_index(self):
+        tmp = self.root / 'symbols.json.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'symbols': [str(s) for s in self.symbols], 'meta': self.meta}, f, ensure_ascii=False)
+        os.replace(tmp, self.root / 'symbols.json')
+
+    def _write_array(self, name: str, arr: np.ndarray):
+        tmp = self.root / f'{name}.npy.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, arr)
+        os.replace(tmp, self.root / f'{name}.npy')
+
+    def _write_all(self, dates: np.ndarray, symbols: np.ndarray, matrices: Dict[str, np.ndarray]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        for field, arr in matrices.items():
+            self._write_array(field, arr)
+        self.symbols = symbols
+        self._write_index()
+        self._write_array('dates', dates.astype('datetime64[D]'))
+        self.open()
+
+    @staticmethod
+    def _append_header(path: Path, rows: np.ndarray) -> Optional[bytes]:
+        """
+        New .npy header for appending `rows` to a C-order array in place, or None
+        if the file is incompatible or the header would change size.
+        """
+        with open(path, 'rb') as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            header_len = f.tell()
+        if fortran or dtype != rows.dtype or tuple(shape[1:]) != rows.shape[1:]:
+            return None
+
+        header = io.BytesIO()
+        header_data = {
+            'descr': np.lib.format.dtype_to_descr(dtype),
+            'fortran_order': False,
+            'shape': (shape[0] + rows.shape[0],) + tuple(shape[1:]),
+        }
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, header_data)
+        else:
+            np.lib.format.write_array_header_2_0(header, header_data)
+        return header.getvalue() if len(header.getvalue()) == header_len else None
+
+    @staticmethod
+    def _append_rows(path: Path, header: bytes, rows: np.ndarray):
+        with open(path, 'r+b') as f:
+            f.seek(0, os.SEEK_END)
+            f.write(np.ascontiguousarray(rows).tobytes())
+            f.seek(0)
+            f.write(header)
+
+    def rebuild(self, engine) -> int:
+        """Build the whole store from the prices table (one full read)."""
+        logger.info("⏳ Building columnar price store from prices...")
+        df = self._read_prices(engine)
+        if df.empty:
+            logger.warning("⚠️ prices is empty, nothing to store.")
+            return 0
+
+        dates = np.sort(df['date'].unique()).astype('datetime64[D]')
+        symbols = np.array(sorted(df['symbol'].astype(str).unique()), dtype=object)
+        df['symbol'] = df['symbol'].astype(str)
+        matrices = {field: self._pivot(df, field, dates, symbols) for field in FIELDS}
+
+        self.meta = {}
+        self._update_meta(df)
+        self._write_all(dates, symbols, matrices)
+        logger.info(f"✅ Price store built: {len(dates)} dates × {len(symbols)} symbols at {self.root}")
+        return len(df)
+
+    def _merge_rows(self, df: pd.DataFrame) -> int:
+        """Write the rows of df (one or more trading days) into the store."""
+        if df.empty:
+            return 0
+        df = df.copy()
+        df['symbol'] = df['symbol'].astype(str)
+        self._update_meta(df)
+
+        new_dates = np.sort(df['date'].unique()).astype('datetime64[D]')
+        new_symbols = sorted(set(df['symbol']) - set(self._symbol_pos))
+        existing = np.isin(new_dates, self.dates)
+        appended = new_dates[~existing]
+
+        if new_symbols or (len(appended) and len(self.dates) and appended[0] <= self.dates[-1]):
+            # New listing or back-dated rows: rewrite with the widened/re-sorted layout
+            symbols = np.concatenate([self.symbols, np.array(new_symbols, dtype=object)])
+            dates = np.union1d(self.dates, new_dates)
+            matrices = {}
+            for field in FIELDS:
+                current = pd.DataFrame(np.asarray(self.matrix(field)), index=pd.DatetimeIndex(self.dates), columns=self.symbols)
+                current = current.reindex(index=pd.DatetimeIndex(dates), columns=symbols)
+                update = df.pivot(index='date', columns='symbol', values=FIELDS[field])
+                current.loc[update.index, update.columns] = update
+                matrices[field] = np.ascontiguousarray(current.to_numpy(dtype=np.float64))
+            self._matrices = {}
+            self._write_all(dates, symbols, matrices)
+            return len(df)
+
+        # Re-scraped days already in the store: overwrite their rows in place
+        if existing.any():
+            positions = np.searchsorted(self.dates, new_dates[existing])
+            for field in FIELDS:
+                block = self._pivot(df, field, new_dates[existing], self.symbols)
+                mm = np.load(self.root / f'{field}.npy', mmap_mode='r+')
+                mm[positions] = block
+                mm.flush()
+                del mm
+
+        # New trading days: append rows to every matrix, then extend the calendar
+        if len(appended):
+            self._matrices = {}
+            blocks = {field: self._pivot(df, field, appended, self.symbols) for field in FIELDS}
+            blocks['dates'] = appended
+            headers = {name: self._append_header(self.root / f'{name}.npy', rows) for name, rows in blocks.items()}
+
+            if any(h is None for h in headers.values()):
+                logger.warning("⚠️ In-place append not possible, rewriting store files.")
+                dates = np.concatenate([self.dates, appended])
+                matrices = {f: np.concatenate([np.asarray(self.matrix(f)), blocks[f]]) for f in FIELDS}
+                self._write_all(dates, self.symbols, matrices)
+                return len(df)
+
+            # dates.npy last: readers only see the new rows once the calendar covers them
+            for name in [*FIELDS, 'dates']:
+                self._append_rows(self.root / f'{name}.npy', headers[name], blocks[name])
+
+        self._write_index()
+        self.open()
+        return len(df)
+
+    def append_date(self, engine, market_date) -> int:
+        """Append (or overwrite) a single trading day from prices."""
+        df = self._read_prices(engine, 'WHERE date = :d', {'d': market_date})
+        saved = self._merge_rows(df)
+        logger.info(f"✅ Price store updated for {market_date} ({saved} symbols).")
+        return saved
+
+    def sync(self, engine) -> int:
+        """Append every trading day in prices newer than the store's last date."""
+        with engine.connect() as conn:
+            max_date = conn.execute(text("SELECT MAX(date) FROM prices")).scalar()
+        if max_date is None or (self.last_date is not None and pd.Timestamp(max_date).date() <= self.last_date):
+            return 0
+        df = self._read_prices(engine, 'WHERE date > :d', {'d': self.last_date})
+        saved = self._merge_rows(df)
+        logger.info(f"✅ Price store synced up to {max_date} ({saved} new rows).")
+        return saved
+
+
+def load_price_store(engine) -> Optional[PriceStore]:
+    """
+    Open the columnar store if it has been built, appending any trading days that
+    reached prices since its last update. Returns None so callers fall back to SQL.
+    """
+    store = PriceStore()
+    if not store.exists():
+        return None
+    try:
+        store.open()
+        store.sync(engine)
+        return store
+    except Exception as e:
+        logger.warning(f"⚠️ Price store unavailable, falling back to SQL: {e}")
+        return None
@@ -0,0 +1,162 @@
+"""
+Screener DSL - تعريف الـ Screeners كبيانات بدلاً من سلاسل and_ مكتوبة يدوياً
+كل شرط: {"column": ..., "op": ..., "value": رقم} أو {"column": ..., "op": ..., "ref": عمود آخر}
+أو {"column": ..., "op": "not_null"}
+
+يُترجم كل screener مرة واحدة (مع cache) إلى:
+- شروط SQLAlchemy على stock_indicators + rs_daily_v2 (للتواريخ التاريخية و screener_snapshot)
+- قناع NumPy على CrossSection في screener_engine (لآخر تاريخ)
+بنفس المعنى: أي مقارنة مع NULL/NaN = False
+"""
+
+import json
+import operator
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Tuple
+
+import numpy as np
+from sqlalchemy import Boolean, Integer, Numeric
+
+from app.models.rs_daily import RSDaily
+from app.models.stock_indicators import StockIndicator as SI
+
+DEFINITIONS_PATH = Path(__file__).with_name('screener_definitions.json')
+
+# نفس الدالة تعمل على أعمدة SQLAlchemy (→ تعبير SQL) وعلى مصفوفات NumPy (→ قناع)
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '=': operator.eq,
+    '!=': operator.ne,
+}
+NOT_NULL = 'not_null'
+
+
+class ScreenerDefinitionError(ValueError):
+    """شرط غير صالح (عمود أو عملية أو قيمة غير مدعومة)"""
+
+
+def _screenable_columns() -> Dict[str, bool]:
+    """الأعمدة المسموح بها → هل هي Boolean"""
+    columns = {'rs_rating': False}
+    for col in SI.__table__.columns:
+        if col.name != 'id' and isinstance(col.type, (Numeric, Integer, Boolean)):
+            columns[col.name] = isinstance(col.type, Boolean)
+    return columns
+
+
+SCREENABLE_COLUMNS = _screenable_columns()
+
+Condition = Tuple[str, str, str, Any]  # (column, op, 'value' | 'ref' | '', operand)
+
+
+def _normalize_condition(raw: Mapping[str, Any]) -> Condition:
+    column, op = raw.get('column'), raw.get('op')
+    if column not in SCREENABLE_COLUMNS:
+        raise ScreenerDefinitionError(f"Unknown column: {column}")
+    is_bool = SCREENABLE_COLUMNS[column]
+
+    if op == NOT_NULL:
+        return column, op, '', None
+    if op not in OPERATORS:
+        raise ScreenerDefinitionError(f"Unsupported operator: {op}")
+    if is_bool and op not in ('=', '!='):
+        raise ScreenerDefinitionError(f"Boolean column {column} only supports '=' and '!='")
+
+    has_value, has_ref = raw.get('value') is not None, raw.get('ref') is not None
+    if has_value == has_ref:
+        raise ScreenerDefinitionError(f"Condition on {column} needs exactly one of 'value' or 'ref'")
+
+    if has_ref:
+        ref = raw['ref']
+        if ref not in SCREENABLE_COLUMNS or SCREENABLE_COLUMNS[ref] != is_bool:
+            raise ScreenerDefinitionError(f"Invalid column reference: {ref}")
+        return column, op, 'ref', ref
+
+    value = raw['value']
+    if is_bool != isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ScreenerDefinitionError(f"Invalid value for {column}: {value!r}")
+    return column, op, 'value', value
+
+
+def _sql_column(name: str):
+    return RSDaily.rs_rating if name == 'rs_rating' else getattr(SI, name)
+
+
+class CompiledScreener:
+    """
+    screener مترجم: conditions مرتبة (tuple) تصلح كمفتاح cache
+    """
+
+    def __init__(self, conditions: Tuple[Condition, ...]):
+        self.conditions = conditions
+        self.key = conditions
+        self._sql_criteria = None
+
+    def sql_criteria(self) -> list:
+        """شروط SQLAlchemy (تُستخدم مع outerjoin على rs_daily_v2) - تُبنى مرة واحدة"""
+        if self._sql_criteria is None:
+            criteria = []
+            for column, op, kind, operand in self.conditions:
+                col = _sql_column(column)
+                if op == NOT_NULL:
+                    criteria.append(col.isnot(None))
+                else:
+                    criteria.append(OPERATORS[op](col, _sql_column(operand) if kind == 'ref' else operand))
+            self._sql_criteria = criteria
+        return self._sql_criteria
+
+    def mask(self, cs) -> np.ndarray:
+        """قناع منطقي على CrossSection (الأعمدة float64 مع NaN = NULL)"""
+        mask = np.ones(len(cs), dtype=bool)
+        for column, op, kind, operand in self.conditions:
+            values = cs.column(column)
+            if op == NOT_NULL:
+                mask &= ~np.isnan(values)
+            else:
+                other = cs.column(operand) if kind == 'ref' else float(operand)
+                with np.errstate(invalid='ignore'):
+                    mask &= OPERATORS[op](values, other)
+                # NaN != x = True في NumPy لكن NULL != x = NULL في SQL
+                mask &= ~np.isnan(values)
+                if kind == 'ref':
+                    mask &= ~np.isnan(other)
+        return mask
+
+    def indices(self, cs) -> np.ndarray:
+        return np.flatnonzero(self.mask(cs))
+
+
+@lru_cache(maxsize=256)
+def _compile(conditions: Tuple[Condition, ...]) -> CompiledScreener:
+    return CompiledScreener(conditions)
+
+
+def compile_screener(conditions: Iterable[Mapping[str, Any]]) -> CompiledScreener:
+    """
+    ترجمة قائمة شروط (من JSON أو من طلب API) → CompiledScreener
+    الشروط المتطابقة (بأي ترتيب) تعيد نفس الكائن المترجم من الـ cache
+    """
+    normalized = tuple(sorted(set(_normalize_condition(c) for c in conditions), key=repr))
+    if not normalized:
+        raise ScreenerDefinitionError("Screener needs at least one condition")
+    return _compile(normalized)
+
+
+def load_screener_definitions(path: Path = DEFINITIONS_PATH) -> Dict[str, dict]:
+    """قراءة تعريفات الـ Screeners المحفوظة: {name: {"title", "conditions"}}"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+SCREENER_DEFINITIONS = load_screener_definitions()
+
+# اسم الـ screener (= اسم العمود في screener_snapshot) → الشروط المترجمة
+SCREENERS: Dict[str, CompiledScreener] = {
+    name: compile_screener(definition['conditions'])
+    for name, definition in SCREENER_DEFINITIONS.items()
+}
+SCREENER_TITLES: Dict[str, str] = {name: d['title'] for name, d in SCREENER_DEFINITIONS.items()}
@@ -0,0 +1,167 @@
+"""
+Screener Engine - نسخة في الذاكرة من آخر تاريخ في stock_indicators + rs_daily_v2
+- تُحمَّل مرة واحدة لكل يوم تداول كأعمدة NumPy (صف لكل سهم، مرتبة حسب symbol)
+- كل screener = قناع منطقي (boolean mask) على الأعمدة بدلاً من استعلام SQL (انظر screener_dsl)
+- تُعاد التحميل تلقائياً عندما يكتب الـ pipeline تاريخاً جديداً أو يحدّث الـ snapshot
+  أو يزيد إصدار TECHNICALS / STOCK_INDICATORS / RS (إعادة حساب نفس التاريخ، backfill، RS)
+  (يُفحص ذلك كل SCREENER_ENGINE_CHECK_SECONDS ثانية على الأكثر)
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Boolean, Integer, Numeric, func
+from sqlalchemy.orm import Session
+
+from app.core.cache_versions import RS, STOCK_INDICATORS, TECHNICALS, read_dataset_versions
+from app.core.config import settings
+from app.models.rs_daily import RSDaily
+from app.models.screener_snapshot import ScreenerSnapshot
+from app.models.stock_indicators import StockIndicator as SI
+from app.services.screener_dsl import SCREENERS
+from app.services.screener_snapshot import _rs_join
+
+logger = logging.getLogger(__name__)
+
+# نفس مجموعات البيانات التي تعتمد عليها مسارات الـ screeners في route_cache
+ENGINE_DATASETS = (TECHNICALS, STOCK_INDICATORS, RS)
+
+
+class CrossSection:
+    """
+    لقطة ثابتة (immutable) لآخر تاريخ: الصفوف الأصلية + أعمدة NumPy
+    - الأعمدة الرقمية والمنطقية float64 (True/False = 1/0) مع NaN مكان NULL
+      → أي مقارنة مع NaN = False مثل SQL
+    """
+
+    def __init__(self, target_date, rows: List[SI], rs_ratings: List[Optional[int]]):
+        self.date = target_date
+        self.rows = rows
+        self.rs_ratings = rs_ratings
+        self.symbols = np.array([row.symbol for row in rows], dtype=object)
+        self._columns: Dict[str, np.ndarray] = {
+            'rs_rating': np.array([np.nan if v is None else v for v in rs_ratings], dtype=np.float64),
+        }
+        self._views: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def column(self, name: str) -> np.ndarray:
+        """عمود كمصفوفة NumPy (يُبنى عند أول طلب ثم يُحفظ)"""
+        arr = self._columns.get(name)
+        if arr is None:
+            column_type = SI.__table__.columns[name].type
+            values = [getattr(row, name) for row in self.rows]
+            if isinstance(column_type, (Numeric, Integer, Boolean)):
+                arr = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                arr = np.array(values, dtype=object)
+            self._columns[name] = arr
+        return arr
+
+    def view(self, key: Hashable, builder: Callable[['CrossSection'], Any]) -> Any:
+        """
+        نتيجة محسوبة مرة واحدة لكل لقطة (مثل قوائم الـ dicts الجاهزة للـ API أو فهارس screener)
+        """
+        try:
+            return self._views[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._views:
+                self._views[key] = builder(self)
+            return self._views[key]
+
+
+def screener_indices(cs: CrossSection, name: str) -> np.ndarray:
+    """فهارس الأسهم المطابقة لـ screener محفوظ (محسوبة مرة واحدة لكل لقطة)"""
+    return cs.view(('screener', name), SCREENERS[name].indices)
+
+
+class ScreenerEngine:
+    """
+    يحتفظ بآخر CrossSection ويعيد تحميلها عند تغيّر (MAX(date), MAX(snapshot.updated_at), إصدارات الـ cache)
+    - الفحص مقيد بـ check_seconds حتى لا يصل كل طلب إلى قاعدة البيانات
+    - أثناء إعادة التحميل تستمر الطلبات الأخرى في استخدام اللقطة الحالية
+    """
+
+    def __init__(self, check_seconds: Optional[float] = None):
+        self.check_seconds = settings.SCREENER_ENGINE_CHECK_SECONDS if check_seconds is None else check_seconds
+        self._current: Optional[CrossSection] = None
+        self._marker: Optional[Tuple] = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """فرض الفحص عند الطلب التالي (مثلاً بعد تحديث البيانات من نفس العملية)"""
+        self._checked_at = float('-inf')
+
+    def get(self, db: Session) -> Optional[CrossSection]:
+        """
+        آخر لقطة صالحة، أو None إذا لم تكن هناك بيانات (المستدعي يرجع إلى SQL)
+        """
+        current = self._current
+        if current is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return current
+
+        # طلب آخر يفحص/يحمّل الآن → نخدم اللقطة الحالية بدل الانتظار
+        if not self._lock.acquire(blocking=current is None):
+            return current
+        try:
+            if self._current is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return self._current
+
+            marker = self._read_marker(db)
+            if marker[0] is None:
+                self._current, self._marker = None, None
+                return None
+
+            if self._current is None or marker != self._marker:
+                started = time.perf_counter()
+                self._current = self._load(db, marker[0])
+                self._marker = marker
+                logger.info(
+                    f"✅ Screener engine loaded {len(self._current)} symbols for {marker[0]} "
+                    f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+                )
+            self._checked_at = time.monotonic()
+            return self._current
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _read_marker(db: Session) -> Tuple:
+        latest = db.query(func.max(SI.date)).scalar()
+        try:
+            refreshed = db.query(func.max(ScreenerSnapshot.updated_at)).scalar()
+        except Exception:
+            # جدول الـ snapshot غير موجود بعد (migration لم تُطبَّق)
+            db.rollback()
+            refreshed = None
+        # الكتابات التي لا تغيّر التاريخ ولا الـ snapshot تزيد الإصدارات (None بدون Redis)
+        versions = read_dataset_versions(ENGINE_DATASETS)
+        return latest, refreshed, None if versions is None else tuple(versions)
+
+    @staticmethod
+    def _load(db: Session, target_date) -> CrossSection:
+        results = (
+            db.query(SI, RSDaily.rs_rating)
+            .outerjoin(RSDaily, _rs_join())
+            .filter(SI.date == target_date)
+            .order_by(SI.symbol)
+            .all()
+        )
+        rows = [ind for ind, _ in results]
+        # فصل الكائنات عن الـ session حتى تبقى صالحة بعد انتهاء الطلب
+        for ind in rows:
+            db.expunge(ind)
+        return CrossSection(target_date, rows, [rs for _, rs in results])
+
+
+# نسخة واحدة لكل worker
+screener_engine = ScreenerEngine()
@@ -0,0 +1,138 @@
+"""
+Screener Snapshot Service
+- شروط الـ Screeners من screener_dsl (مصدر واحد يستخدمه الـ API والـ snapshot والمحرك)
+- تحديث جدول screener_snapshot لآخر تاريخ في stock_indicators
+- قراءة نتائج screener من الـ snapshot باستعلام واحد
+"""
+
+import logging
+from typing import List, Optional, Tuple, Union
+
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.cache_versions import STOCK_INDICATORS, bump_dataset_versions
+from app.models.rs_daily import RSDaily
+from app.models.screener_snapshot import ScreenerSnapshot
+from app.models.stock_indicators import StockIndicator as SI
+from app.services.screener_dsl import SCREENERS, CompiledScreener
+
+logger = logging.getLogger(__name__)
+
+
+# الأعمدة المنسوخة من stock_indicators كما هي (نفس حقول screener_to_dict)
+SNAPSHOT_COLUMNS = [
+    'company_name', 'close',
+    'sma_10', 'sma_21', 'sma_50', 'sma_150', 'sma_200', 'sma_30w', 'sma_40w', 'ema10', 'ema21',
+    'fifty_two_week_high', 'fifty_two_week_low', 'percent_off_52w_high', 'percent_off_52w_low',
+    'rsi_14', 'cci', 'aroon_up', 'aroon_down',
+    'sma_200_1m_ago', 'sma_200_2m_ago', 'sma_200_3m_ago', 'sma_200_4m_ago', 'sma_200_5m_ago',
+    'sma50_gt_sma150', 'sma50_gt_sma200', 'sma150_gt_sma200', 'sma200_gt_sma200_1m_ago',
+    'price_gt_sma18', 'ema10_gt_sma50', 'ema10_gt_sma200', 'ema21_gt_sma50', 'ema21_gt_sma200',
+    'sma200_gt_sma200_2m_ago', 'sma200_gt_sma200_3m_ago', 'sma200_gt_sma200_4m_ago', 'sma200_gt_sma200_5m_ago',
+]
+
+
+def _rs_join():
+    return and_(RSDaily.symbol == SI.symbol, RSDaily.date == SI.date)
+
+
+def query_screener_live(db: Session, screener: Union[str, CompiledScreener], target_date):
+    """
+    استعلام مباشر على stock_indicators (للتواريخ التاريخية أو قبل بناء الـ snapshot)
+    screener: اسم screener محفوظ أو شروط مخصصة مترجمة
+    Returns: query يعيد (StockIndicator, rs_rating)
+    """
+    if isinstance(screener, str):
+        screener = SCREENERS[screener]
+    return (
+        db.query(SI, RSDaily.rs_rating)
+        .outerjoin(RSDaily, _rs_join())
+        .filter(SI.date == target_date)
+        .filter(and_(*screener.sql_criteria()))
+    )
+
+
+def read_screener_snapshot(
+    db: Session,
+    name: str,
+    limit: int,
+    offset: int,
+    after: Optional[str] = None,
+    with_total: bool = True,
+) -> Optional[Tuple[List[ScreenerSnapshot], Optional[int], bool]]:
+    """
+    قراءة نتائج screener من الـ snapshot مرتبة بالرمز
+    - الصفحة الأولى: استعلام واحد (العدد الكلي عبر window function)
+    - after (keyset): الصفوف بعد هذا الرمز عبر فهرس (flag, symbol) - العدد فقط إذا with_total
+    Returns: (rows, total, has_more) أو None إذا لم يُبنَ الـ snapshot بعد
+    """
+    flag = getattr(ScreenerSnapshot, name)
+    query = db.query(ScreenerSnapshot).filter(flag.is_(True))
+    if after is not None:
+        query = query.filter(ScreenerSnapshot.symbol > after)
+        # window function هنا ستعدّ الصفوف بعد الـ cursor فقط
+        rows = query.order_by(ScreenerSnapshot.symbol).limit(limit + 1).all()
+        total = db.query(func.count()).select_from(ScreenerSnapshot).filter(flag.is_(True)).scalar() if with_total else None
+        if not rows and db.query(ScreenerSnapshot.symbol).first() is None:
+            return None
+        return rows[:limit], total, len(rows) > limit
+
+    rows = (
+        query.add_columns(func.count().over().label('total'))
+        .order_by(ScreenerSnapshot.symbol)
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+    if rows:
+        return [row[0] for row in rows[:limit]], rows[0][1], len(rows) > limit
+
+    # لا نتائج: إما الصفحة بعد النهاية، أو الـ snapshot فارغ
+    if db.query(ScreenerSnapshot.symbol).first() is None:
+        return None
+    total = db.query(func.count()).select_from(ScreenerSnapshot).filter(flag.is_(True)).scalar() if offset else 0
+    return [], total, False
+
+
+def refresh_screener_snapshot(db: Session, target_date=None) -> int:
+    """
+    إعادة بناء screener_snapshot من stock_indicators + rs_daily_v2 لآخر تاريخ
+    (أو target_date) داخل transaction واحدة - القراء يرون الـ snapshot القديم حتى الـ commit
+    """
+    if target_date is None:
+        target_date = db.query(func.max(SI.date)).scalar()
+    if target_date is None:
+        logger.warning("⚠️ No stock_indicators data - screener snapshot not refreshed")
+        return 0
+
+    flags = [
+        func.coalesce(and_(*screener.sql_criteria()), False).label(name)
+        for name, screener in SCREENERS.items()
+    ]
+    source = (
+        select(
+            SI.symbol,
+            SI.date,
+            RSDaily.rs_rating,
+            *[getattr(SI, col) for col in SNAPSHOT_COLUMNS],
+            *flags,
+        )
+        .select_from(SI)
+        .outerjoin(RSDaily, _rs_join())
+        .where(SI.date == target_date)
+    )
+    target_columns = ['symbol', 'date', 'rs_rating', *SNAPSHOT_COLUMNS, *SCREENERS]
+
+    try:
+        db.execute(delete(ScreenerSnapshot))
+        result = db.execute(insert(ScreenerSnapshot).from_select(target_columns, source))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    # بعد الـ commit: نتائج /screeners المخزنة تعتمد على إصدار STOCK_INDICATORS
+    bump_dataset_versions(STOCK_INDICATORS)
+    logger.info(f"✅ Screener snapshot refreshed for {target_date} ({result.rowcount} symbols)")
+    return result.rowcount
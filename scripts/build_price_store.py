@@ -0,0 +1,42 @@
+"""
+Build / Sync the Columnar Price Store
+بناء أو تحديث مخزن الأسعار العمودي المستخدم في الحسابات الدفعية
+"""
+import sys
+import logging
+import argparse
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from app.core.config import settings
+from app.services.price_store import PriceStore
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or sync the columnar price store')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the whole store from prices (after back-dated corrections)')
+    parser.add_argument('--date', type=str, help='Re-load a single trading day (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    engine = create_engine(str(settings.DATABASE_URL))
+    store = PriceStore()
+
+    if args.rebuild or not store.exists():
+        store.rebuild(engine)
+    elif args.date:
+        store.open().append_date(engine, args.date)
+    else:
+        store.open().sync(engine)
+
+    store.open()
+    logger.info(f"📦 {store.root}: {len(store.dates)} dates × {len(store.symbols)} symbols (last: {store.last_date})")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,10 @@ from sqlalchemy.orm import Session
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from app.core.database import SessionLocal
+from app.core.cache_versions import IBD, bump_dataset_versions
 from app.models.rs_daily import RSDaily
 from app.models.price import Price
+from app.services.price_store import load_price_store
 
 # Logging Setup
 logging.basicConfig(level=logging.INFO)
@@ -44,13 +46,23 @@ class IBDMetricsCalculator:
     def load_data(self, lookback_days=200):
         """Load Price data for calculation."""
         logger.info("📡 Loading Price Data...")
+        start_date = date.today() - timedelta(days=lookback_days)
+        
+        store = load_price_store(self.db.bind)
+        if store is not None:
+            # Hierarchy columns come from each symbol's latest prices row
+            df = store.long_frame(['close', 'high', 'low', 'volume'], start=start_date, include_meta=True)
+            df = df[['symbol', 'date', 'close', 'high', 'low', 'volume_traded',
+                     'industry_group', 'sector', 'industry', 'sub_industry']]
+            logger.info(f"📊 Loaded {len(df)} price records from the columnar store.")
+            return df
+        
         query = text("""
             SELECT symbol, date, close, high, low, volume_traded, industry_group, sector, industry, sub_industry
             FROM prices
             WHERE date >= :start_date
             ORDER BY symbol, date ASC
         """)
-        start_date = date.today() - timedelta(days=lookback_days)
         
         # Use connection explicitly for Pandas/SQLAlchemy 2.0 compatibility
         with self.db.bind.connect() as connection:
@@ -254,6 +266,10 @@ class IBDMetricsCalculator:
         except Exception as e:
             logger.error(f"Error saving results: {e}")
             self.db.rollback()
+
+        # الدفعات التي تم commit لها تغير rs_daily_v2 → زيادة إصدار IBD
+        if count:
+            bump_dataset_versions(IBD)
             
         logger.info("✅ IBD Metrics Saved.")
 
@@ -12,6 +12,7 @@ from sqlalchemy.orm import Session
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from app.core.database import SessionLocal
+from app.core.cache_versions import INDUSTRY_GROUPS, bump_dataset_versions
 from app.models.industry_group import IndustryGroupHistory
 
 # Logging Setup
@@ -509,6 +510,7 @@ class IndustryGroupCalculator:
         
         try:
             self.db.commit()
+            bump_dataset_versions(INDUSTRY_GROUPS)
             logger.info(f"✅ Successfully saved {saved_count} groups")
             if error_count > 0:
                 logger.warning(f"⚠️ Failed to save {error_count} groups")
@@ -20,11 +20,19 @@ from pathlib import Path
 # Add project root to sys.path to allow importing from 'app'
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+from app.core.cache_versions import RS, bump_dataset_versions
+from app.services.price_store import load_price_store
+
 # Reduce logging for performance
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class RSCalculatorUltraFast:
+    # Lookback (in rows of the global trading calendar) for each RS period
+    RS_PERIODS = {'3m': 63, '6m': 126, '9m': 189, '12m': 252}
+    # Weights: 3m (40%), 6m (20%), 9m (20%), 12m (20%)
+    RS_WEIGHTS = {'3m': 0.40, '6m': 0.20, '9m': 0.20, '12m': 0.20}
+
     def __init__(self, db_url):
         self.db_url = db_url
         self.engine = None
@@ -757,6 +765,100 @@ class RSCalculatorUltraFast:
                 self.calculate_historical_ultrafast(batch_size=200)
 
 
+    def _calculate_returns_long(self, df_wide):
+        """Wide close matrix (Rows=Date, Cols=Symbol) -> long frame of returns per (date, symbol)"""
+        # Replace any remaining zeros with tiny value to avoid division by zero
+        df_wide = df_wide.replace(0, 0.000001)
+        
+        returns_dfs = {}
+        for name, days in self.RS_PERIODS.items():
+            print(f"   Calculating {name} ({days} days)...")
+            ret_df = df_wide.pct_change(periods=days)
+            ret_df = ret_df.replace([np.inf, -np.inf], np.nan)
+            returns_dfs[name] = ret_df
+
+        def melt_returns(ret_df, col_name):
+            s = ret_df.stack(dropna=False)
+            s.name = col_name
+            return s
+
+        df_all = pd.concat([
+            melt_returns(returns_dfs['3m'], 'return_3m'),
+            melt_returns(returns_dfs['6m'], 'return_6m'),
+            melt_returns(returns_dfs['9m'], 'return_9m'),
+            melt_returns(returns_dfs['12m'], 'return_12m'),
+            melt_returns(df_wide, 'current_price')
+        ], axis=1)
+        
+        return df_all.reset_index()
+
+    def _calculate_ranks_and_rating(self, df_all):
+        """Per-date percentile ranks (1-99) and the weighted RS rating, in place"""
+        for p in self.RS_PERIODS.keys():
+            col = f'return_{p}'
+            rank_col = f'rank_{p}'
+            # Convert to numeric, errors='coerce' turns non-numeric to NaN
+            df_all[col] = pd.to_numeric(df_all[col], errors='coerce')
+            
+            # Calculate rank only on valid numeric values
+            # groupby(date) respects the date index or column
+            # we need to ensure we don't rank NaNs as 100 or something wrong
+            # rank(pct=True) naturally handles NaNs by ignoring them in calculation but keeping them as NaN in output if na_option='keep' (default)
+            df_all[rank_col] = df_all.groupby('date')[col].rank(pct=True, method='average') * 100
+            
+            # Fill missing ranks with -1 for now, then clip valid ones
+            # We do NOT want to fill NaNs with 50 here because that would imply average performance for missing data
+            # Instead, leave them as NaN so they are ignored in the weighted average
+            df_all[rank_col] = df_all[rank_col].round().clip(1, 99)
+
+        # Weighted Average allowing missing periods (Dynamic Weights Logic)
+        numerator = 0
+        denominator = 0
+        
+        for p, w in self.RS_WEIGHTS.items():
+            rank_col = f'rank_{p}'
+            # Check where rank is NOT NaN
+            mask = df_all[rank_col].notna()
+            
+            # Add to numerator and denominator where data exists
+            numerator += df_all[rank_col].fillna(0) * (mask * w)
+            denominator += mask * w
+            
+            # IMPORTANT: Convert ranks to Integer for DB saving
+            # Floating point ranks (e.g. 94.0) cause DB errors in Integer columns
+            df_all[rank_col] = df_all[rank_col].fillna(-1).astype(int).replace({-1: None})
+        
+        # Avoid division by zero
+        final_score = np.where(denominator > 0, numerator / denominator, np.nan)
+        
+        # Assign to DataFrame
+        df_all['rs_raw'] = final_score
+        
+        # Round up and fill NaNs
+        # Use final_score (numpy array) directly to create the column first to avoid index alignment issues with pd.Series()
+        # Or explicitly pass the index
+        df_all['rs_rating'] = pd.Series(final_score, index=df_all.index)
+        df_all['rs_rating'] = np.ceil(df_all['rs_rating']).clip(1, 99).fillna(-1).astype(int).replace({-1: None})
+        
+        return df_all
+
+    @staticmethod
+    def _store_close_frame(store, start='2000-01-01', end=None):
+        """Wide close frame from the price store, same shape as the SQL pivot (date >= 2000, close > 0)"""
+        df_wide = store.frame('close', start=start, end=end)
+        df_wide = df_wide.where(df_wide > 0).dropna(how='all').dropna(axis=1, how='all')
+        df_wide.index = df_wide.index.date
+        df_wide.index.name = 'date'
+        df_wide.columns = df_wide.columns.astype(str)
+        return df_wide
+
+    @staticmethod
+    def _store_meta(store):
+        return pd.DataFrame(
+            [(s, m.get('company_name'), m.get('industry_group')) for s, m in store.meta.items()],
+            columns=['symbol', 'company_name', 'industry_group']
+        )
+
     def calculate_full_history_optimized(self):
         """Calculate RS for ALL history using in-memory vectorization (The Rocket Approach 🚀)"""
         
@@ -771,56 +873,36 @@ class RSCalculatorUltraFast:
             ORDER BY date
         """
         try:
-            # Load directly into DataFrame using connection
-            with self.engine.connect() as conn:
-                df_prices = pd.read_sql(text(query), conn)
-            print(f"✅ Loaded {len(df_prices):,} price records")
+            store = load_price_store(self.engine)
+            if store is not None:
+                # Columnar store is already wide (Rows=Date, Cols=Symbol)
+                print("📦 Reading closes from the columnar price store...")
+                df_wide = self._store_close_frame(store)
+                df_meta = self._store_meta(store)
+                print(f"✅ Loaded {int(df_wide.count().sum()):,} price records")
+            else:
+                # Load directly into DataFrame using connection
+                with self.engine.connect() as conn:
+                    df_prices = pd.read_sql(text(query), conn)
+                print(f"✅ Loaded {len(df_prices):,} price records")
+                
+                if df_prices.empty:
+                    print("❌ No data found!")
+                    return None
+
+                # 2. Pivot to Wide Format (Rows=Date, Cols=Symbol)
+                print("🔄 Pivoting data for vectorized calculation...")
+                df_wide = df_prices.pivot(index='date', columns='symbol', values='close')
+                df_wide = df_wide.sort_index()
+                df_meta = None
             
-            if df_prices.empty:
+            if df_wide.empty:
                 print("❌ No data found!")
                 return None
-
-            # 2. Pivot to Wide Format (Rows=Date, Cols=Symbol)
-            print("🔄 Pivoting data for vectorized calculation...")
-            df_wide = df_prices.pivot(index='date', columns='symbol', values='close')
-            df_wide = df_wide.sort_index()
-            
-            # Replace any remaining zeros with tiny value to avoid division by zero
-            df_wide = df_wide.replace(0, 0.000001)
             
-            periods = {
-                '3m': 63,
-                '6m': 126,
-                '9m': 189,
-                '12m': 252
-            }
-            
-            # 3. Calculate Returns Vectorized
+            # 3. Calculate Returns Vectorized + 4. Stack back to Long Format
             print("📈 Calculating returns for all periods...")
-            returns_dfs = {}
-            for name, days in periods.items():
-                print(f"   Calculating {name} ({days} days)...")
-                ret_df = df_wide.pct_change(periods=days)
-                ret_df = ret_df.replace([np.inf, -np.inf], np.nan)
-                returns_dfs[name] = ret_df
-
-            # 4. Stack back to Long Format to calculate Ranks
-            print("📊 Stacking data and calculating ranks...")
-            
-            def melt_returns(ret_df, col_name):
-                s = ret_df.stack(dropna=False)
-                s.name = col_name
-                return s
-
-            df_all = pd.concat([
-                melt_returns(returns_dfs['3m'], 'return_3m'),
-                melt_returns(returns_dfs['6m'], 'return_6m'),
-                melt_returns(returns_dfs['9m'], 'return_9m'),
-                melt_returns(returns_dfs['12m'], 'return_12m'),
-                melt_returns(df_wide, 'current_price')
-            ], axis=1)
-            
-            df_all = df_all.reset_index()
+            df_all = self._calculate_returns_long(df_wide)
             
             original_len = len(df_all)
             # RELAXED FILTER: Keep rows with at least 3m return
@@ -831,66 +913,17 @@ class RSCalculatorUltraFast:
                 print("⚠️ No valid rows after filtering!")
                 return None
 
-            # 5. Calculate Ranks PER DATE
-            print("🏆 Calculating Daily Ranks (1-99)...")
-            
-            for p in periods.keys():
-                col = f'return_{p}'
-                rank_col = f'rank_{p}'
-                # Convert to numeric, errors='coerce' turns non-numeric to NaN
-                df_all[col] = pd.to_numeric(df_all[col], errors='coerce')
-                
-                # Calculate rank only on valid numeric values
-                # groupby(date) respects the date index or column
-                # we need to ensure we don't rank NaNs as 100 or something wrong
-                # rank(pct=True) naturally handles NaNs by ignoring them in calculation but keeping them as NaN in output if na_option='keep' (default)
-                df_all[rank_col] = df_all.groupby('date')[col].rank(pct=True, method='average') * 100
-                
-                # Fill missing ranks with -1 for now, then clip valid ones
-                # We do NOT want to fill NaNs with 50 here because that would imply average performance for missing data
-                # Instead, leave them as NaN so they are ignored in the weighted average
-                df_all[rank_col] = df_all[rank_col].round().clip(1, 99)
-
-            # 6. Calculate Weighted RS (Dynamic Weights Logic)
-            print("🧮 Calculating Final Weighted RS...")
-            
-            # Weighted Average allowing missing periods
-            weights = {'3m': 0.40, '6m': 0.20, '9m': 0.20, '12m': 0.20}
-            
-            numerator = 0
-            denominator = 0
-            
-            for p, w in weights.items():
-                rank_col = f'rank_{p}'
-                # Check where rank is NOT NaN
-                mask = df_all[rank_col].notna()
-                
-                # Add to numerator and denominator where data exists
-                numerator += df_all[rank_col].fillna(0) * (mask * w)
-                denominator += mask * w
-                
-                # IMPORTANT: Convert ranks to Integer for DB saving
-                # Floating point ranks (e.g. 94.0) cause DB errors in Integer columns
-                df_all[rank_col] = df_all[rank_col].fillna(-1).astype(int).replace({-1: None})
-            
-            # Avoid division by zero
-            final_score = np.where(denominator > 0, numerator / denominator, np.nan)
-            
-            # Assign to DataFrame
-            df_all['rs_raw'] = final_score
-            
-            # Round up and fill NaNs
-            # Use final_score (numpy array) directly to create the column first to avoid index alignment issues with pd.Series()
-            # Or explicitly pass the index
-            df_all['rs_rating'] = pd.Series(final_score, index=df_all.index)
-            df_all['rs_rating'] = np.ceil(df_all['rs_rating']).clip(1, 99).fillna(-1).astype(int).replace({-1: None})
+            # 5. Calculate Ranks PER DATE + 6. Weighted RS (Dynamic Weights Logic)
+            print("🏆 Calculating Daily Ranks (1-99) and Final Weighted RS...")
+            df_all = self._calculate_ranks_and_rating(df_all)
             
             # Add static metadata
             print("🔗 Merging static company info...")
-            meta_query = "SELECT DISTINCT symbol, company_name, industry_group FROM prices"
-            with self.engine.connect() as conn:
-                df_meta = pd.read_sql(text(meta_query), conn)
-            df_meta = df_meta.drop_duplicates(subset=['symbol'], keep='last')
+            if df_meta is None:
+                meta_query = "SELECT DISTINCT symbol, company_name, industry_group FROM prices"
+                with self.engine.connect() as conn:
+                    df_meta = pd.read_sql(text(meta_query), conn)
+                df_meta = df_meta.drop_duplicates(subset=['symbol'], keep='last')
             
             df_final = pd.merge(df_all, df_meta, on='symbol', how='left')
             
@@ -903,6 +936,172 @@ class RSCalculatorUltraFast:
             traceback.print_exc()
             return None
 
+    def calculate_incremental(self, target_dates):
+        """Calculate RS for the given date(s) only, from a trailing price window.
+
+        Produces the same rows as calculate_full_history_optimized() filtered to
+        target_dates, but loads only the 252 calendar rows before the first target
+        (plus each symbol's last close before that window, which is what
+        pct_change's forward-fill would have carried in). Cost no longer grows
+        with the size of the archive.
+        """
+        if isinstance(target_dates, (date, str)):
+            target_dates = [target_dates]
+        target_dates = sorted(pd.to_datetime(pd.Series(list(target_dates))).dt.date.unique())
+        if not target_dates:
+            return None
+        
+        first_date, last_date = target_dates[0], target_dates[-1]
+        lookback = max(self.RS_PERIODS.values())
+        
+        # 1. Window start = the `lookback`-th trading day (global calendar) before the first target
+        calendar_query = """
+            SELECT MIN(date) FROM (
+                SELECT DISTINCT date
+                FROM prices
+                WHERE date >= '2000-01-01'
+                    AND date < :first_date
+                    AND close > 0
+                ORDER BY date DESC
+                LIMIT :lookback
+            ) d
+        """
+        window_query = """
+            SELECT date, symbol, close, company_name, industry_group
+            FROM prices
+            WHERE date >= :window_start
+                AND date <= :last_date
+                AND close > 0
+            ORDER BY date
+        """
+        # Last close before the window for every symbol (index lookups on symbol+date)
+        seed_query = """
+            SELECT s.symbol, p.close, p.company_name, p.industry_group
+            FROM (SELECT DISTINCT symbol FROM prices) s
+            CROSS JOIN LATERAL (
+                SELECT close, company_name, industry_group
+                FROM prices
+                WHERE symbol = s.symbol
+                    AND date >= '2000-01-01'
+                    AND date < :window_start
+                    AND close > 0
+                ORDER BY date DESC
+                LIMIT 1
+            ) p
+        """
+        try:
+            store = load_price_store(self.engine)
+            if store is not None:
+                df_wide, df_meta = self._incremental_window_from_store(store, first_date, last_date, lookback)
+                if df_wide is None:
+                    print("❌ No data found!")
+                    return None
+                return self._finish_incremental(df_wide, df_meta, target_dates)
+            
+            with self.engine.connect() as conn:
+                window_start = conn.execute(
+                    text(calendar_query), {'first_date': first_date, 'lookback': lookback}
+                ).scalar() or first_date
+                df_prices = pd.read_sql(
+                    text(window_query), conn,
+                    params={'window_start': window_start, 'last_date': last_date}
+                )
+                df_seed = pd.read_sql(text(seed_query), conn, params={'window_start': window_start})
+            print(f"✅ Loaded {len(df_prices):,} price records ({window_start} → {last_date}) "
+                  f"+ {len(df_seed):,} carry-forward closes")
+            
+            if df_prices.empty:
+                print("❌ No data found!")
+                return None
+            
+            # 2. Pivot; the carried-forward closes sit in one row just before the window
+            df_seed['date'] = window_start - relativedelta(days=1)
+            df_wide = pd.concat([df_seed, df_prices], ignore_index=True).pivot(
+                index='date', columns='symbol', values='close'
+            )
+            df_wide = df_wide.sort_index()
+            
+            # Metadata: latest row in the window, else the carry-forward row
+            df_meta = pd.concat([df_seed, df_prices], ignore_index=True)[['symbol', 'company_name', 'industry_group']]
+            df_meta = df_meta.drop_duplicates(subset=['symbol'], keep='last')
+            
+            return self._finish_incremental(df_wide, df_meta, target_dates)
+            
+        except Exception as e:
+            logger.error(f"❌ Error in incremental RS calculation: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
+
+    def _incremental_window_from_store(self, store, first_date, last_date, lookback):
+        """Same window as the SQL path, cut from the price store: carry-forward row + `lookback` rows + targets
+
+        Only the window rows are read; the carry-forward closes come from a reverse search
+        over the rows before it, so the history since 2000 is never loaded as a frame.
+        """
+        closes = store.matrix('close')
+        lo = int(np.searchsorted(store.dates, np.datetime64('2000-01-01')))
+        if lo == len(store.dates):
+            return None, None
+        first = max(lo, int(np.searchsorted(store.dates, np.datetime64(pd.Timestamp(first_date).date()))))
+        
+        # Window start = the `lookback`-th date with any close > 0 before the first target
+        start, counted = first, 0
+        while start > lo and counted < lookback:
+            step = max(lo, start - (lookback - counted))
+            counted += int((closes[step:start] > 0).any(axis=1).sum())
+            start = step
+        
+        window = self._store_close_frame(store, start=store.dates[start], end=last_date)
+        if window.empty:
+            return None, None
+        seed = self._last_close_before(closes, lo, start)
+        if not np.isnan(seed).all():
+            seed = pd.DataFrame(
+                [seed], index=[window.index[0] - relativedelta(days=1)],
+                columns=pd.Index(store.symbols.astype(str), name='symbol')
+            )
+            window = pd.concat([seed, window])
+            window.index.name = 'date'
+        # Symbols with nothing to carry forward and no rows in the window are not in the SQL pivot either
+        window = window.dropna(axis=1, how='all')
+        return window, self._store_meta(store)
+
+    @staticmethod
+    def _last_close_before(closes, lo, hi, chunk_rows=256):
+        """Last close > 0 per symbol in rows [lo, hi) (NaN if none) - reverse search, one chunk of rows at a time"""
+        seed = np.full(closes.shape[1], np.nan)
+        pending = np.arange(closes.shape[1])
+        while len(pending) and hi > lo:
+            start = max(lo, hi - chunk_rows)
+            block = closes[start:hi][:, pending]
+            valid = block > 0
+            found = valid.any(axis=0)
+            last = len(block) - 1 - np.argmax(valid[::-1], axis=0)
+            seed[pending[found]] = block[last[found], np.flatnonzero(found)]
+            pending = pending[~found]
+            hi = start
+        return seed
+
+    def _finish_incremental(self, df_wide, df_meta, target_dates):
+        """Returns, ranks and rating for the target rows of an incremental window"""
+        # 3. Returns for the target rows only
+        df_all = self._calculate_returns_long(df_wide)
+        df_all = df_all[df_all['date'].isin(target_dates)]
+        df_all = df_all.dropna(subset=['return_3m'])
+        
+        if len(df_all) == 0:
+            print("⚠️ No valid rows for target date(s)!")
+            return df_all
+        
+        # 4. Ranks + weighted RS
+        df_all = self._calculate_ranks_and_rating(df_all.reset_index(drop=True))
+        
+        df_final = pd.merge(df_all, df_meta, on='symbol', how='left')
+        
+        print(f"✅ Incremental RS ready: {len(df_final):,} rows for {len(target_dates)} date(s)")
+        return df_final
+
 
     def save_with_copy_protocol(self, df):
         """Ultra-fast save using PostgreSQL COPY protocol (50x faster)"""
@@ -1130,6 +1329,10 @@ class RSCalculatorUltraFast:
         if total_time > 0:
             print(f"   🚀 Average Speed: {total_saved/total_time:.1f} rows/sec")
         print(f"{'='*60}")
+
+        # بعد الحفظ: مفاتيح الكاش (rs_v2 ...) تعتمد على إصدار RS
+        if total_saved:
+            bump_dataset_versions(RS)
         
         # التحقق من الجدول
         self._verify_save_results()
@@ -1439,26 +1642,29 @@ def main():
             print(f"❌ Error checking DB: {e}")
             return
 
-        # 2. Calculate ALL (in memory - fast)
-        df_results = calculator.calculate_full_history_optimized()
-        
-        if df_results is not None and not df_results.empty:
-            # 3. Filter New Only
-            if latest_date:
-                # Ensure date format matches
-                df_results['date'] = pd.to_datetime(df_results['date']).dt.date
-                
-                # Filter > latest_date
-                df_new = df_results[df_results['date'] > latest_date]
-                
-                if df_new.empty:
-                    print(f"✅ Database is up to date (Latest: {latest_date}). Nothing to add.")
-                else:
-                    print(f"📦 Found {len(df_new):,} new records (from {df_new['date'].min()} to {df_new['date'].max()})")
-                    # 4. Save New Only
-                    calculator.save_bulk_results(df_new)
-            else:
-                # Save all if DB was empty
+        if latest_date:
+            # 2. Calculate only the missing dates (trailing window - fast)
+            with calculator.engine.connect() as conn:
+                missing_dates = [row[0] for row in conn.execute(text("""
+                    SELECT DISTINCT date FROM prices
+                    WHERE date > :latest_date AND close > 0
+                    ORDER BY date
+                """), {'latest_date': latest_date})]
+            
+            if not missing_dates:
+                print(f"✅ Database is up to date (Latest: {latest_date}). Nothing to add.")
+                return
+            
+            df_new = calculator.calculate_incremental(missing_dates)
+            
+            if df_new is not None and not df_new.empty:
+                print(f"📦 Found {len(df_new):,} new records (from {df_new['date'].min()} to {df_new['date'].max()})")
+                # 3. Save New Only
+                calculator.save_bulk_results(df_new)
+        else:
+            # Save all if DB was empty
+            df_results = calculator.calculate_full_history_optimized()
+            if df_results is not None and not df_results.empty:
                 calculator.save_bulk_results(df_results)
 
     else:
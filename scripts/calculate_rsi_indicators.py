@@ -10,6 +10,9 @@ from sqlalchemy.orm import Session
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from scripts import indicator_kernels as kernels
+from scripts.indicator_kernels import to_array, to_list
+
 
 def convert_to_float(value):
     """Convert value to float, handling Decimal and None values"""
@@ -49,93 +52,28 @@ def calculate_rsi_pinescript(values: List[float], period: int = 14) -> List[Opti
     """✅ RSI مطابق تماماً لـ PineScript باستخدام RMA (Wilder's Smoothing)"""
     if not values or len(values) < period + 1:
         return [None] * len(values) if values else []
-    
-    prices = np.array(values, dtype=float)
-    deltas = np.diff(prices)
-    gains = np.where(deltas > 0, deltas, 0.0)
-    losses = np.where(deltas < 0, -deltas, 0.0)
-    
-    avg_gain = np.full(len(prices), np.nan)
-    avg_loss = np.full(len(prices), np.nan)
-    
-    avg_gain[period] = np.mean(gains[:period])
-    avg_loss[period] = np.mean(losses[:period])
-    
-    alpha = 1.0 / period
-    for i in range(period + 1, len(prices)):
-        avg_gain[i] = avg_gain[i-1] * (1 - alpha) + gains[i-1] * alpha
-        avg_loss[i] = avg_loss[i-1] * (1 - alpha) + losses[i-1] * alpha
-    
-    rsi_values = []
-    for i in range(len(prices)):
-        if i < period:
-            rsi_values.append(None)
-        elif np.isnan(avg_gain[i]) or np.isnan(avg_loss[i]):
-            rsi_values.append(None)
-        elif avg_loss[i] == 0:
-            rsi_values.append(100.0)
-        else:
-            rs = avg_gain[i] / avg_loss[i]
-            rsi = 100.0 - (100.0 / (1.0 + rs))
-            rsi_values.append(rsi)
-    
-    return rsi_values
+    return to_list(kernels.rsi(to_array(values), period))
 
 
 def calculate_sma(values: List[float], period: int) -> List[Optional[float]]:
     """Simple Moving Average"""
     if not values or len(values) < period:
         return [None] * len(values) if values else []
-    s = pd.Series(values)
-    sma = s.rolling(window=period, min_periods=period).mean()
-    return [float(x) if not pd.isna(x) else None for x in sma.tolist()]
+    return to_list(kernels.sma(to_array(values), period))
 
 
 def calculate_wma(values: List[float], period: int) -> List[Optional[float]]:
     """Weighted Moving Average"""
     if not values or len(values) < period:
         return [None] * len(values) if values else []
-    
-    s = pd.Series(values)
-    weights = np.arange(1, period + 1)
-    
-    def wma_calc(x):
-        if len(x) < period:
-            return np.nan
-        return np.dot(x, weights[:len(x)]) / weights[:len(x)].sum()
-        
-    wma = s.rolling(window=period, min_periods=period).apply(wma_calc, raw=True)
-    return [float(x) if not pd.isna(x) else None for x in wma.tolist()]
+    return to_list(kernels.wma(to_array(values), period))
 
 
 def calculate_ema(values: List[float], period: int) -> List[Optional[float]]:
     """Exponential Moving Average"""
-    alpha = 2.0 / (period + 1.0)
-    ema_vals = []
-    
-    vals = [v if v is not None and not pd.isna(v) else np.nan for v in values]
-    ema_prev = np.nan
-    
-    for i in range(len(vals)):
-        # لا يمكن الحساب إذا كانت القيمة الحالية NaN
-        if np.isnan(vals[i]):
-            ema_vals.append(None)
-            continue
-            
-        if np.isnan(ema_prev):
-            # TradingView يبدأ حساب EMA باستخدام SMA كأول نقطة أساس عندما تكتمل فترة period
-            # نتحقق من النافذة السابقة
-            window = vals[max(0, i - period + 1) : i + 1]
-            if len(window) == period and not np.any(np.isnan(window)):
-                ema_prev = np.mean(window)
-                ema_vals.append(float(ema_prev))
-            else:
-                ema_vals.append(None)
-        else:
-            ema_prev = alpha * vals[i] + (1 - alpha) * ema_prev
-            ema_vals.append(float(ema_prev))
-            
-    return ema_vals
+    if not values:
+        return []
+    return to_list(kernels.ema(to_array(values), period))
 
 
 def calculate_rsi_components(closes: List[float]) -> Dict[str, Any]:
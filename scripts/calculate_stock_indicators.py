@@ -5,6 +5,7 @@ Stock Indicators Calculator - الإصدار المحدث
 
 import sys
 import os
+import time
 import argparse
 import numpy as np
 import pandas as pd
@@ -17,12 +18,16 @@ from sqlalchemy.dialects.postgresql import insert
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from app.core.cache_versions import STOCK_INDICATORS, bump_dataset_versions
 from app.core.database import SessionLocal
 from app.models.stock_indicators import StockIndicator
+from app.services.price_store import load_price_store
 
 # Import the unified service
 from scripts.indicators_data_service import IndicatorsDataService
 from scripts.calculate_rsi_indicators import convert_to_float, get_val
+from scripts.complete_historical_indicators import bulk_save_complete_records
+from scripts.shared_frame import SharedFrame, map_symbol_chunks, pack_records, resolve_workers, unpack_records
 
 
 def resolve_target_date(db: Session, target_date: date = None):
@@ -70,13 +75,28 @@ def calculate_all_indicators_for_stock(db: Session, symbol: str, target_date: da
         result = db.execute(query_limit, {"symbol": symbol})
     
     rows = result.fetchall()
-    
+    return calculate_indicators_from_rows(symbol, rows, target_date)
+
+
+def calculate_indicators_from_rows(symbol: str, rows: List, target_date: date = None) -> Dict[str, Any]:
+    """
+    حساب جميع المؤشرات من صفوف الأسعار (date, open, high, low, close) مرتبة تصاعدياً
+    بدون أي اتصال بقاعدة البيانات - يُستخدم في الوضع الفردي
+    """
     if not rows or len(rows) < 100:
         print(f"⚠️  {symbol}: Not enough data ({len(rows)} rows)")
         return {}
     
     # تحويل البيانات إلى DataFrame
     df = IndicatorsDataService.prepare_price_dataframe(rows)
+    return calculate_indicators_from_frame(symbol, df, target_date)
+
+
+def calculate_indicators_from_frame(symbol: str, df: Optional[pd.DataFrame], target_date: date = None) -> Dict[str, Any]:
+    """
+    نفس calculate_indicators_from_rows بعد تجهيز الأسعار (prepare_price_dataframe / prepare_price_arrays)
+    يُستخدم في الوضع الفردي والوضع الجماعي (batch)
+    """
     if df is None:
         return {}
     
@@ -118,7 +138,169 @@ def calculate_all_indicators_for_stock(db: Session, symbol: str, target_date: da
     return result
 
 
-def calculate_and_store_indicators(db: Session, target_date: date = None, target_symbol: str = None):
+def clean_indicator_data(indicator_data: Dict[str, Any]) -> Dict[str, Any]:
+    """تنظيف البيانات (تحويل numpy types إلى Python types وتقريب الأرقام لخانين لتطابق TradingView)"""
+    for k, v in indicator_data.items():
+        if isinstance(v, (np.float64, np.float32, np.integer)):
+            indicator_data[k] = round(float(v), 2) if not pd.isna(v) else None
+        elif isinstance(v, np.bool_):
+            indicator_data[k] = bool(v)
+        elif isinstance(v, float):
+            indicator_data[k] = round(v, 2) if not pd.isna(v) else None
+        elif isinstance(v, (list, dict, np.ndarray, pd.Series)):
+            indicator_data[k] = None  # لا نخزن القوائم في قاعدة البيانات
+    return indicator_data
+
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+def _load_batch_frame(db: Session, target_date: date, symbols: List[str]) -> pd.DataFrame:
+    """
+    جلب تاريخ OHLC لكل الأسهم دفعة واحدة (حتى target_date) كإطار طويل مرتب (symbol, date)
+    من الـ price store إذا كان متاحاً، وإلا باستعلام واحد على prices
+    """
+    store = load_price_store(db.get_bind())
+    if store is not None and store.last_date is not None and store.last_date >= target_date:
+        df = store.long_frame(PRICE_COLUMNS, end=target_date, symbols=symbols)
+    else:
+        df = pd.read_sql(text("""
+            SELECT symbol, date, open, high, low, close
+            FROM prices
+            WHERE date <= :target_date
+            AND symbol IN (SELECT symbol FROM prices WHERE date = :target_date)
+            ORDER BY symbol, date
+        """), db.connection(), params={"target_date": target_date})
+
+    return df[df['symbol'].isin(symbols)].reset_index(drop=True)
+
+
+def _calculate_indicators_chunk(frame: SharedFrame, start: int, stop: int, target_date: date) -> tuple:
+    """
+    Worker (map_symbol_chunks): حساب الأسهم [start, stop) من الأسعار في الذاكرة المشتركة
+    → (symbols, pack_records(indicator_data), [(symbol, error)])
+    """
+    symbols, results, errors = [], [], []
+    for i in range(start, stop):
+        symbol = frame.symbols[i]
+        try:
+            rows = frame.segment(i)
+            if rows.stop - rows.start < 100:
+                print(f"⚠️  {symbol}: Not enough data ({rows.stop - rows.start} rows)")
+                errors.append((symbol, "No data"))
+                continue
+            df = IndicatorsDataService.prepare_price_arrays(
+                frame.dates[rows], *(frame.columns[name][rows] for name in PRICE_COLUMNS)
+            )
+            data = calculate_indicators_from_frame(symbol, df, target_date)
+            if not data:
+                errors.append((symbol, "No data"))
+                continue
+            results.append(clean_indicator_data(data))
+            symbols.append(symbol)
+        except Exception as e:
+            errors.append((symbol, str(e)))
+    return symbols, pack_records(results), errors
+
+
+def calculate_and_store_indicators_batch(
+    db: Session,
+    target_date: date = None,
+    max_workers: int = None,
+    chunk_size: int = None
+):
+    """
+    الوضع الجماعي: استعلام واحد لكل الأسعار تُنشر في الذاكرة المشتركة (scripts/shared_frame)،
+    حساب الأسهم في ProcessPool (كل مهمة نطاق أسهم فقط)، ثم حفظ صفوف target_date بعملية COPY + UPSERT واحدة
+    
+    Args:
+        db: جلسة قاعدة البيانات
+        target_date: التاريخ المستهدف (اختياري)
+        max_workers: عدد العمليات (افتراضياً settings.INDICATOR_WORKERS، 0 = كل الأنوية، 1 = بدون pool)
+        chunk_size: عدد الأسهم لكل مهمة (افتراضياً settings.INDICATOR_CHUNK_SYMBOLS أو تلقائي)
+    """
+    print("=" * 60)
+    print("📊 Starting Stock Indicators Calculation - BATCH MODE")
+    print("=" * 60)
+    start_time = time.time()
+
+    _, target_date = resolve_target_date(db, target_date)
+    if not target_date:
+        print("❌ No price data found.")
+        return
+
+    print(f"📅 Using latest date: {target_date}")
+
+    symbols_result = db.execute(text("""
+        SELECT symbol, company_name
+        FROM prices
+        WHERE date = :target_date
+        ORDER BY symbol
+    """), {"target_date": target_date})
+    symbols_data = {row[0]: row[1] for row in symbols_result.fetchall()}
+
+    total_stocks = len(symbols_data)
+    print(f"📈 Found {total_stocks} stocks to process")
+
+    price_frame = _load_batch_frame(db, target_date, list(symbols_data))
+    print(f"📥 Loaded price history in {time.time() - start_time:.1f}s")
+    print("-" * 60)
+
+    max_workers = resolve_workers(max_workers)
+    records = []
+    error_details = []
+
+    with SharedFrame.publish(price_frame, PRICE_COLUMNS) as frame:
+        del price_frame
+        for symbol in sorted(set(symbols_data) - set(frame.symbols)):
+            print(f"⚠️  {symbol}: Not enough data (0 rows)")
+            error_details.append(f"{symbol}: No data")
+
+        chunks = map_symbol_chunks(
+            _calculate_indicators_chunk, frame, max_workers, chunk_size, args=(target_date,)
+        )
+        for start, stop, result, error in chunks:
+            if error is not None:
+                error_details.extend(f"{symbol}: {error}" for symbol in frame.symbols[start:stop])
+                continue
+            symbols, packed, chunk_errors = result
+            for symbol, data in zip(symbols, unpack_records(packed)):
+                records.append({
+                    'symbol': symbol,
+                    'date': target_date,
+                    'company_name': symbols_data[symbol],
+                    **data
+                })
+            error_details.extend(f"{symbol}: {err}" for symbol, err in chunk_errors)
+
+    print(f"🧮 Calculated {len(records)} stocks in {time.time() - start_time:.1f}s ({max_workers} workers)")
+
+    successful = bulk_save_complete_records(records, db)
+    errors = len(error_details) + (len(records) - successful)
+    processed = successful
+
+    print("-" * 60)
+    print("📊 Calculation Summary:")
+    print(f"   ✅ Success: {successful}")
+    print(f"   ❌ Errors: {errors}")
+    if error_details:
+        print("\n   Error Details:")
+        for err in error_details[:10]:  # عرض أول 10 أخطاء فقط
+            print(f"   - {err}")
+    print(f"   ⏱️ Total time: {time.time() - start_time:.1f}s")
+    print("=" * 60)
+
+    return processed, errors, successful
+
+
+def calculate_and_store_indicators(
+    db: Session,
+    target_date: date = None,
+    target_symbol: str = None,
+    batch: bool = True,
+    max_workers: int = None,
+    chunk_size: int = None
+):
     """
     حساب وتخزين جميع المؤشرات لجميع الأسهم
     
@@ -126,7 +308,13 @@ def calculate_and_store_indicators(db: Session, target_date: date = None, target
         db: جلسة قاعدة البيانات
         target_date: التاريخ المستهدف (اختياري)
         target_symbol: رمز سهم محدد (اختياري)
+        batch: استخدام الوضع الجماعي لكل الأسهم (يُتجاهل عند تحديد target_symbol)
+        max_workers: عدد العمليات في الوضع الجماعي (0 = كل الأنوية)
+        chunk_size: عدد الأسهم لكل مهمة في الوضع الجماعي
     """
+    if batch and not target_symbol:
+        return calculate_and_store_indicators_batch(db, target_date, max_workers, chunk_size)
+
     print("=" * 60)
     print("📊 Starting Stock Indicators Calculation - PINESCRIPT EXACT VERSION")
     if target_symbol:
@@ -214,16 +402,7 @@ def calculate_and_store_indicators(db: Session, target_date: date = None, target
                 **data
             }
             
-            # تنظيف البيانات (تحويل numpy types إلى Python types وتقريب الأرقام لخانين لتطابق TradingView)
-            for k, v in indicator_data.items():
-                if isinstance(v, (np.float64, np.float32, np.integer)):
-                    indicator_data[k] = round(float(v), 2) if not pd.isna(v) else None
-                elif isinstance(v, np.bool_):
-                    indicator_data[k] = bool(v)
-                elif isinstance(v, float):
-                    indicator_data[k] = round(v, 2) if not pd.isna(v) else None
-                elif isinstance(v, (list, dict, np.ndarray, pd.Series)):
-                    indicator_data[k] = None  # لا نخزن القوائم في قاعدة البيانات
+            clean_indicator_data(indicator_data)
             
             # إدراج أو تحديث البيانات
             stmt = insert(StockIndicator).values(indicator_data)
@@ -259,6 +438,10 @@ def calculate_and_store_indicators(db: Session, target_date: date = None, target
         for err in error_details[:10]:  # عرض أول 10 أخطاء فقط
             print(f"   - {err}")
     print("=" * 60)
+
+    # الوضع الجماعي يزيد الإصدار داخل bulk_save_complete_records
+    if successful:
+        bump_dataset_versions(STOCK_INDICATORS)
     
     return processed, errors, successful
 
@@ -267,6 +450,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Calculate Stock Indicators')
     parser.add_argument('--date', type=str, help='Target date in YYYY-MM-DD format')
     parser.add_argument('--symbol', type=str, help='Target symbol (optional)')
+    parser.add_argument('--no-batch', action='store_true', help='Process symbols one by one (old mode)')
+    parser.add_argument('--workers', type=int, help='Number of worker processes in batch mode (0 = all cores)')
+    parser.add_argument('--chunk-size', type=int, help='Symbols per worker task in batch mode (default: auto)')
     
     args = parser.parse_args()
     
@@ -281,6 +467,13 @@ if __name__ == "__main__":
                 raise
 
         # تشغيل الحساب مع التاريخ والرمز (إن وُجد)
-        calculate_and_store_indicators(db, target_date=target_date, target_symbol=args.symbol)
+        calculate_and_store_indicators(
+            db,
+            target_date=target_date,
+            target_symbol=args.symbol,
+            batch=not args.no_batch,
+            max_workers=args.workers,
+            chunk_size=args.chunk_size
+        )
     finally:
         db.close()
\ No newline at end of file
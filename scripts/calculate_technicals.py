@@ -1,3 +1,4 @@
+import io
 import sys
 from pathlib import Path
 import pandas as pd
@@ -9,11 +10,37 @@ import logging
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from app.core.config import settings
+from app.core.cache_versions import TECHNICALS, bump_dataset_versions
+from app.services.price_store import load_price_store
+from scripts.grouped_rolling import GroupedRolling
 
 # إعداد الـ Logging لمتابعة سير العملية
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# أعمدة stock_indicators التي يكتبها save_latest (نفس الاسم في ناتج calculate،
+# و price_minus_sma_X = close - sma_X)
+SAVED_INDICATOR_COLUMNS = [
+    'sma_10', 'sma_21', 'sma_50', 'sma_150', 'sma_200',
+    'sma_200_1m_ago', 'sma_200_2m_ago', 'sma_200_3m_ago', 'sma_200_4m_ago', 'sma_200_5m_ago',
+    'sma_30w', 'sma_40w',
+    'fifty_two_week_high', 'fifty_two_week_low', 'average_volume_50',
+    'price_minus_sma_10', 'price_minus_sma_21', 'price_minus_sma_50',
+    'price_minus_sma_150', 'price_minus_sma_200',
+    'price_vs_sma_10_percent', 'price_vs_sma_21_percent', 'price_vs_sma_50_percent',
+    'price_vs_sma_150_percent', 'price_vs_sma_200_percent',
+    'percent_off_52w_high', 'percent_off_52w_low', 'vol_diff_50_percent',
+    'percent_change_15d', 'percent_change_20d', 'percent_change_126d',
+]
+
+# أطول نافذة (بعد حذف أيام العطل المكررة) يحتاجها calculate لصف التاريخ المستهدف:
+#   sma_200_5m_ago = sma_200 قبل 105 صفوف → 200 + 105 | 52 أسبوع: 260 | percent_change_126d: 127
+#   sma_40w: 40 إغلاقاً أسبوعياً (≤ 5 أيام تداول في الأسبوع → ≤ 200 صف)
+LOOKBACK_BARS = 200 + 105
+# صفوف إضافية في النافذة: الأيام المكررة التي تُحذف + الصف الأول (لا يُقارن بما قبله)
+WINDOW_MARGIN_BARS = 60
+PRICE_COLUMNS = ['open', 'close', 'high', 'low', 'volume']
+
 
 class TechnicalCalculator:
     def __init__(self, db_url):
@@ -71,7 +98,14 @@ class TechnicalCalculator:
                 logger.warning(f"⚠️ تحذير: {col_name}: {e}")
 
     def load_data(self):
-        """تحميل بيانات OHLCV من جدول prices"""
+        """تحميل بيانات OHLCV من مخزن الأسعار العمودي إن وُجد، وإلا من جدول prices"""
+        store = load_price_store(self.engine)
+        if store is not None:
+            logger.info("⏳ جاري تحميل البيانات من مخزن الأسعار العمودي...")
+            df = store.long_frame(PRICE_COLUMNS)
+            logger.info(f"✅ تم تحميل {len(df)} سجل.")
+            return df
+
         query = """
         SELECT id, symbol, date, open, close, high, low, volume_traded
         FROM prices
@@ -84,81 +118,141 @@ class TechnicalCalculator:
         logger.info(f"✅ تم تحميل {len(df)} سجل.")
         return df
 
-    def calculate(self, df):
-        logger.info("📈 جاري حساب المؤشرات الفنية...")
+    def load_window(self, target_date=None, bars: int = LOOKBACK_BARS + WINDOW_MARGIN_BARS):
+        """
+        الوضع التزايدي: آخر bars صف (حتى target_date) لكل سهم له سعر في target_date فقط
+        بدلاً من كل جدول prices - calculate + save_latest يعطيان نفس نتائج التشغيل الكامل لهذا التاريخ
+        الأسهم التي تبقى نافذتها أقصر من LOOKBACK_BARS بعد حذف الأيام المكررة تُحمّل بتاريخها الكامل
+        """
+        store = load_price_store(self.engine)
+        if target_date is None:
+            if store is not None:
+                target_date = store.last_date
+            else:
+                with self.engine.connect() as conn:
+                    target_date = conn.execute(text("SELECT MAX(date) FROM prices")).scalar()
+        if target_date is None:
+            logger.warning("⚠️ لا توجد أسعار.")
+            return pd.DataFrame(columns=['symbol', 'date', 'open', 'close', 'high', 'low', 'volume_traded'])
+        target_date = pd.Timestamp(target_date)
+
+        logger.info(f"⏳ جاري تحميل نافذة {bars} صف لكل سهم حتى {target_date.date()}...")
+        if store is not None:
+            end = int(np.searchsorted(store.dates, np.datetime64(target_date.date()), 'right'))
+            start = max(0, end - bars)
+            if end == 0 or store.dates[end - 1] != np.datetime64(target_date.date()):
+                symbols = []
+            else:
+                symbols = list(store.symbols[~np.isnan(store.matrix('close')[end - 1])])
+            df = store.long_frame(PRICE_COLUMNS, start=store.dates[start], end=target_date, symbols=symbols) \
+                if symbols else self._empty_prices()
+            # في المخزن النافذة أيام تقويم السوق → السهم ذو الفجوات قد يحصل على أقل من bars صف
+            truncated = set(symbols) if start > 0 else set()
+        else:
+            query = """
+            SELECT p.symbol, p.date, p.open, p.close, p.high, p.low, p.volume_traded
+            FROM (SELECT symbol FROM prices WHERE date = :target_date) s
+            CROSS JOIN LATERAL (
+                SELECT symbol, date, open, close, high, low, volume_traded
+                FROM prices
+                WHERE symbol = s.symbol AND date <= :target_date
+                ORDER BY date DESC
+                LIMIT :bars
+            ) p
+            ORDER BY p.symbol, p.date
+            """
+            with self.engine.connect() as conn:
+                df = pd.read_sql(text(query), conn, params={'target_date': target_date.date(), 'bars': bars})
+            df['date'] = pd.to_datetime(df['date'])
+            counts = df.groupby('symbol').size()
+            truncated = set(counts.index[counts >= bars])
+
+        # الصف الأول في النافذة يبقى دائماً → يجب أن يكون خارج أطول نافذة للصف المستهدف
+        kept = self._drop_holidays(df).groupby('symbol').size()
+        short = sorted(s for s in truncated if kept.get(s, 0) < LOOKBACK_BARS + 1)
+        if short:
+            logger.info(f"   ... {len(short)} سهم يحتاج تاريخاً أطول من النافذة - تحميل كامل")
+            full = self._load_full_history(store, short, target_date)
+            df = pd.concat([df[~df['symbol'].isin(short)], full], ignore_index=True)
+            df = df.sort_values(['symbol', 'date'], ignore_index=True)
+
+        logger.info(f"✅ تم تحميل {len(df)} سجل لـ {df['symbol'].nunique()} سهم.")
+        return df
 
-        df = df.sort_values(['symbol', 'date'])
+    def _load_full_history(self, store, symbols, target_date):
+        if store is not None:
+            return store.long_frame(PRICE_COLUMNS, end=target_date, symbols=symbols)
+        query = """
+        SELECT symbol, date, open, close, high, low, volume_traded
+        FROM prices
+        WHERE symbol = ANY(:symbols) AND date <= :target_date
+        ORDER BY symbol, date
+        """
+        with self.engine.connect() as conn:
+            df = pd.read_sql(text(query), conn, params={'symbols': list(symbols), 'target_date': target_date.date()})
+        df['date'] = pd.to_datetime(df['date'])
+        return df
 
-        # فلترة أيام العطلات
+    @staticmethod
+    def _empty_prices():
+        return pd.DataFrame({
+            'symbol': pd.Series(dtype=object), 'date': pd.Series(dtype='datetime64[ns]'),
+            **{col: pd.Series(dtype=float) for col in ['open', 'close', 'high', 'low', 'volume_traded']},
+        })
+
+    @staticmethod
+    def _drop_holidays(df):
+        """فلترة أيام العطلات: حذف الصف المطابق (OHLC) للصف السابق لنفس السهم"""
+        df = df.sort_values(['symbol', 'date'])
         columns_to_check = ['open', 'high', 'low', 'close']
         mask = (df[columns_to_check] != df.groupby('symbol')[columns_to_check].shift(1)).any(axis=1) | \
                (df.groupby('symbol')['date'].cumcount() == 0)
-        df = df[mask].copy()
+        return df[mask].copy()
+
+    def calculate(self, df):
+        logger.info("📈 جاري حساب المؤشرات الفنية...")
 
-        grouped = df.groupby('symbol')
+        df = self._drop_holidays(df)
+
+        # ترتيب (symbol, date) مرة واحدة → كل سهم مقطع متجاور في مصفوفات NumPy
+        df = df.reset_index(drop=True)
+        rolling = GroupedRolling(df['symbol'].to_numpy())
+        close = df['close'].to_numpy(dtype=np.float64)
 
         # 1. SMAs اليومية
         for window in [10, 21, 50, 150, 200]:
-            df[f'sma_{window}'] = grouped['close'].transform(
-                lambda x: x.rolling(window=window).mean()
-            )
+            df[f'sma_{window}'] = rolling.mean(close, window)
 
         # 2. 52 Week High / Low
-        df['fifty_two_week_high'] = grouped['high'].transform(
-            lambda x: x.rolling(window=260).max()
-        )
-        df['fifty_two_week_low'] = grouped['low'].transform(
-            lambda x: x.rolling(window=260).min()
-        )
+        df['fifty_two_week_high'] = rolling.max(df['high'].to_numpy(dtype=np.float64), 260)
+        df['fifty_two_week_low'] = rolling.min(df['low'].to_numpy(dtype=np.float64), 260)
 
         # 3. Average Volume (50 days)
-        df['average_volume_50'] = grouped['volume_traded'].transform(
-            lambda x: x.rolling(window=50).mean()
-        )
+        df['average_volume_50'] = rolling.mean(df['volume_traded'].to_numpy(dtype=np.float64), 50)
 
         # 4. Change
         logger.info("   ... حساب التغير (Change)")
-        df['change'] = grouped['close'].transform(lambda x: x.diff())
+        df['change'] = rolling.diff(close)
 
         # 4b. Power Play: حساب التغيرات المطلوبة
         logger.info("   ... حساب percent_change_20d و percent_change_15d و percent_change_126d")
-        df['percent_change_15d'] = grouped['close'].transform(
-            lambda x: ((x - x.shift(15)) / x.shift(15).replace(0, np.nan)) * 100
-        )
-        df['percent_change_20d'] = grouped['close'].transform(
-            lambda x: ((x - x.shift(20)) / x.shift(20).replace(0, np.nan)) * 100
-        )
-        df['percent_change_126d'] = grouped['close'].transform(
-            lambda x: ((x - x.shift(126)) / x.shift(126).replace(0, np.nan)) * 100
-        )
+        for days in [15, 20, 126]:
+            df[f'percent_change_{days}d'] = rolling.percent_change(close, days)
 
         # 5. Historical 200MA
         logger.info("   ... حساب 200MA التاريخية")
+        sma_200 = df['sma_200'].to_numpy()
         for months_ago, days in [(1, 21), (2, 42), (3, 63), (4, 84), (5, 105)]:
-            col_name = f'sma_200_{months_ago}m_ago'
-            df[col_name] = grouped['close'].transform(
-                lambda x, d=days: x.rolling(window=200).mean().shift(d)
-            )
+            df[f'sma_200_{months_ago}m_ago'] = rolling.shift(sma_200, days)
 
-        # 6. 30W و 40W SMAs
+        # 6. 30W و 40W SMAs: آخر إغلاق لكل (سهم، أسبوع) ثم SMA على الأسابيع، وكل يوم يأخذ قيمة أسبوعه
         logger.info("   ... حساب 30W و 40W SMAs")
-        df['week_ending'] = df['date'] + pd.to_timedelta((4 - df['date'].dt.dayofweek) % 7, unit='D')
-        weekly_closes = df.groupby(['symbol', 'week_ending'])['close'].last().reset_index()
-        weekly_closes = weekly_closes.sort_values(['symbol', 'week_ending'])
-        weekly_closes['sma_30w_calc'] = weekly_closes.groupby('symbol')['close'].transform(
-            lambda x: x.rolling(window=30).mean()
-        )
-        weekly_closes['sma_40w_calc'] = weekly_closes.groupby('symbol')['close'].transform(
-            lambda x: x.rolling(window=40).mean()
-        )
-        df = df.merge(
-            weekly_closes[['symbol', 'week_ending', 'sma_30w_calc', 'sma_40w_calc']],
-            on=['symbol', 'week_ending'],
-            how='left'
-        )
-        df['sma_30w'] = df['sma_30w_calc']
-        df['sma_40w'] = df['sma_40w_calc']
-        df = df.drop(['sma_30w_calc', 'sma_40w_calc', 'week_ending'], axis=1)
+        week_ending = df['date'] + pd.to_timedelta((4 - df['date'].dt.dayofweek) % 7, unit='D')
+        weeks = GroupedRolling(df['symbol'].to_numpy(), week_ending.to_numpy())
+        weekly_close = weeks.last_valid(close)
+        weekly = GroupedRolling(df['symbol'].to_numpy()[weeks.starts])
+        for window in [30, 40]:
+            df[f'sma_{window}w'] = np.repeat(weekly.mean(weekly_close, window), weeks.lengths)
 
         # 7. النسب المئوية
         for window in [10, 21, 50, 150, 200]:
@@ -188,135 +282,49 @@ class TechnicalCalculator:
         يحفظ:
           - حقل change فقط في جدول prices (الوحيد المتبقي)
           - جميع إحصائيات السوق (SMA, 52w, vol, %) في stock_indicators عبر UPSERT
+        دفعة واحدة: COPY لكل الأسهم إلى جدول مؤقت ثم UPDATE ... FROM واحد و UPSERT واحد
+        (وقت الحفظ لا يتناسب مع عدد الأسهم × زمن الرحلة إلى قاعدة البيانات)
         """
         logger.info("💾 جاري تحضير البيانات للحفظ...")
 
-        latest_dates = df.groupby('symbol')['date'].max().reset_index()
-        latest_data = pd.merge(df, latest_dates, on=['symbol', 'date'])
+        latest_data = self._latest_frame(df)
 
         logger.info(f"🚀 جاري تحديث {len(latest_data)} سهم...")
 
+        buffer = io.StringIO()
+        latest_data.to_csv(buffer, index=False, header=False, na_rep='')
+        buffer.seek(0)
+
+        # NUMERIC (وليس DOUBLE PRECISION) → نفس تقريب القيم كما لو أُرسلت مباشرة إلى أعمدة NUMERIC(14, 4)
+        temp_columns = ",\n".join(
+            f"{col} {'VARCHAR(20)' if col == 'symbol' else 'DATE' if col == 'date' else 'NUMERIC'}"
+            for col in latest_data.columns
+        )
+        columns = ", ".join(latest_data.columns)
+        si_columns = ", ".join(['symbol', 'date', *SAVED_INDICATOR_COLUMNS])
+        si_updates = ",\n".join(f"{col} = EXCLUDED.{col}" for col in SAVED_INDICATOR_COLUMNS)
+
         with self.engine.connect() as conn:
             trans = conn.begin()
             try:
-                for idx, row in latest_data.iterrows():
-                    symbol   = row['symbol']
-                    rec_date = row['date'].date() if hasattr(row['date'], 'date') else row['date']
-
-                    # ─── 1. تحديث change في prices فقط ───────────────────────
-                    conn.execute(
-                        text("UPDATE prices SET change = :change WHERE id = :id"),
-                        {
-                            'change': round(float(row['change']), 2) if pd.notnull(row['change']) else None,
-                            'id': int(row['id'])
-                        }
-                    )
-
-                    # ─── 2. UPSERT في stock_indicators ────────────────────────
-                    def fv(key):
-                        """safe float value"""
-                        val = row.get(key)
-                        return float(val) if val is not None and pd.notnull(val) else None
-
-                    def pm(a, b):
-                        """price minus SMA"""
-                        va, vb = row.get(a), row.get(b)
-                        return float(va - vb) if va is not None and vb is not None \
-                               and pd.notnull(va) and pd.notnull(vb) else None
-
-                    si_params = {
-                        'symbol':   symbol,
-                        'date':     rec_date,
-                        'sma_10':   fv('sma_10'),
-                        'sma_21':   fv('sma_21'),
-                        'sma_50':   fv('sma_50'),
-                        'sma_150':  fv('sma_150'),
-                        'sma_200':  fv('sma_200'),
-                        'sma_200_1m': fv('sma_200_1m_ago'),
-                        'sma_200_2m': fv('sma_200_2m_ago'),
-                        'sma_200_3m': fv('sma_200_3m_ago'),
-                        'sma_200_4m': fv('sma_200_4m_ago'),
-                        'sma_200_5m': fv('sma_200_5m_ago'),
-                        'sma_30w':  fv('sma_30w'),
-                        'sma_40w':  fv('sma_40w'),
-                        'h52':      fv('fifty_two_week_high'),
-                        'l52':      fv('fifty_two_week_low'),
-                        'avg_vol':  fv('average_volume_50'),
-                        'pm10':  pm('close', 'sma_10'),
-                        'pm21':  pm('close', 'sma_21'),
-                        'pm50':  pm('close', 'sma_50'),
-                        'pm150': pm('close', 'sma_150'),
-                        'pm200': pm('close', 'sma_200'),
-                        'p10_pct':   fv('price_vs_sma_10_percent'),
-                        'p21_pct':   fv('price_vs_sma_21_percent'),
-                        'p50_pct':   fv('price_vs_sma_50_percent'),
-                        'p150_pct':  fv('price_vs_sma_150_percent'),
-                        'p200_pct':  fv('price_vs_sma_200_percent'),
-                        'pct_off_high': fv('percent_off_52w_high'),
-                        'pct_off_low':  fv('percent_off_52w_low'),
-                        'vol_diff':     fv('vol_diff_50_percent'),
-                        'pct_chg_15d':  fv('percent_change_15d'),
-                        'pct_chg_20d':  fv('percent_change_20d'),
-                        'pct_chg_126d': fv('percent_change_126d'),
-                    }
-
-                    conn.execute(text("""
-                        INSERT INTO stock_indicators (
-                            symbol, date,
-                            sma_10, sma_21, sma_50, sma_150, sma_200,
-                            sma_200_1m_ago, sma_200_2m_ago, sma_200_3m_ago, sma_200_4m_ago, sma_200_5m_ago,
-                            sma_30w, sma_40w,
-                            fifty_two_week_high, fifty_two_week_low, average_volume_50,
-                            price_minus_sma_10, price_minus_sma_21, price_minus_sma_50,
-                            price_minus_sma_150, price_minus_sma_200,
-                            price_vs_sma_10_percent, price_vs_sma_21_percent, price_vs_sma_50_percent,
-                            price_vs_sma_150_percent, price_vs_sma_200_percent,
-                            percent_off_52w_high, percent_off_52w_low, vol_diff_50_percent,
-                            percent_change_15d, percent_change_20d, percent_change_126d
-                        ) VALUES (
-                            :symbol, :date,
-                            :sma_10, :sma_21, :sma_50, :sma_150, :sma_200,
-                            :sma_200_1m, :sma_200_2m, :sma_200_3m, :sma_200_4m, :sma_200_5m,
-                            :sma_30w, :sma_40w,
-                            :h52, :l52, :avg_vol,
-                            :pm10, :pm21, :pm50, :pm150, :pm200,
-                            :p10_pct, :p21_pct, :p50_pct, :p150_pct, :p200_pct,
-                            :pct_off_high, :pct_off_low, :vol_diff,
-                            :pct_chg_15d, :pct_chg_20d, :pct_chg_126d
-                        )
-                        ON CONFLICT (symbol, date) DO UPDATE SET
-                            sma_10  = EXCLUDED.sma_10,
-                            sma_21  = EXCLUDED.sma_21,
-                            sma_50  = EXCLUDED.sma_50,
-                            sma_150 = EXCLUDED.sma_150,
-                            sma_200 = EXCLUDED.sma_200,
-                            sma_200_1m_ago = EXCLUDED.sma_200_1m_ago,
-                            sma_200_2m_ago = EXCLUDED.sma_200_2m_ago,
-                            sma_200_3m_ago = EXCLUDED.sma_200_3m_ago,
-                            sma_200_4m_ago = EXCLUDED.sma_200_4m_ago,
-                            sma_200_5m_ago = EXCLUDED.sma_200_5m_ago,
-                            sma_30w = EXCLUDED.sma_30w,
-                            sma_40w = EXCLUDED.sma_40w,
-                            fifty_two_week_high = EXCLUDED.fifty_two_week_high,
-                            fifty_two_week_low  = EXCLUDED.fifty_two_week_low,
-                            average_volume_50   = EXCLUDED.average_volume_50,
-                            price_minus_sma_10  = EXCLUDED.price_minus_sma_10,
-                            price_minus_sma_21  = EXCLUDED.price_minus_sma_21,
-                            price_minus_sma_50  = EXCLUDED.price_minus_sma_50,
-                            price_minus_sma_150 = EXCLUDED.price_minus_sma_150,
-                            price_minus_sma_200 = EXCLUDED.price_minus_sma_200,
-                            price_vs_sma_10_percent  = EXCLUDED.price_vs_sma_10_percent,
-                            price_vs_sma_21_percent  = EXCLUDED.price_vs_sma_21_percent,
-                            price_vs_sma_50_percent  = EXCLUDED.price_vs_sma_50_percent,
-                            price_vs_sma_150_percent = EXCLUDED.price_vs_sma_150_percent,
-                            price_vs_sma_200_percent = EXCLUDED.price_vs_sma_200_percent,
-                            percent_off_52w_high = EXCLUDED.percent_off_52w_high,
-                            percent_off_52w_low  = EXCLUDED.percent_off_52w_low,
-                            vol_diff_50_percent  = EXCLUDED.vol_diff_50_percent,
-                            percent_change_15d   = EXCLUDED.percent_change_15d,
-                            percent_change_20d   = EXCLUDED.percent_change_20d,
-                            percent_change_126d  = EXCLUDED.percent_change_126d
-                    """), si_params)
+                conn.execute(text(f"CREATE TEMP TABLE tmp_latest_technicals ({temp_columns}) ON COMMIT DROP"))
+                cursor = conn.connection.cursor()
+                cursor.copy_expert(f"COPY tmp_latest_technicals ({columns}) FROM STDIN WITH CSV", buffer)
+
+                # ─── 1. تحديث change في prices فقط ───────────────────────
+                conn.execute(text("""
+                    UPDATE prices p SET change = t.change
+                    FROM tmp_latest_technicals t
+                    WHERE p.symbol = t.symbol AND p.date = t.date
+                """))
+
+                # ─── 2. UPSERT في stock_indicators ────────────────────────
+                conn.execute(text(f"""
+                    INSERT INTO stock_indicators ({si_columns})
+                    SELECT {si_columns} FROM tmp_latest_technicals
+                    ON CONFLICT (symbol, date) DO UPDATE SET
+                    {si_updates}
+                """))
 
                 trans.commit()
                 logger.info("✅ تم حفظ الإحصائيات في stock_indicators بنجاح.")
@@ -325,9 +333,41 @@ class TechnicalCalculator:
                 logger.error(f"❌ خطأ أثناء التحديث: {e}")
                 raise
 
+        bump_dataset_versions(TECHNICALS)
+
+    @staticmethod
+    def _latest_frame(df):
+        """
+        صف آخر تاريخ لكل سهم بأعمدة جدولَي الحفظ مباشرة (symbol, date, change, أعمدة stock_indicators)
+        محسوبة كعمليات على الأعمدة - NaN = NULL
+        """
+        latest = df[df['date'] == df.groupby('symbol')['date'].transform('max')]
+
+        out = pd.DataFrame({
+            'symbol': latest['symbol'].to_numpy(),
+            'date': pd.to_datetime(latest['date']).dt.date.to_numpy(),
+            'change': pd.to_numeric(latest['change'], errors='coerce').round(2).to_numpy(),
+        })
+        close = pd.to_numeric(latest['close'], errors='coerce').to_numpy(dtype=float)
+        for col in SAVED_INDICATOR_COLUMNS:
+            if col.startswith('price_minus_sma_'):
+                sma = pd.to_numeric(latest[col.replace('price_minus_', '')], errors='coerce').to_numpy(dtype=float)
+                out[col] = close - sma
+            else:
+                out[col] = pd.to_numeric(latest[col], errors='coerce').to_numpy(dtype=float)
+        out[SAVED_INDICATOR_COLUMNS] = out[SAVED_INDICATOR_COLUMNS].replace([np.inf, -np.inf], np.nan)
+        return out
+
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Technical market stats (SMA, 52W, volume, %) → stock_indicators")
+    parser.add_argument('--date', help="التاريخ المستهدف YYYY-MM-DD (افتراضياً آخر تاريخ)")
+    parser.add_argument('--full', action='store_true', help="تحميل كل جدول prices بدلاً من النافذة")
+    args = parser.parse_args()
+
     calc = TechnicalCalculator(str(settings.DATABASE_URL))
-    df = calc.load_data()
+    df = calc.load_data() if args.full else calc.load_window(args.date)
     df_calc = calc.calculate(df)
     calc.save_latest(df_calc)
\ No newline at end of file
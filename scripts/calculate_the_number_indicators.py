@@ -10,6 +10,9 @@ from sqlalchemy.orm import Session
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from scripts import indicator_kernels as kernels
+from scripts.indicator_kernels import to_array, to_list
+
 
 def convert_to_float(value):
     """Convert value to float, handling Decimal and None values"""
@@ -49,9 +52,7 @@ def calculate_sma(values: List[float], period: int) -> List[Optional[float]]:
     """Simple Moving Average"""
     if not values or len(values) < period:
         return [None] * len(values) if values else []
-    s = pd.Series(values)
-    sma = s.rolling(window=period, min_periods=period).mean()
-    return [float(x) if not pd.isna(x) else None for x in sma.tolist()]
+    return to_list(kernels.sma(to_array(values), period))
 
 
 def calculate_the_number_full(highs: List[float], lows: List[float], closes: List[float] = None):
@@ -5,7 +5,6 @@ Trend Screener Indicators - مطابق تماماً لـ Pine Script
 
 import sys
 import os
-import numpy as np
 import pandas as pd
 from decimal import Decimal
 from datetime import date
@@ -17,6 +16,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # استيراد الدوال المساعدة من ملف RSI
 from scripts.calculate_rsi_indicators import convert_to_float, get_val, calculate_sma, calculate_wma, calculate_ema
+from scripts import indicator_kernels as kernels
+from scripts.indicator_kernels import to_array, to_list
 
 
 def calculate_cci_pinescript_exact(highs: List[float], lows: List[float], closes: List[float], period: int = 14) -> List[Optional[float]]:
@@ -27,39 +28,7 @@ def calculate_cci_pinescript_exact(highs: List[float], lows: List[float], closes
     if not highs or not lows or not closes or len(highs) < period:
         return [None] * len(highs) if highs else []
     
-    # تحويل إلى numpy arrays
-    highs_arr = np.array([float(h) if h is not None else np.nan for h in highs])
-    lows_arr = np.array([float(l) if l is not None else np.nan for l in lows])
-    closes_arr = np.array([float(c) if c is not None else np.nan for c in closes])
-    
-    # Typical Price
-    tp = (highs_arr + lows_arr + closes_arr) / 3
-    
-    cci_values = []
-    
-    for i in range(len(tp)):
-        if i < period - 1 or np.isnan(tp[i]):
-            cci_values.append(None)
-            continue
-        
-        # SMA of TP for the period
-        tp_window = tp[i-period+1:i+1]
-        if np.any(np.isnan(tp_window)):
-            cci_values.append(None)
-            continue
-            
-        sma_tp = np.mean(tp_window)
-        
-        # Mean Deviation
-        mean_dev = np.mean(np.abs(tp_window - sma_tp))
-        
-        if mean_dev == 0:
-            cci_values.append(0.0)
-        else:
-            cci = (tp[i] - sma_tp) / (0.015 * mean_dev)
-            cci_values.append(float(cci))
-    
-    return cci_values
+    return to_list(kernels.cci(to_array(highs), to_array(lows), to_array(closes), period))
 
 
 def calculate_aroon_pinescript_exact(highs: List[float], lows: List[float], period: int = 25) -> Tuple[List[Optional[float]], List[Optional[float]]]:
@@ -74,48 +43,8 @@ def calculate_aroon_pinescript_exact(highs: List[float], lows: List[float], peri
     if not highs or not lows or len(highs) < period:
         return [None] * len(highs) if highs else [], [None] * len(highs) if highs else []
     
-    # Convert to numpy arrays for better performance
-    highs_arr = np.array([float(h) if h is not None else np.nan for h in highs])
-    lows_arr = np.array([float(l) if l is not None else np.nan for l in lows])
-    
-    aroon_up = []
-    aroon_down = []
-    
-    for i in range(len(highs_arr)):
-        # Aroon window needs to be 'period + 1' elements to reach exactly 'period' bars back
-        if i < period:
-            aroon_up.append(None)
-            aroon_down.append(None)
-            continue
-        
-        # Window of period + 1 bars (e.g. 26 bars for period 25, indices i-period to i)
-        window_high = highs_arr[i - period: i + 1]
-        window_low  = lows_arr[i - period: i + 1]
-        
-        if np.any(np.isnan(window_high)) or np.any(np.isnan(window_low)):
-            aroon_up.append(None)
-            aroon_down.append(None)
-            continue
-        
-        # Aroon Up: Find offset of HIGHEST high. If tie, take the MOST RECENT (rightmost)
-        max_val = np.max(window_high)
-        max_indices = np.where(window_high == max_val)[0]
-        recent_occurrence = max_indices[-1]  # rightmost index
-        days_since_high = (len(window_high) - 1) - recent_occurrence
-        
-        # Aroon Down: Find offset of LOWEST low. If tie, take the MOST RECENT (rightmost)
-        min_val = np.min(window_low)
-        min_indices = np.where(window_low == min_val)[0]
-        recent_occurrence_low = min_indices[-1]
-        days_since_low = (len(window_low) - 1) - recent_occurrence_low
-        
-        aroon_up_val = 100.0 * (period - days_since_high) / period
-        aroon_down_val = 100.0 * (period - days_since_low) / period
-        
-        aroon_up.append(float(aroon_up_val))
-        aroon_down.append(float(aroon_down_val))
-    
-    return aroon_up, aroon_down
+    aroon_up, aroon_down = kernels.aroon(to_array(highs), to_array(lows), period)
+    return to_list(aroon_up), to_list(aroon_down)
 
 
 def calculate_price_moving_averages(closes: List[float]) -> Dict[str, Any]:
@@ -12,7 +12,6 @@ import numpy as np
 import logging
 import io
 import csv
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Any
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -21,261 +20,393 @@ from app.core.database import SessionLocal
 from sqlalchemy import text
 from sqlalchemy.dialects.postgresql import insert
 from app.models.stock_indicators import StockIndicator
+from app.core.cache_versions import STOCK_INDICATORS, bump_dataset_versions
+from app.services.price_store import load_price_store
 
 from scripts.calculate_technicals import TechnicalCalculator
-from scripts.indicators_data_service import IndicatorsDataService
-from scripts.calculate_rsi_indicators import calculate_rsi_components, calculate_rsi_pinescript, calculate_sma, calculate_wma, calculate_ema
-from scripts.calculate_the_number_indicators import calculate_the_number_full
-from scripts.calculate_trend_screener_indicators import calculate_trend_components, calculate_trend_conditions
+from scripts.grouped_rolling import GroupedRolling
+from scripts.shared_frame import SharedFrame, map_symbol_chunks, pack_frame, resolve_workers, unpack_frame
+from scripts import indicator_matrix as matrix
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def calculate_complete_indicators_for_symbol(symbol: str, df_prices: pd.DataFrame) -> List[Dict[str, Any]]:
-    """Calculate ALL indicators for a single symbol - comprehensive version"""
+TREND_CONDITION_KEYS = [
+    'is_etf_or_index', 'has_gap', 'trend_signal',
+    'price_gt_sma18', 'price_gt_sma9_weekly', 'sma_trend_daily', 'sma_trend_weekly',
+    'cci_gt_100', 'cci_ema20_gt_0_daily', 'cci_ema20_gt_0_weekly',
+    'aroon_up_gt_70', 'aroon_down_lt_30',
+    'ema10_gt_sma50', 'ema10_gt_sma200', 'ema21_gt_sma50', 'ema21_gt_sma200',
+    'sma50_gt_sma150', 'sma50_gt_sma200', 'sma150_gt_sma200',
+    'sma200_gt_sma200_1m_ago', 'sma200_gt_sma200_2m_ago', 'sma200_gt_sma200_3m_ago',
+    'sma200_gt_sma200_4m_ago', 'sma200_gt_sma200_5m_ago',
+]
+
+
+def _gt_rounded(values: np.ndarray, threshold: float) -> np.ndarray:
+    """نفس `sf(v) > threshold if v else False`: None/NaN/0 → False والمقارنة بعد التقريب لـ 4 خانات"""
+    return (values != 0) & (np.round(values, 4) > threshold)
+
+
+def _lt_rounded(values: np.ndarray, threshold: float) -> np.ndarray:
+    """نفس `sf(v) < threshold if v else False`"""
+    return (values != 0) & (np.round(values, 4) < threshold)
+
+
+# ============ الحساب المصفوفي لكل الأسهم (Backfill) ============
+MIN_HISTORY_BARS = 200   # الأسهم بأقل من 200 شمعة لا تُحسب
+WARMUP_BARS = 100        # أول 100 شمعة لا تُحفظ (استقرار المؤشرات)
+MIN_WEEKLY_BARS = 20     # prepare_weekly_dataframe يرجع None لأقل من 20 أسبوعاً
+HISTORICAL_BLOCK_SYMBOLS = 50  # أعمدة (أسهم) كل كتلة → حد أعلى لذاكرة المصفوفات الوسيطة
+
+# أعمدة df_tech التي تقرؤها calculate_complete_indicators_block (تُنشر في الذاكرة المشتركة)
+BLOCK_INPUT_COLUMNS = (
+    ['open', 'high', 'low', 'close']
+    + [f'sma_{window}' for window in [10, 21, 50, 150, 200]]
+    + [f'sma_200_{months}m_ago' for months in range(1, 6)]
+    + ['sma_30w', 'sma_40w', 'fifty_two_week_high', 'fifty_two_week_low', 'average_volume_50']
+    + [f'price_vs_sma_{window}_percent' for window in [10, 21, 50, 150, 200]]
+    + ['percent_off_52w_high', 'percent_off_52w_low', 'vol_diff_50_percent']
+)
+BLOCK_KEY_COLUMNS = ['symbol', 'date', 'company_name']
+
+
+def _weekly_indicators_block(df_tech: pd.DataFrame, daily: GroupedRolling) -> Dict[str, np.ndarray]:
+    """
+    prepare_weekly_dataframe + merge_weekly_with_daily لكل أسهم الكتلة:
+    - شموع W-THU: open أول قيمة، high أعلى، low أدنى، close آخر قيمة (مع تجاهل NaN)
+      والأسبوع الذي ينقصه أي منها يُحذف (dropna)؛ السهم بأقل من MIN_WEEKLY_BARS أسبوعاً بدون قيم أسبوعية
+    - المؤشرات على مصفوفة (أسبوع × سهم)
+    - كل يوم يأخذ آخر أسبوع يكون آخر يوم تداول فيه في تاريخ اليوم أو قبله (reindex method='ffill')
+    → {column_w: مصفوفة بطول صفوف df_tech}
+    """
+    symbols = df_tech['symbol'].to_numpy()
+    dates = df_tech['date']
+    week_ending = dates + pd.to_timedelta((3 - dates.dt.dayofweek) % 7, unit='D')
+    weeks = GroupedRolling(symbols, week_ending.to_numpy())
+
+    def column(name):
+        return df_tech[name].to_numpy(dtype=np.float64)
+
+    bars = {
+        'open': weeks.first_valid(column('open')),
+        'high': np.fmax.reduceat(column('high'), weeks.starts),
+        'low': np.fmin.reduceat(column('low'), weeks.starts),
+        'close': weeks.last_valid(column('close')),
+    }
+    kept = np.flatnonzero(~np.isnan(np.column_stack(list(bars.values()))).any(axis=1))
+    weekly = GroupedRolling(symbols[weeks.starts[kept]])
+    closes, highs, lows = (weekly.to_matrix(bars[name][kept]) for name in ('close', 'high', 'low'))
+
+    rsi_w = matrix.rsi(closes, 14)
+    rsi_3_w = matrix.rsi(closes, 3)
+    sma3_rsi3_w = matrix.sma(rsi_3_w, 3)
+    high_sma13, low_sma13 = matrix.sma(highs, 13), matrix.sma(lows, 13)
+    high_sma65, low_sma65 = matrix.sma(highs, 65), matrix.sma(lows, 65)
+    rsi_14_9days_ago_w = matrix.shift(rsi_w, 9)
+    cfg_w = rsi_w - rsi_14_9days_ago_w + sma3_rsi3_w
+    cci_w = matrix.cci(highs, lows, closes, 14)
+    aroon_up_w, aroon_down_w = matrix.aroon(highs, lows, 25)
+
+    series = {
+        'close_w': closes,
+        'sma4_w': matrix.sma(closes, 4),
+        'sma9_w': matrix.sma(closes, 9),
+        'sma18_w': matrix.sma(closes, 18),
+        'wma45_close_w': matrix.wma(closes, 45),
+        'cci_w': cci_w,
+        'cci_ema20_w': matrix.ema(cci_w, 20),
+        'aroon_up_w': aroon_up_w,
+        'aroon_down_w': aroon_down_w,
+        'rsi_w': rsi_w,
+        'rsi_3_w': rsi_3_w,
+        'sma3_rsi3_w': sma3_rsi3_w,
+        'sma9_rsi_w': matrix.sma(rsi_w, 9),
+        'wma45_rsi_w': matrix.wma(rsi_w, 45),
+        'ema45_rsi_w': matrix.ema(rsi_w, 45),
+        'ema20_sma3_w': matrix.ema(sma3_rsi3_w, 20),
+        'sma9_close_w': matrix.sma(closes, 9),
+        'the_number_w': (high_sma13 + low_sma13 + high_sma65 + low_sma65) / 4.0,
+        'the_number_hl_w': (high_sma13 + high_sma65) / 2.0,
+        'the_number_ll_w': (low_sma13 + low_sma65) / 2.0,
+        'cfg_w': cfg_w,
+        'cfg_sma4_w': matrix.sma(cfg_w, 4),
+        'cfg_ema20_w': matrix.ema(cfg_w, 20),
+        'cfg_ema45_w': matrix.ema(cfg_w, 45),
+        'cfg_wma45_w': matrix.wma(cfg_w, 45),
+        'rsi_14_9days_ago_w': rsi_14_9days_ago_w,
+    }
+    series.update({
+        'stamp_a_value_w': series['cfg_w'],
+        'stamp_s9rsi_w': series['sma9_rsi_w'],
+        'stamp_e45cfg_w': series['cfg_ema45_w'],
+        'stamp_e45rsi_w': series['ema45_rsi_w'],
+        'stamp_e20sma3_w': series['ema20_sma3_w'],
+    })
+
+    # الأسبوع k يظهر من آخر يوم تداول فيه ويمتد (ffill) حتى الأسبوع المحفوظ التالي لنفس السهم
+    source = np.full(daily.size, -1)
+    source[weeks.starts[kept] + weeks.lengths[kept] - 1] = np.arange(len(kept))
+    latest = np.maximum.accumulate(np.where(source >= 0, np.arange(daily.size), -1))
+    row_start = np.repeat(daily.starts, daily.lengths)
+    week_of_row = np.where(latest >= row_start, source[np.maximum(latest, 0)], -1)
+    # -1 = لا أسبوع بعد (أو السهم بأقل من MIN_WEEKLY_BARS أسبوعاً) → آخر عنصر (NaN) بعد np.append
+    enough = np.append(np.repeat(weekly.lengths >= MIN_WEEKLY_BARS, weekly.lengths), False)
+    week_of_row = np.where(enough[week_of_row], week_of_row, -1)
+    return {name: np.append(weekly.from_matrix(values), np.nan)[week_of_row] for name, values in series.items()}
+
+
+def calculate_complete_indicators_block(df_tech: pd.DataFrame) -> pd.DataFrame:
+    """
+    كل المؤشرات التاريخية لكل أسهم df_tech دفعة واحدة (نفس نتائج الحساب لكل سهم):
+    كل سلسلة مصفوفة (شمعة × سهم) والمؤشرات تُحسب بالأعمدة (scripts/indicator_matrix)
+    بدلاً من تصفية df_prices وحلقة Python لكل سهم ولكل شمعة
+
+    df_tech: ناتج TechnicalCalculator.calculate (مرتب symbol, date)
+    → DataFrame بأعمدة stock_indicators (NaN = NULL) للأسهم التي لديها MIN_HISTORY_BARS شمعة
+      وللشموع بعد أول WARMUP_BARS (الـ index = index صفوف df_tech المقابلة)
+    """
+    index = df_tech.index
+    df_tech = df_tech.reset_index(drop=True)
+    symbols = df_tech['symbol'].to_numpy()
+    daily = GroupedRolling(symbols)
+
+    def column(name):
+        return daily.to_matrix(df_tech[name].to_numpy(dtype=np.float64))
+
+    closes, highs, lows, opens = column('close'), column('high'), column('low'), column('open')
+
+    # --- 1. RSI Components ---
+    rsi_14 = matrix.rsi(closes, 14)
+    rsi_3 = matrix.rsi(closes, 3)
+    sma9_rsi = matrix.sma(rsi_14, 9)
+    ema45_rsi = matrix.ema(rsi_14, 45)
+    sma3_rsi3 = matrix.sma(rsi_3, 3)
+    ema20_sma3 = matrix.ema(sma3_rsi3, 20)
+
+    # --- 2. The Number Components ---
+    high_sma13, low_sma13 = matrix.sma(highs, 13), matrix.sma(lows, 13)
+    high_sma65, low_sma65 = matrix.sma(highs, 65), matrix.sma(lows, 65)
+
+    # --- 3. Trend Components ---
+    cci = matrix.cci(highs, lows, closes, 14)
+    aroon_up, aroon_down = matrix.aroon(highs, lows, 25)
+    trend = {
+        'ema10': matrix.ema(closes, 10),
+        'ema21': matrix.ema(closes, 21),
+        'sma4': matrix.sma(closes, 4),
+        'sma9': matrix.sma(closes, 9),
+        'sma18': matrix.sma(closes, 18),
+        'wma45_close': matrix.wma(closes, 45),
+        'cci': cci,
+        'cci_ema20': matrix.ema(cci, 20),
+        'aroon_up': aroon_up,
+        'aroon_down': aroon_down,
+    }
+    sma50, sma150, sma200 = matrix.sma(closes, 50), matrix.sma(closes, 150), matrix.sma(closes, 200)
+
+    # --- 4. STAMP and CFG ---
+    rsi_14_9days_ago = matrix.shift(rsi_14, 9)
+    stamp_a_value = rsi_14 - rsi_14_9days_ago + sma3_rsi3
+    cfg_ema20 = matrix.ema(stamp_a_value, 20)
+    cfg_ema45 = matrix.ema(stamp_a_value, 45)
+
+    series = {
+        'close': closes,
+        'rsi_14': rsi_14,
+        'rsi_3': rsi_3,
+        'sma9_rsi': sma9_rsi,
+        'wma45_rsi': matrix.wma(rsi_14, 45),
+        'ema45_rsi': ema45_rsi,
+        'sma3_rsi3': sma3_rsi3,
+        'ema20_sma3': ema20_sma3,
+        'sma9_close': matrix.sma(closes, 9),
+        'high_sma13': high_sma13,
+        'low_sma13': low_sma13,
+        'high_sma65': high_sma65,
+        'low_sma65': low_sma65,
+        'the_number': (high_sma13 + low_sma13 + high_sma65 + low_sma65) / 4.0,
+        'the_number_hl': (high_sma13 + high_sma65) / 2.0,
+        'the_number_ll': (low_sma13 + low_sma65) / 2.0,
+        'rsi_14_9days_ago': rsi_14_9days_ago,
+        'stamp_a_value': stamp_a_value,
+        'stamp_s9rsi': sma9_rsi,
+        'stamp_e45cfg': cfg_ema45,
+        'stamp_e45rsi': ema45_rsi,
+        'stamp_e20sma3': ema20_sma3,
+        'cfg_daily': stamp_a_value,
+        'cfg_sma4': matrix.sma(stamp_a_value, 4),
+        'cfg_sma9': matrix.sma(stamp_a_value, 9),
+        'cfg_sma20': matrix.sma(stamp_a_value, 20),
+        'cfg_ema20': cfg_ema20,
+        'cfg_ema45': cfg_ema45,
+        'cfg_wma45': matrix.wma(stamp_a_value, 45),
+        'rsi_14_9days_ago_cfg': rsi_14_9days_ago,
+        'rsi_14_minus_9': rsi_14 - rsi_14_9days_ago,
+        **trend,
+    }
+
+    # --- 5. Conditions (نفس calculate_trend_conditions بدون مكونات أسبوعية) ---
+    names = symbols[daily.starts]
+    is_etf_or_index = np.array(['INDEX' in s or 'ETF' in s for s in names.astype(str)], dtype=bool)
+    is_etf_or_index = np.broadcast_to(is_etf_or_index, closes.shape)
+    prev_close = matrix.shift(closes, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gap_percent = np.abs((opens - prev_close) / prev_close)
+    has_gap = (opens > 0) & (prev_close > 0) & (gap_percent > 0.03)
+    no_weekly = np.zeros(closes.shape, dtype=bool)
+
+    conditions = {
+        'price_gt_sma18': closes > trend['sma18'],
+        'price_gt_sma9_weekly': no_weekly,
+        'sma_trend_daily': (trend['sma4'] > trend['sma9']) & (trend['sma9'] > trend['sma18']),
+        'sma_trend_weekly': no_weekly,
+        'cci_gt_100': cci > 100,
+        'cci_ema20_gt_0_daily': trend['cci_ema20'] > 0,
+        'cci_ema20_gt_0_weekly': no_weekly,
+        'aroon_up_gt_70': aroon_up > 70,
+        'aroon_down_lt_30': aroon_down < 30,
+        'ema10_gt_sma50': trend['ema10'] > sma50,
+        'ema10_gt_sma200': trend['ema10'] > sma200,
+        'ema21_gt_sma50': trend['ema21'] > sma50,
+        'ema21_gt_sma200': trend['ema21'] > sma200,
+        'sma50_gt_sma150': sma50 > sma150,
+        'sma50_gt_sma200': sma50 > sma200,
+        'sma150_gt_sma200': sma150 > sma200,
+    }
+    for months in range(1, 6):
+        conditions[f'sma200_gt_sma200_{months}m_ago'] = sma200 > matrix.shift(sma200, 21 * months)
+    valid_signal = np.logical_and.reduce([
+        conditions[key] for key in (
+            'price_gt_sma18', 'price_gt_sma9_weekly', 'sma_trend_daily', 'sma_trend_weekly',
+            'cci_gt_100', 'cci_ema20_gt_0_daily', 'cci_ema20_gt_0_weekly',
+            'aroon_up_gt_70', 'aroon_down_lt_30',
+        )
+    ])
+    conditions.update({
+        'is_etf_or_index': is_etf_or_index,
+        'has_gap': has_gap,
+        'trend_signal': valid_signal & ~is_etf_or_index & ~has_gap,
+    })
+
+    # --- 6. تحويل إلى صفوف (symbol, date) ---
+    keep = (daily.position >= WARMUP_BARS) & np.repeat(daily.lengths >= MIN_HISTORY_BARS, daily.lengths)
+    weekly_values = _weekly_indicators_block(df_tech, daily)
+
+    def rows(values):
+        return daily.from_matrix(values)[keep]
+
+    def stat(name):
+        return df_tech[name].to_numpy(dtype=np.float64)[keep]
+
+    out = {
+        'symbol': symbols[keep],
+        'date': df_tech['date'].to_numpy()[keep],
+        'company_name': df_tech['company_name'].to_numpy()[keep] if 'company_name' in df_tech.columns else symbols[keep],
+    }
+    out.update({name: rows(values) for name, values in series.items()})
+    for window in [10, 21, 50, 150, 200]:
+        out[f'sma_{window}'] = stat(f'sma_{window}')
+    for months in range(1, 6):
+        out[f'sma_200_{months}m_ago'] = stat(f'sma_200_{months}m_ago')
+    for name in ['sma_30w', 'sma_40w', 'fifty_two_week_high', 'fifty_two_week_low', 'average_volume_50']:
+        out[name] = stat(name)
+    for window in [10, 21, 50, 150, 200]:
+        out[f'price_minus_sma_{window}'] = out['close'] - out[f'sma_{window}']
+    for name in [
+        'price_vs_sma_10_percent', 'price_vs_sma_21_percent', 'price_vs_sma_50_percent',
+        'price_vs_sma_150_percent', 'price_vs_sma_200_percent',
+        'percent_off_52w_high', 'percent_off_52w_low', 'vol_diff_50_percent',
+    ]:
+        out[name] = stat(name)
+    out.update({name: values[keep] for name, values in weekly_values.items()})
+
+    out.update({key: rows(conditions[key]) for key in TREND_CONDITION_KEYS})
+    out['rsi_lt_80_d'] = _lt_rounded(out['rsi_14'], 80)
+    out['rsi_lt_80_w'] = _lt_rounded(out['rsi_w'], 80)
+    out['cfg_gt_50_daily'] = _gt_rounded(out['cfg_daily'], 50)
+    out['cfg_ema45_gt_50'] = _gt_rounded(out['cfg_ema45'], 50)
+    out['cfg_ema20_gt_50'] = _gt_rounded(out['cfg_ema20'], 50)
+
+    result = pd.DataFrame(out, index=index[keep])
+    result.replace([np.inf, -np.inf], np.nan, inplace=True)
+    return result
+
+
+def calculate_complete_block_chunk(frame: SharedFrame, start: int, stop: int) -> Dict[str, Any]:
+    """
+    Worker (map_symbol_chunks): calculate_complete_indicators_block للأسهم [start, stop) من الذاكرة المشتركة
+    → كتلة pack_frame (بدون symbol / date / company_name - تُستعاد من index في العملية الرئيسية)
+    """
+    block = calculate_complete_indicators_block(frame.frame(start, stop, BLOCK_INPUT_COLUMNS))
+    return pack_frame(block, skip=BLOCK_KEY_COLUMNS)
+
+
+def _copy_upsert_complete(db_session, keys: List[str], csv_buffer: io.StringIO):
+    """COPY لجدول مؤقت ثم UPSERT واحد إلى stock_indicators (بدون commit)"""
+    # We need the raw psycopg2 connection to use copy_expert
+    raw_conn = db_session.connection().connection
+    cursor = raw_conn.cursor()
+
+    # 1. Create a temporary table with the exact same structure
+    temp_table_name = "temp_stock_indicators"
+    cursor.execute(f"CREATE TEMP TABLE {temp_table_name} (LIKE stock_indicators INCLUDING ALL)")
+
+    # 2. Use COPY to load data directly into the temp table
+    columns_str = ", ".join(keys)
+    copy_sql = f"COPY {temp_table_name} ({columns_str}) FROM STDIN WITH CSV"
+    cursor.copy_expert(sql=copy_sql, file=csv_buffer)
+
+    # 3. UPSERT data from the temp table to the main table
+    # We create the SET clause dynamically for all columns except the primary keys
+    update_cols = [col for col in keys if col not in ('id', 'symbol', 'date', 'created_at')]
+    set_statements = ", ".join([f"{col} = EXCLUDED.{col}" for col in update_cols])
+
+    upsert_sql = f"""
+        INSERT INTO stock_indicators ({columns_str})
+        SELECT {columns_str} FROM {temp_table_name}
+        ON CONFLICT (symbol, date) DO UPDATE SET
+        {set_statements};
+    """
+    cursor.execute(upsert_sql)
+
+    # 4. Drop the temporary table (optional as it drops on disconnect, but good practice)
+    cursor.execute(f"DROP TABLE {temp_table_name}")
+
+
+def _insert_complete_records(records: List[Dict[str, Any]], db_session) -> int:
+    """Fallback: standard chunked upsert if COPY fails"""
     try:
-        df_sym = df_prices[df_prices['symbol'] == symbol].sort_values('date').copy()
-        df_sym.set_index('date', inplace=True)
-
-        if len(df_sym) < 200:  # Need more data for all indicators
-            logger.warning(f"⚠️ {symbol}: Insufficient data ({len(df_sym)} rows)")
-            return []
-
-        closes = df_sym['close'].tolist()
-        highs = df_sym['high'].tolist()
-        lows = df_sym['low'].tolist()
-        opens = df_sym['open'].tolist()
-
-        # --- 1. RSI Components ---
-        rsi_components_data = calculate_rsi_components(closes)
-
-        # --- 2. The Number Components ---
-        tn_components = calculate_the_number_full(highs, lows, closes)
-
-        # --- 3. Trend Components ---
-        trend_components_data = calculate_trend_components(highs, lows, closes)
-
-        # --- 4. STAMP and CFG Calculations ---
-        rsi_14 = rsi_components_data['rsi_14']
-        rsi_3 = rsi_components_data['rsi_3']
-        sma3_rsi3 = rsi_components_data['sma3_rsi3']
-
-        stamp_a_value = []
-        rsi_14_9days_ago = []
-
-        for j in range(len(rsi_14)):
-            if j >= 9 and rsi_14[j-9] is not None:
-                rsi_14_9days_ago.append(rsi_14[j-9])
-                if rsi_14[j] is not None and sma3_rsi3[j] is not None:
-                    stamp_a_value.append(rsi_14[j] - rsi_14[j-9] + sma3_rsi3[j])
-                else:
-                    stamp_a_value.append(None)
-            else:
-                rsi_14_9days_ago.append(None)
-                stamp_a_value.append(None)
-
-        # CFG calculations
-        cfg_daily = stamp_a_value
-        cfg_sma4 = calculate_sma(stamp_a_value, 4) if len(stamp_a_value) > 4 else [None] * len(stamp_a_value)
-        cfg_sma9 = calculate_sma(stamp_a_value, 9) if len(stamp_a_value) > 9 else [None] * len(stamp_a_value)
-        cfg_sma20 = calculate_sma(stamp_a_value, 20) if len(stamp_a_value) > 20 else [None] * len(stamp_a_value)
-        cfg_ema20 = calculate_ema(stamp_a_value, 20) if len(stamp_a_value) > 20 else [None] * len(stamp_a_value)
-        cfg_ema45 = calculate_ema(stamp_a_value, 45) if len(stamp_a_value) > 45 else [None] * len(stamp_a_value)
-        cfg_wma45 = calculate_wma(stamp_a_value, 45) if len(stamp_a_value) > 45 else [None] * len(stamp_a_value)
-
-        # --- 5. Weekly Data ---
-        df_weekly = IndicatorsDataService.prepare_weekly_dataframe(df_sym) if len(df_sym) > 50 else None
-        if df_weekly is not None:
-            df_merged = IndicatorsDataService.merge_weekly_with_daily(df_sym, df_weekly)
-        else:
-            df_merged = df_sym.copy()
-
-        records = []
-
-        for idx in range(len(df_sym)):
-            row_date = df_sym.index[idx].date()
-            row_data = df_sym.iloc[idx]
-
-            if idx < 100:  # Skip first 100 days for indicator stability
-                continue
-
-            def sf(v): # safe float
-                return round(float(v), 4) if v is not None and not pd.isna(v) else None
-
-            # Trend conditions
-            tc = calculate_trend_conditions(trend_components_data, {}, idx, 0, symbol, df_sym)
-
-            # ---------------- COMPLETE INDICATORS FOR STOCK_INDICATORS TABLE ----------------
-            item = {
-                'symbol': symbol,
-                'date': row_date,
-                'company_name': row_data.get('company_name', symbol),
-                'close': sf(closes[idx]),
-
-                # ============ 1. RSI COMPONENTS ============
-                'rsi_14': sf(rsi_components_data['rsi_14'][idx]),
-                'rsi_3': sf(rsi_components_data['rsi_3'][idx]),
-                'sma9_rsi': sf(rsi_components_data['sma9_rsi'][idx]),
-                'wma45_rsi': sf(rsi_components_data['wma45_rsi'][idx]),
-                'ema45_rsi': sf(rsi_components_data['ema45_rsi'][idx]),
-                'sma3_rsi3': sf(rsi_components_data['sma3_rsi3'][idx]),
-                'ema20_sma3': sf(rsi_components_data['ema20_sma3'][idx]),
-
-                # ============ 2. THE NUMBER COMPONENTS ============
-                'sma9_close': sf(tn_components['sma9_close'][idx]),
-                'high_sma13': sf(tn_components['high_sma13'][idx]),
-                'low_sma13': sf(tn_components['low_sma13'][idx]),
-                'high_sma65': sf(tn_components['high_sma65'][idx]),
-                'low_sma65': sf(tn_components['low_sma65'][idx]),
-                'the_number': sf(tn_components['the_number'][idx]),
-                'the_number_hl': sf(tn_components['the_number_hl'][idx]),
-                'the_number_ll': sf(tn_components['the_number_ll'][idx]),
-
-                # ============ 3. STAMP INDICATOR COMPONENTS ============
-                'rsi_14_9days_ago': sf(rsi_14_9days_ago[idx]),
-                'stamp_a_value': sf(stamp_a_value[idx]),
-                'stamp_s9rsi': sf(rsi_components_data['sma9_rsi'][idx]),
-                'stamp_e45cfg': sf(cfg_ema45[idx]) if cfg_ema45 and idx < len(cfg_ema45) else None,
-                'stamp_e45rsi': sf(rsi_components_data['ema45_rsi'][idx]),
-                'stamp_e20sma3': sf(rsi_components_data['ema20_sma3'][idx]),
-
-                # ============ 4. CFG ANALYSIS ============
-                'cfg_daily': sf(cfg_daily[idx]),
-                'cfg_sma4': sf(cfg_sma4[idx]) if cfg_sma4 and idx < len(cfg_sma4) else None,
-                'cfg_sma9': sf(cfg_sma9[idx]) if cfg_sma9 and idx < len(cfg_sma9) else None,
-                'cfg_sma20': sf(cfg_sma20[idx]) if cfg_sma20 and idx < len(cfg_sma20) else None,
-                'cfg_ema20': sf(cfg_ema20[idx]) if cfg_ema20 and idx < len(cfg_ema20) else None,
-                'cfg_ema45': sf(cfg_ema45[idx]) if cfg_ema45 and idx < len(cfg_ema45) else None,
-                'cfg_wma45': sf(cfg_wma45[idx]) if cfg_wma45 and idx < len(cfg_wma45) else None,
-                'rsi_14_9days_ago_cfg': sf(rsi_14_9days_ago[idx]),
-                'rsi_14_minus_9': sf(rsi_components_data['rsi_14'][idx] - rsi_14_9days_ago[idx]) if rsi_components_data['rsi_14'][idx] is not None and rsi_14_9days_ago[idx] is not None else None,
-
-                # ============ 5. TREND SCREENER COMPONENTS ============
-                'ema10': sf(trend_components_data['ema10'][idx]),
-                'ema21': sf(trend_components_data['ema21'][idx]),
-                'sma4': sf(trend_components_data['sma4'][idx]),
-                'sma9': sf(trend_components_data['sma9'][idx]),
-                'sma18': sf(trend_components_data['sma18'][idx]),
-                'wma45_close': sf(trend_components_data['wma45_close'][idx]),
-                'cci': sf(trend_components_data['cci'][idx]),
-                'cci_ema20': sf(trend_components_data['cci_ema20'][idx]),
-                'aroon_up': sf(trend_components_data['aroon_up'][idx]),
-                'aroon_down': sf(trend_components_data['aroon_down'][idx]),
-
-                # ============ 6. MARKET STATISTICS ============
-                'sma_10': sf(row_data.get('sma_10')),
-                'sma_21': sf(row_data.get('sma_21')),
-                'sma_50': sf(row_data.get('sma_50')),
-                'sma_150': sf(row_data.get('sma_150')),
-                'sma_200': sf(row_data.get('sma_200')),
-                'sma_200_1m_ago': sf(row_data.get('sma_200_1m_ago')),
-                'sma_200_2m_ago': sf(row_data.get('sma_200_2m_ago')),
-                'sma_200_3m_ago': sf(row_data.get('sma_200_3m_ago')),
-                'sma_200_4m_ago': sf(row_data.get('sma_200_4m_ago')),
-                'sma_200_5m_ago': sf(row_data.get('sma_200_5m_ago')),
-                'sma_30w': sf(row_data.get('sma_30w')),
-                'sma_40w': sf(row_data.get('sma_40w')),
-                'fifty_two_week_high': sf(row_data.get('fifty_two_week_high')),
-                'fifty_two_week_low': sf(row_data.get('fifty_two_week_low')),
-                'average_volume_50': sf(row_data.get('average_volume_50')),
-
-                'price_minus_sma_10': sf(closes[idx] - row_data.get('sma_10')) if pd.notnull(row_data.get('sma_10')) else None,
-                'price_minus_sma_21': sf(closes[idx] - row_data.get('sma_21')) if pd.notnull(row_data.get('sma_21')) else None,
-                'price_minus_sma_50': sf(closes[idx] - row_data.get('sma_50')) if pd.notnull(row_data.get('sma_50')) else None,
-                'price_minus_sma_150': sf(closes[idx] - row_data.get('sma_150')) if pd.notnull(row_data.get('sma_150')) else None,
-                'price_minus_sma_200': sf(closes[idx] - row_data.get('sma_200')) if pd.notnull(row_data.get('sma_200')) else None,
-
-                'price_vs_sma_10_percent': sf(row_data.get('price_vs_sma_10_percent')),
-                'price_vs_sma_21_percent': sf(row_data.get('price_vs_sma_21_percent')),
-                'price_vs_sma_50_percent': sf(row_data.get('price_vs_sma_50_percent')),
-                'price_vs_sma_150_percent': sf(row_data.get('price_vs_sma_150_percent')),
-                'price_vs_sma_200_percent': sf(row_data.get('price_vs_sma_200_percent')),
-                'percent_off_52w_high': sf(row_data.get('percent_off_52w_high')),
-                'percent_off_52w_low': sf(row_data.get('percent_off_52w_low')),
-                'vol_diff_50_percent': sf(row_data.get('vol_diff_50_percent')),
-
-                # ============ 7. WEEKLY VALUES ============
-                'close_w': sf(df_merged.iloc[idx].get('close_w')) if 'close_w' in df_merged.columns else None,
-                'sma4_w': sf(df_merged.iloc[idx].get('sma4_w')) if 'sma4_w' in df_merged.columns else None,
-                'sma9_w': sf(df_merged.iloc[idx].get('sma9_w')) if 'sma9_w' in df_merged.columns else None,
-                'sma18_w': sf(df_merged.iloc[idx].get('sma18_w')) if 'sma18_w' in df_merged.columns else None,
-                'wma45_close_w': sf(df_merged.iloc[idx].get('wma45_close_w')) if 'wma45_close_w' in df_merged.columns else None,
-                'cci_w': sf(df_merged.iloc[idx].get('cci_w')) if 'cci_w' in df_merged.columns else None,
-                'cci_ema20_w': sf(df_merged.iloc[idx].get('cci_ema20_w')) if 'cci_ema20_w' in df_merged.columns else None,
-                'aroon_up_w': sf(df_merged.iloc[idx].get('aroon_up_w')) if 'aroon_up_w' in df_merged.columns else None,
-                'aroon_down_w': sf(df_merged.iloc[idx].get('aroon_down_w')) if 'aroon_down_w' in df_merged.columns else None,
-
-                'rsi_w': sf(df_merged.iloc[idx].get('rsi_w')) if 'rsi_w' in df_merged.columns else None,
-                'rsi_3_w': sf(df_merged.iloc[idx].get('rsi_3_w')) if 'rsi_3_w' in df_merged.columns else None,
-                'sma3_rsi3_w': sf(df_merged.iloc[idx].get('sma3_rsi3_w')) if 'sma3_rsi3_w' in df_merged.columns else None,
-                'sma9_rsi_w': sf(df_merged.iloc[idx].get('sma9_rsi_w')) if 'sma9_rsi_w' in df_merged.columns else None,
-                'wma45_rsi_w': sf(df_merged.iloc[idx].get('wma45_rsi_w')) if 'wma45_rsi_w' in df_merged.columns else None,
-                'ema45_rsi_w': sf(df_merged.iloc[idx].get('ema45_rsi_w')) if 'ema45_rsi_w' in df_merged.columns else None,
-                'ema20_sma3_w': sf(df_merged.iloc[idx].get('ema20_sma3_w')) if 'ema20_sma3_w' in df_merged.columns else None,
-
-                'sma9_close_w': sf(df_merged.iloc[idx].get('sma9_close_w')) if 'sma9_close_w' in df_merged.columns else None,
-                'the_number_w': sf(df_merged.iloc[idx].get('the_number_w')) if 'the_number_w' in df_merged.columns else None,
-                'the_number_hl_w': sf(df_merged.iloc[idx].get('the_number_hl_w')) if 'the_number_hl_w' in df_merged.columns else None,
-                'the_number_ll_w': sf(df_merged.iloc[idx].get('the_number_ll_w')) if 'the_number_ll_w' in df_merged.columns else None,
-
-                'cfg_w': sf(df_merged.iloc[idx].get('cfg_w')) if 'cfg_w' in df_merged.columns else None,
-                'cfg_sma4_w': sf(df_merged.iloc[idx].get('cfg_sma4_w')) if 'cfg_sma4_w' in df_merged.columns else None,
-                'cfg_ema20_w': sf(df_merged.iloc[idx].get('cfg_ema20_w')) if 'cfg_ema20_w' in df_merged.columns else None,
-                'cfg_ema45_w': sf(df_merged.iloc[idx].get('cfg_ema45_w')) if 'cfg_ema45_w' in df_merged.columns else None,
-                'cfg_wma45_w': sf(df_merged.iloc[idx].get('cfg_wma45_w')) if 'cfg_wma45_w' in df_merged.columns else None,
-
-                'rsi_14_9days_ago_w': sf(df_merged.iloc[idx].get('rsi_14_9days_ago_w')) if 'rsi_14_9days_ago_w' in df_merged.columns else None,
-                'stamp_a_value_w': sf(df_merged.iloc[idx].get('stamp_a_value_w')) if 'stamp_a_value_w' in df_merged.columns else None,
-                'stamp_s9rsi_w': sf(df_merged.iloc[idx].get('stamp_s9rsi_w')) if 'stamp_s9rsi_w' in df_merged.columns else None,
-                'stamp_e45cfg_w': sf(df_merged.iloc[idx].get('stamp_e45cfg_w')) if 'stamp_e45cfg_w' in df_merged.columns else None,
-                'stamp_e45rsi_w': sf(df_merged.iloc[idx].get('stamp_e45rsi_w')) if 'stamp_e45rsi_w' in df_merged.columns else None,
-                'stamp_e20sma3_w': sf(df_merged.iloc[idx].get('stamp_e20sma3_w')) if 'stamp_e20sma3_w' in df_merged.columns else None,
-
-                # ============ 8. BOOLEAN CONDITIONS ============
-                'is_etf_or_index': bool(tc.get('is_etf_or_index')),
-                'has_gap': bool(tc.get('has_gap')),
-                'trend_signal': bool(tc.get('trend_signal')),
-                'price_gt_sma18': bool(tc.get('price_gt_sma18')),
-                'price_gt_sma9_weekly': bool(tc.get('price_gt_sma9_weekly')),
-                'sma_trend_daily': bool(tc.get('sma_trend_daily')),
-                'sma_trend_weekly': bool(tc.get('sma_trend_weekly')),
-                'cci_gt_100': bool(tc.get('cci_gt_100')),
-                'cci_ema20_gt_0_daily': bool(tc.get('cci_ema20_gt_0_daily')),
-                'cci_ema20_gt_0_weekly': bool(tc.get('cci_ema20_gt_0_weekly')),
-                'aroon_up_gt_70': bool(tc.get('aroon_up_gt_70')),
-                'aroon_down_lt_30': bool(tc.get('aroon_down_lt_30')),
-
-                'ema10_gt_sma50': bool(tc.get('ema10_gt_sma50')),
-                'ema10_gt_sma200': bool(tc.get('ema10_gt_sma200')),
-                'ema21_gt_sma50': bool(tc.get('ema21_gt_sma50')),
-                'ema21_gt_sma200': bool(tc.get('ema21_gt_sma200')),
-                'sma50_gt_sma150': bool(tc.get('sma50_gt_sma150')),
-                'sma50_gt_sma200': bool(tc.get('sma50_gt_sma200')),
-                'sma150_gt_sma200': bool(tc.get('sma150_gt_sma200')),
-
-                'sma200_gt_sma200_1m_ago': bool(tc.get('sma200_gt_sma200_1m_ago')),
-                'sma200_gt_sma200_2m_ago': bool(tc.get('sma200_gt_sma200_2m_ago')),
-                'sma200_gt_sma200_3m_ago': bool(tc.get('sma200_gt_sma200_3m_ago')),
-                'sma200_gt_sma200_4m_ago': bool(tc.get('sma200_gt_sma200_4m_ago')),
-                'sma200_gt_sma200_5m_ago': bool(tc.get('sma200_gt_sma200_5m_ago')),
-
-                # RSI Screener conditions (simplified)
-                'rsi_lt_80_d': sf(rsi_components_data['rsi_14'][idx]) < 80 if rsi_components_data['rsi_14'][idx] else False,
-                'rsi_lt_80_w': sf(df_merged.iloc[idx].get('rsi_w')) < 80 if df_merged.iloc[idx].get('rsi_w') else False,
-
-                # CFG conditions
-                'cfg_gt_50_daily': sf(cfg_daily[idx]) > 50 if cfg_daily[idx] else False,
-                'cfg_ema45_gt_50': sf(cfg_ema45[idx]) > 50 if cfg_ema45 and idx < len(cfg_ema45) and cfg_ema45[idx] else False,
-                'cfg_ema20_gt_50': sf(cfg_ema20[idx]) > 50 if cfg_ema20 and idx < len(cfg_ema20) and cfg_ema20[idx] else False,
+        logger.info("⚠️ Falling back to slow standard insert method...")
+        chunk_size = 200
+        total_saved = 0
+        for i in range(0, len(records), chunk_size):
+            chunk = records[i:i + chunk_size]
+            stmt = insert(StockIndicator).values(chunk)
+            update_dict = {
+                c.name: c for c in stmt.excluded
+                if c.name not in ('id', 'symbol', 'date', 'created_at')
             }
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['symbol', 'date'],
+                set_=update_dict
+            )
+            db_session.execute(stmt)
+            total_saved += len(chunk)
+        db_session.commit()
+        return total_saved
+    except Exception as e2:
+        logger.error(f"❌ Total failure in saving records: {e2}")
+        db_session.rollback()
+        return 0
 
-            records.append(item)
 
-        return records
+def _saved(count: int) -> int:
+    """بعد أي حفظ في stock_indicators: زيادة إصدار الكاش حتى لا تُقدَّم نتائج الـ screeners القديمة"""
+    if count:
+        bump_dataset_versions(STOCK_INDICATORS)
+    return count
 
-    except Exception as e:
-        logger.error(f"❌ Error calculating indicators for {symbol}: {e}")
-        return []
 
 def bulk_save_complete_records(records: List[Dict[str, Any]], db_session):
     """Save complete records in bulk using ultra-fast COPY with temporary table upsert"""
@@ -283,9 +414,6 @@ def bulk_save_complete_records(records: List[Dict[str, Any]], db_session):
         return 0
 
     try:
-        if not records:
-            return 0
-
         # Create a CSV in memory
         csv_buffer = io.StringIO()
         
@@ -300,69 +428,72 @@ def bulk_save_complete_records(records: List[Dict[str, Any]], db_session):
         writer = csv.DictWriter(csv_buffer, fieldnames=keys, extrasaction='ignore')
         writer.writerows(records)
         csv_buffer.seek(0)
-        
-        # We need the raw psycopg2 connection to use copy_expert
-        raw_conn = db_session.connection().connection
-        cursor = raw_conn.cursor()
-
-        # 1. Create a temporary table with the exact same structure
-        temp_table_name = "temp_stock_indicators"
-        cursor.execute(f"CREATE TEMP TABLE {temp_table_name} (LIKE stock_indicators INCLUDING ALL)")
-
-        # 2. Use COPY to load data directly into the temp table
-        columns_str = ", ".join(keys)
-        copy_sql = f"COPY {temp_table_name} ({columns_str}) FROM STDIN WITH CSV"
-        cursor.copy_expert(sql=copy_sql, file=csv_buffer)
-
-        # 3. UPSERT data from the temp table to the main table
-        # We create the SET clause dynamically for all columns except the primary keys
-        update_cols = [col for col in keys if col not in ('id', 'symbol', 'date', 'created_at')]
-        set_statements = ", ".join([f"{col} = EXCLUDED.{col}" for col in update_cols])
-
-        upsert_sql = f"""
-            INSERT INTO stock_indicators ({columns_str})
-            SELECT {columns_str} FROM {temp_table_name}
-            ON CONFLICT (symbol, date) DO UPDATE SET
-            {set_statements};
-        """
-        cursor.execute(upsert_sql)
-
-        # 4. Drop the temporary table (optional as it drops on disconnect, but good practice)
-        cursor.execute(f"DROP TABLE {temp_table_name}")
 
+        _copy_upsert_complete(db_session, keys, csv_buffer)
         db_session.commit()
-        return len(records)
+        return _saved(len(records))
 
     except Exception as e:
         logger.error(f"❌ Error saving complete records via COPY method: {e}")
         db_session.rollback()
-        # Fallback to standard line-by-line upsert if COPY fails
-        try:
-            logger.info("⚠️ Falling back to slow standard insert method...")
-            chunk_size = 200
-            total_saved = 0
-            for i in range(0, len(records), chunk_size):
-                chunk = records[i:i + chunk_size]
-                stmt = insert(StockIndicator).values(chunk)
-                update_dict = {
-                    c.name: c for c in stmt.excluded
-                    if c.name not in ('id', 'symbol', 'date', 'created_at')
-                }
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=['symbol', 'date'],
-                    set_=update_dict
-                )
-                db_session.execute(stmt)
-                total_saved += len(chunk)
-            db_session.commit()
-            return total_saved
-        except Exception as e2:
-            logger.error(f"❌ Total failure in saving records: {e2}")
-            db_session.rollback()
-            return 0
-
-def calculate_complete_historical_ultra_fast(symbols_list: List[str] = None, max_workers: int = 2):
-    """Ultra-fast complete historical calculation using parallel processing"""
+        return _saved(_insert_complete_records(records, db_session))
+
+
+def _round4(values: np.ndarray) -> np.ndarray:
+    """
+    round(v, 4) (نفس sf) لمصفوفة كاملة: np.round يضرب في 10^4 قبل التقريب فيخطئ أحياناً
+    عند منتصف الخانة الخامسة (61.72835) → هذه الحالات القليلة فقط تُقرب بـ round في Python
+    """
+    scaled = values * 1e4
+    out = np.round(scaled) / 1e4
+    with np.errstate(invalid='ignore'):
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= 4 * np.spacing(np.abs(scaled))
+    out[near_half] = [round(float(v), 4) for v in values[near_half]]
+    return out
+
+
+def bulk_save_complete_frame(frame: pd.DataFrame, db_session) -> int:
+    """
+    نفس bulk_save_complete_records لناتج calculate_complete_indicators_block بدون قاموس لكل صف:
+    الأعمدة العشرية تُقرب بـ _round4 ثم to_csv مباشرة (NaN → NULL)
+    """
+    if frame.empty:
+        return 0
+
+    try:
+        frame = frame.copy()
+        float_columns = frame.columns[frame.dtypes == np.float64]
+        frame[float_columns] = _round4(frame[float_columns].to_numpy())
+
+        csv_buffer = io.StringIO()
+        frame.to_csv(csv_buffer, index=False, header=False, na_rep='', date_format='%Y-%m-%d')
+        csv_buffer.seek(0)
+
+        _copy_upsert_complete(db_session, list(frame.columns), csv_buffer)
+        db_session.commit()
+        return _saved(len(frame))
+
+    except Exception as e:
+        logger.error(f"❌ Error saving complete frame via COPY method: {e}")
+        db_session.rollback()
+        records = frame.astype(object).where(frame.notna(), None).to_dict('records')
+        return _saved(_insert_complete_records(records, db_session))
+
+
+def calculate_complete_historical_ultra_fast(
+    symbols_list: List[str] = None,
+    max_workers: int = None,
+    block_size: int = None,
+):
+    """
+    Ultra-fast complete historical calculation:
+    df_tech يُنشر مرة واحدة في الذاكرة المشتركة (scripts/shared_frame)، وكل كتلة من block_size سهماً
+    تُحسب كمصفوفة (شمعة × سهم) - calculate_complete_indicators_block - في max_workers عملية
+    (None → settings.INDICATOR_WORKERS، 0 = كل الأنوية) ثم تُحفظ بـ COPY في العملية الرئيسية
+
+    block_size الافتراضي: settings.INDICATOR_CHUNK_SYMBOLS، أو توزيع الأسهم على كل العمليات
+    بحد أعلى HISTORICAL_BLOCK_SYMBOLS سهماً لكل كتلة
+    """
     db = SessionLocal()
     try:
         engine = db.get_bind()
@@ -370,68 +501,72 @@ def calculate_complete_historical_ultra_fast(symbols_list: List[str] = None, max
         tech_calc = TechnicalCalculator(settings.DATABASE_URL)
         logger.info("⏳ Loading ALL price data for Complete Historical Indicators...")
 
-        # Build query
-        query = "SELECT * FROM prices"
-        conditions = []
-        if symbols_list:
-            symbols_str = ','.join(f"'{s}'" for s in symbols_list)
-            conditions.append(f"symbol IN ({symbols_str})")
+        store = load_price_store(engine)
+        if store is not None:
+            df_prices = store.long_frame(symbols=symbols_list, include_meta=True)
+        else:
+            # Build query
+            query = "SELECT * FROM prices"
+            conditions = []
+            if symbols_list:
+                symbols_str = ','.join(f"'{s}'" for s in symbols_list)
+                conditions.append(f"symbol IN ({symbols_str})")
 
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
 
-        with engine.connect() as conn:
-            df_prices = pd.read_sql(text(query), conn)
+            with engine.connect() as conn:
+                df_prices = pd.read_sql(text(query), conn)
 
         if df_prices.empty:
             logger.warning("No data found!")
             return
 
         df_prices['date'] = pd.to_datetime(df_prices['date'])
-
-        # Get unique symbols
-        if symbols_list:
-            symbols = symbols_list
-        else:
-            symbols = df_prices['symbol'].unique().tolist()
+        symbols = df_prices['symbol'].unique().tolist()
 
         logger.info(f"✅ Loaded {len(df_prices)} price records for {len(symbols)} symbols.")
         logger.info("📈 Calculating historical market stats (ALL SMAs, 52W, Vol)...")
 
         df_tech = tech_calc.calculate(df_prices)
-        df_tech.replace([np.inf, -np.inf], None, inplace=True)
-        df_tech = df_tech.where(pd.notnull(df_tech), None)
-
-        logger.info(f"🚀 Processing {len(symbols)} stocks for ALL PineScript Indicators using {max_workers} workers...")
+        del df_prices
+
+        max_workers = resolve_workers(max_workers)
+        block_size = (
+            block_size or settings.INDICATOR_CHUNK_SYMBOLS
+            or max(1, min(HISTORICAL_BLOCK_SYMBOLS, -(-len(symbols) // max_workers)))
+        )
+        max_workers = min(max_workers, -(-len(symbols) // block_size))
+        logger.info(
+            f"🚀 Processing {len(symbols)} stocks for ALL PineScript Indicators "
+            f"in blocks of {block_size} using {max_workers} workers..."
+        )
 
         total_saved = 0
+        saved_symbols = 0
         start_time = time.time()
 
-        # Process symbols in parallel (use fewer workers for memory-intensive calculations)
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_symbol = {
-                executor.submit(calculate_complete_indicators_for_symbol, symbol, df_tech): symbol
-                for symbol in symbols
-            }
-
-            for future in as_completed(future_to_symbol):
-                symbol = future_to_symbol[future]
-                try:
-                    records = future.result()
-                    if records:
-                        saved = bulk_save_complete_records(records, db)
-                        total_saved += saved
-                        logger.info(f"✅ {symbol}: saved {saved} complete historical days")
-                    else:
-                        logger.warning(f"⚠️ {symbol}: no records generated")
-
-                except Exception as e:
-                    logger.error(f"❌ {symbol}: failed with error {e}")
-
-                # Memory cleanup
-                import gc
-                gc.collect()
-
+        df_tech = df_tech.reset_index(drop=True)
+        with SharedFrame.publish(df_tech, BLOCK_INPUT_COLUMNS) as frame:
+            # العمليات تقرأ الأعمدة من الذاكرة المشتركة؛ هنا يبقى فقط ما يلزم لإعادة بناء الصفوف
+            keys = df_tech[[c for c in BLOCK_KEY_COLUMNS if c in df_tech.columns]]
+            if 'company_name' not in keys.columns:
+                keys = keys.assign(company_name=keys['symbol'])
+            del df_tech
+
+            blocks = map_symbol_chunks(calculate_complete_block_chunk, frame, max_workers, block_size)
+            for start, stop, packed, error in blocks:
+                if error is not None:
+                    logger.error(f"❌ Block {frame.symbols[start]}..{frame.symbols[stop - 1]} failed with error {error}")
+                    continue
+                block = unpack_frame(packed, keys.iloc[packed['index']])
+                saved = bulk_save_complete_frame(block, db)
+                total_saved += saved
+                saved_symbols += block['symbol'].nunique()
+                logger.info(f"✅ Block: saved {saved:,} complete historical days for {block['symbol'].nunique()} symbols")
+
+        if saved_symbols < len(symbols):
+            logger.warning(f"⚠️ {len(symbols) - saved_symbols} symbols: Insufficient data (< {MIN_HISTORY_BARS} rows) or failed")
         total_time = time.time() - start_time
         logger.info(f"🎉 COMPLETED! Total saved: {total_saved:,} complete records in {total_time:.1f} seconds")
         logger.info(f"🚀 Average speed: {total_saved/total_time:.0f} records/second")
@@ -446,7 +581,8 @@ def calculate_complete_historical_ultra_fast(symbols_list: List[str] = None, max
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="ULTRA-FAST Calculate ALL indicators Historically - COMPLETE VERSION")
     parser.add_argument("--symbols", help="Comma-separated list of symbols (e.g. 1321,1010,2222)")
-    parser.add_argument("--workers", type=int, default=2, help="Number of parallel workers (default: 2, use fewer for complete calculations)")
+    parser.add_argument("--workers", type=int, help="Number of worker processes (default: INDICATOR_WORKERS, 0 = all cores)")
+    parser.add_argument("--block-size", type=int, help=f"Symbols per matrix block (default: spread over workers, max {HISTORICAL_BLOCK_SYMBOLS})")
     parser.add_argument("--symbol", help="Single symbol (alternative to --symbols)")
 
     args = parser.parse_args()
@@ -464,7 +600,7 @@ if __name__ == "__main__":
     print("   Calculates ALL indicators in stock_indicators table")
     print("="*100)
     print(f"📊 Target Symbols: {symbols_list if symbols_list else 'ALL'}")
-    print(f"⚡ Workers: {args.workers}")
+    print(f"⚡ Workers: {args.workers if args.workers is not None else 'auto'} | Block size: {args.block_size or 'auto'}")
     print("="*100)
 
-    calculate_complete_historical_ultra_fast(symbols_list, args.workers)
\ No newline at end of file
+    calculate_complete_historical_ultra_fast(symbols_list, args.workers, args.block_size)
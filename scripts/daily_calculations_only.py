@@ -7,7 +7,6 @@ import logging
 import datetime
 from pathlib import Path
 from datetime import date
-import pandas as pd
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
@@ -78,12 +77,9 @@ def run_calculations_only(target_date_str=None):
             
             logger.info("🧮 Calculating RS (Vectorized)...")
             calculator = RSCalculatorUltraFast(str(settings.DATABASE_URL))
-            df_all_results = calculator.calculate_full_history_optimized()
+            df_today = calculator.calculate_incremental([market_date])
             
-            if df_all_results is not None and not df_all_results.empty:
-                df_all_results['date'] = pd.to_datetime(df_all_results['date']).dt.date
-                df_today = df_all_results[df_all_results['date'] == market_date]
-                
+            if df_today is not None:
                 if not df_today.empty:
                     logger.info(f"💾 Saving {len(df_today)} RS records...")
                     calculator.save_bulk_results(df_today)
@@ -113,7 +109,8 @@ def run_calculations_only(target_date_str=None):
             
             logger.info("🧮 Calculating Technical Indicators (SMA, EMA, 52W, etc)...")
             tech_calc = TechnicalCalculator(str(settings.DATABASE_URL))
-            df_tech = tech_calc.load_data()
+            # نافذة آخر LOOKBACK_BARS صف لكل سهم بدلاً من كل جدول prices
+            df_tech = tech_calc.load_window(market_date)
             df_tech_res = tech_calc.calculate(df_tech)
             tech_calc.save_latest(df_tech_res)
             logger.info("✅ Technical Indicators Complete")
@@ -218,6 +215,10 @@ def run_calculations_only(target_date_str=None):
             processed, errors, successful = calculate_and_store_indicators(db, market_date)
             logger.info(f"✅ Stock Indicators Complete (Processed: {processed}, Successful: {successful}, Errors: {errors})")
             
+            # الـ screeners تقرأ من screener_snapshot - تحديثه بعد كتابة stock_indicators
+            from app.services.screener_snapshot import refresh_screener_snapshot
+            refresh_screener_snapshot(db)
+            
         except Exception as e:
             logger.error(f"❌ Stock Indicators Error: {e}")
             import traceback
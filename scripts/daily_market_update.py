@@ -17,8 +17,10 @@ import sys
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from app.core.config import settings
+from app.core.cache_versions import PRICES, bump_dataset_versions
 from app.core.database import SessionLocal 
 from app.models.price import Price
+from app.services.price_store import PriceStore
 # استيراد الخدمات الجديدة
 from app.services.daily_detailed_scraper import scrape_daily_details
 # ✅ استخدام الـ Calculator النهائي
@@ -152,24 +154,27 @@ def update_daily(target_date_str=None):
                 continue
             
         db.commit()
+        bump_dataset_versions(PRICES)
         logger.info(f"✅ Successfully saved/updated {success_count} price records for {market_date}.")
         
+        # 3b. Append the new trading day to the columnar price store (if it has been built)
+        try:
+            store = PriceStore()
+            if store.exists():
+                store.open().append_date(db.get_bind(), market_date)
+        except Exception as store_error:
+            logger.warning(f"⚠️ Price store not updated (calculators will sync it): {store_error}")
+        
         # 4. RS Calculation (Optimized Final)
         # -------------------------------------------------------------------
         logger.info("🧮 Starting RS Calculation (Incremental Mode)...")
         
         # Use the UltraFast Vectorized Calculator
-        # calculate_full_history_optimized returns a DataFrame of ALL calcs
+        # calculate_incremental loads only the trailing 252-day window for market_date
         calculator = RSCalculatorUltraFast(str(settings.DATABASE_URL))
-        df_all_results = calculator.calculate_full_history_optimized()
+        df_today = calculator.calculate_incremental([market_date])
         
-        if df_all_results is not None and not df_all_results.empty:
-            # FILTER: Keep only records for the target market_date
-            # Ensure date column is properly typed for filtering
-            df_all_results['date'] = pd.to_datetime(df_all_results['date']).dt.date
-            
-            df_today = df_all_results[df_all_results['date'] == market_date]
-            
+        if df_today is not None:
             if not df_today.empty:
                 logger.info(f"💾 Saving {len(df_today)} RS records for {market_date}...")
                 
@@ -186,7 +191,8 @@ def update_daily(target_date_str=None):
         logger.info("🧮 Calculating Technical Indicators (SMAs, 52W High/Low)...")
         from scripts.calculate_technicals import TechnicalCalculator
         tech_calc = TechnicalCalculator(str(settings.DATABASE_URL))
-        df_tech = tech_calc.load_data()
+        # نافذة آخر LOOKBACK_BARS صف لكل سهم بدلاً من كل جدول prices
+        df_tech = tech_calc.load_window(market_date)
         df_tech_res = tech_calc.calculate(df_tech)
         tech_calc.save_latest(df_tech_res)
         logger.info("✅ Technical Indicators Updated.")
@@ -255,6 +261,13 @@ def update_daily(target_date_str=None):
         processed, errors, successful = calculate_and_store_indicators(db, market_date)
         logger.info(f"✅ Stock Indicators Updated (Processed: {processed}, Successful: {successful}, Errors: {errors})")
         
+        # 9. Refresh Screener Snapshot
+        # -------------------------------------------------------------------
+        logger.info("🗂️ Refreshing Screener Snapshot...")
+        from app.services.screener_snapshot import refresh_screener_snapshot
+        
+        refresh_screener_snapshot(db)
+        
         logger.info("🎉 Daily Update Workflow Completed Successfully!")
 
     except Exception as e:
@@ -0,0 +1,161 @@
+"""
+Grouped Rolling - نوافذ متحركة لكل سهم على مصفوفة NumPy واحدة
+بدلاً من groupby('symbol').transform(lambda x: x.rolling(...)) لكل مؤشر
+
+- البيانات مرتبة (symbol, date) → كل سهم مقطع متجاور؛ الحدود تُحسب مرة واحدة
+- النوافذ لا تعبر حدود الأسهم: الصف يحصل على قيمة فقط إذا كان في مقطعه window صفاً حتى الآن
+- المجموع/الأعلى/الأدنى لنافذة بطول w: كل مقطع يُقسّم إلى كتل بطول w تنتهي عند آخر صفوفه،
+  ونافذة أي صف = لاحقة (suffix) كتلة بدايتها + سابقة (prefix) كتلة نهايتها (van Herk / Gil-Werman)
+  → عمليات تراكمية (cumsum / maximum.accumulate) على مصفوفة ثنائية الأبعاد بدون حلقات Python،
+  والمجاميع التراكمية محصورة داخل كتلة واحدة فلا يتراكم خطأ الفاصلة العائمة عبر كل التاريخ
+- الكتل تُعدّ من نهاية المقطع: قيم آخر الصفوف لا تعتمد على أين يبدأ التاريخ المحمّل
+  (حساب كامل أو نافذة آخر N شمعة → نفس الأرقام بالضبط)
+- NaN في النافذة → NaN (نفس rolling(window) في pandas مع min_periods = window)
+"""
+
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+
+class GroupedRolling:
+    """
+    keys: مصفوفة (أو عدة مصفوفات) مفاتيح مرتبة - كل تغيير في أي منها يبدأ مقطعاً جديداً
+    """
+
+    def __init__(self, *keys: np.ndarray):
+        self.size = len(keys[0]) if keys else 0
+        boundary = np.zeros(self.size, dtype=bool)
+        if self.size:
+            boundary[0] = True
+            for key in keys:
+                key = np.asarray(key)
+                boundary[1:] |= key[1:] != key[:-1]
+        self.starts = np.flatnonzero(boundary)
+        self.lengths = np.diff(np.append(self.starts, self.size))
+        # موضع كل صف داخل مقطعه (0 = أول صف للسهم)
+        self.position = np.arange(self.size) - np.repeat(self.starts, self.lengths)
+        self._layouts: Dict[int, Tuple[np.ndarray, np.ndarray, int]] = {}
+
+    @property
+    def groups(self) -> int:
+        return len(self.starts)
+
+    def group_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(self.groups), self.lengths)
+
+    # ------------------------------------------------------------------ #
+    # النوافذ
+    # ------------------------------------------------------------------ #
+    def _layout(self, window: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """موضع كل صف في مصفوفة الكتل (n_blocks, window) المسطحة + موضعه بعد الحشو"""
+        if window not in self._layouts:
+            # حشو في بداية كل مقطع حتى يصبح طوله مضاعفاً لـ window → آخر صف = نهاية كتلة
+            pad = (-self.lengths) % window
+            padded = self.position + np.repeat(pad, self.lengths)
+            blocks_per_group = (self.lengths + pad) // window
+            # أول كتلة لكل مقطع (صالح أيضاً بدون صفوف: مصفوفات فارغة)
+            first_block = (np.cumsum(blocks_per_group) - blocks_per_group).astype(np.int64)
+            block = np.repeat(first_block, self.lengths) + padded // window
+            flat = block * window + padded % window
+            self._layouts[window] = (flat, padded, int(blocks_per_group.sum()))
+        return self._layouts[window]
+
+    def _reduce(self, values: np.ndarray, window: int, accumulate: Callable, combine: Callable, fill: float) -> np.ndarray:
+        flat, padded, n_blocks = self._layout(window)
+        blocks = np.full(n_blocks * window, fill)
+        blocks[flat] = values
+        blocks = blocks.reshape(n_blocks, window)
+        prefix = accumulate(blocks, axis=1).ravel()
+        suffix = accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+
+        out = np.full(self.size, np.nan)
+        rows = np.flatnonzero(self.position >= window - 1)
+        end = flat[rows]
+        start = flat[rows - (window - 1)]
+        # النافذة = كتلة كاملة بالضبط → السابقة وحدها (بدون عدّ الكتلة مرتين)
+        aligned = (padded[rows] + 1) % window == 0
+        out[rows] = np.where(aligned, prefix[end], combine(suffix[start], prefix[end]))
+        return out
+
+    def _complete(self, valid: np.ndarray, window: int) -> np.ndarray:
+        """هل النافذة كاملة بدون NaN (العدّ على أعداد صحيحة → دقيق)"""
+        return self._reduce(valid.astype(np.float64), window, np.cumsum, np.add, 0.0) == window
+
+    def mean(self, values: np.ndarray, window: int) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        total = self._reduce(np.where(valid, values, 0.0), window, np.cumsum, np.add, 0.0)
+        return np.where(self._complete(valid, window), total / window, np.nan)
+
+    def max(self, values: np.ndarray, window: int) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        high = self._reduce(np.where(valid, values, -np.inf), window, np.maximum.accumulate, np.maximum, -np.inf)
+        return np.where(self._complete(valid, window), high, np.nan)
+
+    def min(self, values: np.ndarray, window: int) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        low = self._reduce(np.where(valid, values, np.inf), window, np.minimum.accumulate, np.minimum, np.inf)
+        return np.where(self._complete(valid, window), low, np.nan)
+
+    # ------------------------------------------------------------------ #
+    # الإزاحة
+    # ------------------------------------------------------------------ #
+    def shift(self, values: np.ndarray, periods: int) -> np.ndarray:
+        """قيمة نفس السهم قبل periods صفاً (NaN قبل ذلك)"""
+        values = np.asarray(values, dtype=np.float64)
+        out = np.full(self.size, np.nan)
+        rows = np.flatnonzero(self.position >= periods)
+        out[rows] = values[rows - periods]
+        return out
+
+    def diff(self, values: np.ndarray, periods: int = 1) -> np.ndarray:
+        return np.asarray(values, dtype=np.float64) - self.shift(values, periods)
+
+    def percent_change(self, values: np.ndarray, periods: int) -> np.ndarray:
+        """((x - x.shift(periods)) / x.shift(periods)) * 100 - الأساس 0 → NaN"""
+        base = self.shift(values, periods)
+        base[base == 0] = np.nan
+        return (np.asarray(values, dtype=np.float64) - base) / base * 100
+
+    def last_valid(self, values: np.ndarray) -> np.ndarray:
+        """آخر قيمة غير NaN في كل مقطع (مثل groupby().last()) → مصفوفة بطول عدد المقاطع"""
+        values = np.asarray(values, dtype=np.float64)
+        out = np.full(self.groups, np.nan)
+        rows = np.flatnonzero(~np.isnan(values))
+        if len(rows):
+            gid = self.group_ids()[rows]
+            last = np.flatnonzero(np.append(gid[1:] != gid[:-1], True))
+            out[gid[last]] = values[rows[last]]
+        return out
+
+    def first_valid(self, values: np.ndarray) -> np.ndarray:
+        """أول قيمة غير NaN في كل مقطع (مثل groupby().first())"""
+        values = np.asarray(values, dtype=np.float64)
+        out = np.full(self.groups, np.nan)
+        rows = np.flatnonzero(~np.isnan(values))
+        if len(rows):
+            gid = self.group_ids()[rows]
+            first = np.flatnonzero(np.insert(gid[1:] != gid[:-1], 0, True))
+            out[gid[first]] = values[rows[first]]
+        return out
+
+    # ------------------------------------------------------------------ #
+    # مصفوفة (شمعة × مقطع)
+    # ------------------------------------------------------------------ #
+    def to_matrix(self, values: np.ndarray) -> np.ndarray:
+        """
+        مصفوفة (أطول مقطع × عدد المقاطع): العمود j = صفوف المقطع j بالترتيب بدءاً من الصف 0
+        والباقي NaN - المؤشرات تُحسب على المحور 0 لكل الأسهم مرة واحدة
+        (ترتيب Fortran → كل عمود متجاور، فالنتائج تطابق حساب السلسلة المنفردة)
+        """
+        rows = int(self.lengths.max()) if self.groups else 0
+        out = np.full((rows, self.groups), np.nan, order='F')
+        out[self.position, self.group_ids()] = values
+        return out
+
+    def from_matrix(self, matrix: np.ndarray) -> np.ndarray:
+        """عكس to_matrix → مصفوفة بطول الصفوف الأصلية"""
+        return matrix[self.position, self.group_ids()]
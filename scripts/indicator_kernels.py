@@ -0,0 +1,164 @@
+"""
+Indicator Kernels - نسخ مصفوفية (NumPy) لمؤشرات Pine Script
+المدخلات float64 والمخرجات float64 حيث NaN = لا توجد قيمة
+
+الدوال هنا هي الأساس الذي تلتف حوله calculate_rsi_pinescript / calculate_sma /
+calculate_wma / calculate_ema في calculate_rsi_indicators.py و CCI / Aroon في
+calculate_trend_screener_indicators.py، وتحافظ على نفس طريقة البدء (seeding)
+المستخدمة في TradingView.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Iterable, List, Optional, Tuple
+from scipy.signal import lfilter
+
+
+def to_array(values: Iterable) -> np.ndarray:
+    """تحويل قائمة (قد تحتوي None / Decimal) إلى مصفوفة float64 مع NaN للقيم الفارغة"""
+    if isinstance(values, np.ndarray) and values.dtype == np.float64:
+        return values
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def to_list(arr: np.ndarray) -> List[Optional[float]]:
+    """تحويل مصفوفة float64 إلى List[Optional[float]] (NaN → None)"""
+    out = arr.astype(object)
+    out[np.isnan(arr)] = None
+    return out.tolist()
+
+
+def shift(values: np.ndarray, periods: int) -> np.ndarray:
+    """قيمة السلسلة قبل periods شمعة (NaN للبداية)"""
+    out = np.full(len(values), np.nan)
+    if periods < len(values):
+        out[periods:] = values[:len(values) - periods]
+    return out
+
+
+def _smooth(x: np.ndarray, alpha: float, seed: float) -> np.ndarray:
+    """
+    مرشح تكراري من الدرجة الأولى يبدأ من seed:
+    y[k] = alpha * x[k] + (1 - alpha) * y[k-1]
+    (نفس ترتيب العمليات في الحلقة الأصلية → نفس النتائج بالضبط)
+    """
+    if len(x) == 0:
+        return np.empty(0)
+    decay = 1 - alpha
+    out, _ = lfilter([alpha], [1.0, -decay], x, zi=[decay * seed])
+    return out
+
+
+def rsi(values: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI باستخدام RMA (Wilder) - البداية بمتوسط أول period تغيرات عند الشمعة period"""
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n < period + 1:
+        return out
+
+    deltas = np.diff(values)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+
+    alpha = 1.0 / period
+    avg_gain = np.empty(n - period)
+    avg_loss = np.empty(n - period)
+    avg_gain[0] = np.mean(gains[:period])
+    avg_loss[0] = np.mean(losses[:period])
+    avg_gain[1:] = _smooth(gains[period:], alpha, avg_gain[0])
+    avg_loss[1:] = _smooth(losses[period:], alpha, avg_loss[0])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi_vals = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    out[period:] = np.where(avg_loss == 0, 100.0, rsi_vals)
+    return out
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """Simple Moving Average - NaN إذا احتوت النافذة على NaN"""
+    if len(values) < period:
+        return np.full(len(values), np.nan)
+    return pd.Series(values).rolling(window=period, min_periods=period).mean().to_numpy()
+
+
+def wma(values: np.ndarray, period: int) -> np.ndarray:
+    """Weighted Moving Average بالأوزان 1..period عبر الالتفاف (convolution)"""
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n < period:
+        return out
+    weights = np.arange(1, period + 1, dtype=np.float64)
+    out[period - 1:] = np.convolve(values, weights[::-1], mode='valid') / weights.sum()
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Exponential Moving Average مطابق لـ TradingView:
+    - البداية = SMA لأول نافذة كاملة بدون NaN
+    - القيم NaN بعد البداية تُخرج NaN ولا تعيد ضبط الحالة
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    if n < period:
+        return out
+
+    valid = ~np.isnan(values)
+    # عدد القيم الصالحة في كل نافذة بطول period
+    counts = np.convolve(valid.astype(np.int64), np.ones(period, dtype=np.int64), mode='valid')
+    full = np.flatnonzero(counts == period)
+    if len(full) == 0:
+        return out
+
+    start = full[0] + period - 1
+    seed = np.mean(values[start - period + 1:start + 1])
+    out[start] = seed
+
+    rest = np.flatnonzero(valid[start + 1:]) + start + 1
+    out[rest] = _smooth(values[rest], 2.0 / (period + 1.0), seed)
+    return out
+
+
+def cci(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    CCI مطابق لـ Pine Script عبر نوافذ منزلقة (strided view) بدلاً من حلقة لكل شمعة:
+    (tp - sma(tp)) / (0.015 * mean(abs(tp - sma(tp))))
+    """
+    n = len(closes)
+    out = np.full(n, np.nan)
+    if n < period:
+        return out
+
+    tp = (highs + lows + closes) / 3
+    windows = sliding_window_view(tp, period)
+    sma_tp = windows.mean(axis=1)
+    mean_dev = np.abs(windows - sma_tp[:, None]).mean(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cci_vals = (tp[period - 1:] - sma_tp) / (0.015 * mean_dev)
+    # النوافذ التي تحتوي NaN تبقى NaN لأن المتوسط ينتشر NaN تلقائياً
+    out[period - 1:] = np.where(mean_dev == 0, 0.0, cci_vals)
+    return out
+
+
+def aroon(highs: np.ndarray, lows: np.ndarray, period: int = 25) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aroon Up/Down مطابق لـ Pine Script على نافذة period + 1 شمعة
+    عند التساوي نأخذ أحدث ظهور (rightmost): argmax على النافذة المعكوسة = عدد الأيام منذ القمة/القاع
+    """
+    n = len(highs)
+    up = np.full(n, np.nan)
+    down = np.full(n, np.nan)
+    if n <= period:
+        return up, down
+
+    windows_high = sliding_window_view(highs, period + 1)[:, ::-1]
+    windows_low = sliding_window_view(lows, period + 1)[:, ::-1]
+    days_since_high = np.argmax(windows_high, axis=1)
+    days_since_low = np.argmin(windows_low, axis=1)
+
+    has_nan = np.isnan(windows_high).any(axis=1) | np.isnan(windows_low).any(axis=1)
+    up[period:] = np.where(has_nan, np.nan, 100.0 * (period - days_since_high) / period)
+    down[period:] = np.where(has_nan, np.nan, 100.0 * (period - days_since_low) / period)
+    return up, down
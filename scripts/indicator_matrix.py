@@ -0,0 +1,170 @@
+"""
+Indicator Matrix - نفس مؤشرات indicator_kernels لكن على مصفوفة (شمعة × سهم) دفعة واحدة
+كل عمود سهم، والصف k = الشمعة رقم k لذلك السهم (GroupedRolling.to_matrix: محاذاة من البداية
+والباقي NaN) → كل المؤشرات تُحسب على المحور 0 لكل الأسهم بدون حلقة لكل سهم
+
+الصفوف أرقام شموع وليست تواريخ تقويم: نوافذ المؤشرات تمتد على أيام تداول السهم نفسه
+(مثل الحساب المنفرد) والـ NaN في نهاية العمود لا يؤثر على ما قبله.
+
+نفس طريقة البدء (seeding) ونفس ترتيب العمليات في indicator_kernels → نفس النتائج بالضبط
+لكل عمود (المصفوفات بترتيب Fortran حتى يكون كل عمود متجاوراً في الذاكرة)
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Tuple
+from scipy.signal import lfilter
+
+
+def _columns(values: np.ndarray) -> np.ndarray:
+    return np.asfortranarray(values, dtype=np.float64)
+
+
+def _empty(values: np.ndarray) -> np.ndarray:
+    return np.full(values.shape, np.nan, order='F')
+
+
+def _column_means(block: np.ndarray) -> np.ndarray:
+    """متوسط كل عمود بنفس جمع np.mean على سلسلة منفردة (صفوف متجاورة)"""
+    return np.ascontiguousarray(block.T).mean(axis=1)
+
+
+def _smooth(x: np.ndarray, alpha: float, seed: np.ndarray) -> np.ndarray:
+    """indicator_kernels._smooth لكل عمود: y[k] = alpha * x[k] + (1 - alpha) * y[k-1] مع بداية لكل عمود"""
+    if x.shape[0] == 0:
+        return np.empty(x.shape)
+    decay = 1 - alpha
+    out, _ = lfilter([alpha], [1.0, -decay], x, axis=0, zi=(decay * seed)[None, :])
+    return out
+
+
+def shift(values: np.ndarray, periods: int) -> np.ndarray:
+    """قيمة كل عمود قبل periods شمعة (NaN للبداية)"""
+    out = _empty(values)
+    if periods < values.shape[0]:
+        out[periods:] = values[:values.shape[0] - periods]
+    return out
+
+
+def rsi(values: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI باستخدام RMA (Wilder) - البداية بمتوسط أول period تغيرات عند الشمعة period"""
+    values = _columns(values)
+    n = values.shape[0]
+    out = _empty(values)
+    if n < period + 1:
+        return out
+
+    deltas = np.diff(values, axis=0)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+
+    alpha = 1.0 / period
+    avg_gain = np.empty((n - period, values.shape[1]))
+    avg_loss = np.empty((n - period, values.shape[1]))
+    avg_gain[0] = _column_means(gains[:period])
+    avg_loss[0] = _column_means(losses[:period])
+    avg_gain[1:] = _smooth(gains[period:], alpha, avg_gain[0])
+    avg_loss[1:] = _smooth(losses[period:], alpha, avg_loss[0])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi_vals = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    out[period:] = np.where(avg_loss == 0, 100.0, rsi_vals)
+    return out
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """Simple Moving Average - NaN إذا احتوت النافذة على NaN"""
+    values = _columns(values)
+    if values.shape[0] < period:
+        return _empty(values)
+    return _columns(pd.DataFrame(values).rolling(window=period, min_periods=period).mean().to_numpy())
+
+
+def wma(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Weighted Moving Average بالأوزان 1..period - نفس np.convolve في indicator_kernels لكل عمود
+    (np.dot على النوافذ يجمع بترتيب مختلف → فرق ~1e-14 يقلب التقريب عند منتصف الخانة الرابعة)
+    """
+    values = _columns(values)
+    out = _empty(values)
+    if values.shape[0] < period:
+        return out
+    weights = np.arange(1, period + 1, dtype=np.float64)
+    for j in range(values.shape[1]):
+        out[period - 1:, j] = np.convolve(values[:, j], weights[::-1], mode='valid') / weights.sum()
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Exponential Moving Average مطابق لـ TradingView لكل عمود:
+    - البداية = SMA لأول نافذة كاملة بدون NaN (تختلف من سهم لآخر)
+    - القيم NaN بعد البداية تُخرج NaN ولا تعيد ضبط الحالة:
+      القيم الصالحة بعد البداية تُرص في أول العمود، يُطبق المرشح، ثم تعود إلى مواضعها
+    """
+    values = _columns(values)
+    n, width = values.shape
+    out = _empty(values)
+    if n < period:
+        return out
+
+    valid = ~np.isnan(values)
+    # عدد القيم الصالحة في النافذة المنتهية عند كل صف
+    counts = np.cumsum(valid, axis=0)
+    window_counts = counts[period - 1:].copy()
+    window_counts[1:] -= counts[:n - period]
+    full = window_counts == period
+    cols = np.flatnonzero(full.any(axis=0))
+    if len(cols) == 0:
+        return out
+
+    start = full[:, cols].argmax(axis=0) + period - 1
+    window = values[start[None, :] + np.arange(1 - period, 1)[:, None], cols[None, :]]
+    seed = _column_means(window)
+    out[start, cols] = seed
+
+    rest = valid[:, cols] & (np.arange(n)[:, None] > start[None, :])
+    rank = np.cumsum(rest, axis=0) - 1
+    rows, j = np.nonzero(rest)
+    packed = np.full((n, len(cols)), np.nan, order='F')
+    packed[rank[rows, j], j] = values[rows, cols[j]]
+    smoothed = _smooth(packed, 2.0 / (period + 1.0), seed)
+    out[rows, cols[j]] = smoothed[rank[rows, j], j]
+    return out
+
+
+def cci(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """CCI مطابق لـ Pine Script: (tp - sma(tp)) / (0.015 * mean(abs(tp - sma(tp))))"""
+    closes = _columns(closes)
+    out = _empty(closes)
+    if closes.shape[0] < period:
+        return out
+
+    tp = _columns((_columns(highs) + _columns(lows) + closes) / 3)
+    windows = sliding_window_view(tp, period, axis=0)
+    sma_tp = windows.mean(axis=-1)
+    mean_dev = np.abs(windows - sma_tp[..., None]).mean(axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cci_vals = (tp[period - 1:] - sma_tp) / (0.015 * mean_dev)
+    out[period - 1:] = np.where(mean_dev == 0, 0.0, cci_vals)
+    return out
+
+
+def aroon(highs: np.ndarray, lows: np.ndarray, period: int = 25) -> Tuple[np.ndarray, np.ndarray]:
+    """Aroon Up/Down على نافذة period + 1 شمعة - عند التساوي أحدث ظهور"""
+    highs, lows = _columns(highs), _columns(lows)
+    up, down = _empty(highs), _empty(highs)
+    if highs.shape[0] <= period:
+        return up, down
+
+    windows_high = sliding_window_view(highs, period + 1, axis=0)[..., ::-1]
+    windows_low = sliding_window_view(lows, period + 1, axis=0)[..., ::-1]
+    days_since_high = np.argmax(windows_high, axis=-1)
+    days_since_low = np.argmin(windows_low, axis=-1)
+
+    has_nan = np.isnan(windows_high).any(axis=-1) | np.isnan(windows_low).any(axis=-1)
+    up[period:] = np.where(has_nan, np.nan, 100.0 * (period - days_since_high) / period)
+    down[period:] = np.where(has_nan, np.nan, 100.0 * (period - days_since_low) / period)
+    return up, down
@@ -50,6 +50,26 @@ class IndicatorsDataService:
         df['high'] = df['high'].apply(convert_to_float)
         df['low'] = df['low'].apply(convert_to_float)
         df['close'] = df['close'].apply(convert_to_float)
+        return IndicatorsDataService._clean_price_dataframe(df)
+
+    @staticmethod
+    def prepare_price_arrays(dates: np.ndarray, opens: np.ndarray, highs: np.ndarray,
+                             lows: np.ndarray, closes: np.ndarray) -> Optional[pd.DataFrame]:
+        """نفس prepare_price_dataframe من مصفوفات float64 (NaN = None) - مقاطع الذاكرة المشتركة بدون صفوف Python"""
+        if len(dates) < 100:
+            return None
+
+        df = pd.DataFrame({
+            'date': pd.to_datetime(dates),
+            'open': np.asarray(opens, dtype=np.float64),
+            'high': np.asarray(highs, dtype=np.float64),
+            'low': np.asarray(lows, dtype=np.float64),
+            'close': np.asarray(closes, dtype=np.float64),
+        })
+        return IndicatorsDataService._clean_price_dataframe(df)
+
+    @staticmethod
+    def _clean_price_dataframe(df: pd.DataFrame) -> Optional[pd.DataFrame]:
         df.dropna(subset=['close'], inplace=True)
         df.set_index('date', inplace=True)
         df.sort_index(inplace=True)
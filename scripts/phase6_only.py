@@ -112,6 +112,10 @@ def phase_6_stock_indicators_only(target_date_str=None):
             final_count = result.fetchone()[0]
             logger.info(f"\n✅ Final verification: {final_count} records saved for {market_date}")
             
+            # الـ screeners تقرأ من screener_snapshot - تحديثه بعد كتابة stock_indicators
+            from app.services.screener_snapshot import refresh_screener_snapshot
+            refresh_screener_snapshot(db)
+            
             return True
             
         except Exception as e:
@@ -0,0 +1,36 @@
+"""
+Refresh the Screener Snapshot
+إعادة بناء جدول screener_snapshot من آخر تاريخ في stock_indicators
+(يعمل تلقائياً في نهاية الـ pipeline الليلي - هذا السكريبت للتشغيل اليدوي)
+"""
+import sys
+import logging
+import argparse
+from datetime import date
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.core.database import SessionLocal
+from app.services.screener_snapshot import refresh_screener_snapshot
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh the screener_snapshot table')
+    parser.add_argument('--date', type=str, help='Snapshot date (YYYY-MM-DD), defaults to latest stock_indicators date')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        target_date = date.fromisoformat(args.date) if args.date else None
+        refresh_screener_snapshot(db, target_date)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Shared Frame - إطار طويل مرتب (symbol, date) في multiprocessing.shared_memory لعمليات ProcessPoolExecutor
+بدلاً من pickle لـ DataFrame أو قوائم صفوف مع كل مهمة
+
+- الناشر (العملية الرئيسية) ينسخ التواريخ (datetime64[ns]) والأعمدة (float64) مرة واحدة في كتلة مشتركة
+- كل عامل يرتبط بها مرة واحدة (initializer) ويقرأ مقاطع الأسهم كـ views على نفس الذاكرة
+- المهمة = نطاق أسهم [start, stop) → رسالة pickle ببضعة أعداد
+- النتيجة تعود كتلة مضغوطة (pack_frame / pack_records): مصفوفات float64 و bool بدلاً من قواميس لكل صف
+  (float64 وليس float32: القيم تُحفظ بأربع خانات عشرية وfloat32 يغيرها)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from scripts.grouped_rolling import GroupedRolling
+
+
+class SharedFrame:
+    """
+    التخطيط: [dates: rows × int64][values: rows × columns float64 بترتيب Fortran → كل عمود متجاور]
+    handle: قاموس صغير قابل للـ pickle (اسم الكتلة، الأعمدة، الأسهم وحدود مقاطعها)
+    """
+
+    def __init__(self, handle: Dict[str, Any], shm: SharedMemory, owner: bool = False):
+        self.handle = handle
+        self.symbols: List[str] = handle['symbols']
+        self.bounds = np.asarray(handle['bounds'], dtype=np.int64)
+        self._shm = shm
+        self._owner = owner
+
+        rows = handle['rows']
+        self.dates = np.ndarray((rows,), dtype='datetime64[ns]', buffer=shm.buf)
+        self.values = np.ndarray(
+            (rows, len(handle['columns'])), dtype=np.float64, buffer=shm.buf, offset=rows * 8, order='F'
+        )
+        self.columns = {name: self.values[:, j] for j, name in enumerate(handle['columns'])}
+
+    @classmethod
+    def publish(cls, df: pd.DataFrame, columns: Sequence[str]) -> 'SharedFrame':
+        """نسخ df (مرتب symbol, date) إلى ذاكرة مشتركة جديدة - المالك يحررها عند close()"""
+        rows = len(df)
+        shm = SharedMemory(create=True, size=max(1, rows * 8 * (1 + len(columns))))
+        symbols = df['symbol'].to_numpy()
+        starts = GroupedRolling(symbols).starts
+        handle = {
+            'name': shm.name,
+            'rows': rows,
+            'columns': list(columns),
+            'symbols': [str(s) for s in symbols[starts]],
+            'bounds': np.append(starts, rows).tolist(),
+        }
+        frame = cls(handle, shm, owner=True)
+        frame.dates[:] = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[ns]')
+        for name in columns:
+            frame.columns[name][:] = df[name].to_numpy(dtype=np.float64)
+        return frame
+
+    @classmethod
+    def attach(cls, handle: Dict[str, Any]) -> 'SharedFrame':
+        return cls(handle, SharedMemory(name=handle['name']))
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __enter__(self) -> 'SharedFrame':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # الـ views يجب أن تُحذف قبل إغلاق الذاكرة
+        self.dates = self.values = self.columns = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def segment(self, i: int) -> slice:
+        """صفوف السهم رقم i"""
+        return slice(int(self.bounds[i]), int(self.bounds[i + 1]))
+
+    def frame(self, start: int, stop: int, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        الأسهم [start, stop) كـ DataFrame (symbol, date, columns...) - نسخة محلية من الـ views
+        الـ index = موضع الصف في الإطار المنشور (لربط النتائج بصفوف الناشر)
+        """
+        lo, hi = int(self.bounds[start]), int(self.bounds[stop])
+        data = {
+            'symbol': np.repeat(np.asarray(self.symbols[start:stop], dtype=object), np.diff(self.bounds[start:stop + 1])),
+            'date': self.dates[lo:hi].copy(),
+        }
+        for name in columns if columns is not None else self.handle['columns']:
+            data[name] = self.columns[name][lo:hi].copy()
+        return pd.DataFrame(data, index=pd.RangeIndex(lo, hi))
+
+
+# ---------------------------------------------------------------------- #
+# تشغيل المهام
+# ---------------------------------------------------------------------- #
+_shared: Optional[SharedFrame] = None
+
+
+def _attach(handle: Dict[str, Any]):
+    """initializer لكل عامل: ارتباط واحد بالذاكرة المشتركة طوال عمر العملية"""
+    global _shared
+    _shared = SharedFrame.attach(handle)
+
+
+def _run_chunk(func: Callable, start: int, stop: int, args: tuple):
+    return func(_shared, start, stop, *args)
+
+
+def resolve_workers(max_workers: Optional[int] = None) -> int:
+    """None → settings.INDICATOR_WORKERS، و 0 = كل الأنوية"""
+    if max_workers is None:
+        max_workers = settings.INDICATOR_WORKERS
+    return max(1, max_workers or os.cpu_count() or 1)
+
+
+def symbol_chunks(n_symbols: int, max_workers: int, chunk_size: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    نطاقات [start, stop) من chunk_size سهماً (None → settings.INDICATOR_CHUNK_SYMBOLS)
+    التلقائي: 4 مهام لكل عملية → توازن الحمل بين الأسهم الطويلة والقصيرة التاريخ
+    """
+    chunk_size = chunk_size or settings.INDICATOR_CHUNK_SYMBOLS or max(1, n_symbols // (max_workers * 4))
+    return [(start, min(start + chunk_size, n_symbols)) for start in range(0, n_symbols, chunk_size)]
+
+
+def map_symbol_chunks(
+    func: Callable,
+    frame: SharedFrame,
+    max_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    args: tuple = (),
+) -> Iterator[Tuple[int, int, Any, Optional[Exception]]]:
+    """
+    func(frame, start, stop, *args) لكل نطاق أسهم → (start, stop, result, error) بترتيب الانتهاء
+    func يجب أن تكون دالة على مستوى module (تُرسل بالـ pickle مع كل مهمة، أما البيانات فلا)
+    عملية واحدة → بدون pool على نفس الإطار
+    """
+    max_workers = resolve_workers(max_workers)
+    chunks = symbol_chunks(len(frame), max_workers, chunk_size)
+    max_workers = min(max_workers, len(chunks)) or 1
+
+    if max_workers == 1:
+        for start, stop in chunks:
+            try:
+                yield start, stop, func(frame, start, stop, *args), None
+            except Exception as e:
+                yield start, stop, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_attach, initargs=(frame.handle,)) as executor:
+        futures = {
+            executor.submit(_run_chunk, func, start, stop, args): (start, stop)
+            for start, stop in chunks
+        }
+        for future in as_completed(futures):
+            start, stop = futures[future]
+            try:
+                yield start, stop, future.result(), None
+            except Exception as e:
+                yield start, stop, None, e
+
+
+# ---------------------------------------------------------------------- #
+# نتائج مضغوطة
+# ---------------------------------------------------------------------- #
+def pack_frame(frame: pd.DataFrame, skip: Sequence[str] = ()) -> Dict[str, Any]:
+    """
+    DataFrame نتائج → index (int64) + كتلة float64 + كتلة bool
+    أعمدة skip لا تُرسل (يعيد المستدعي بناءها من index)؛ الأعمدة الأخرى تبقى مصفوفات كما هي
+    """
+    columns = [c for c in frame.columns if c not in skip]
+    float_columns = [c for c in columns if frame[c].dtype == np.float64]
+    bool_columns = [c for c in columns if frame[c].dtype == bool]
+    typed = set(float_columns) | set(bool_columns)
+    return {
+        'index': frame.index.to_numpy(dtype=np.int64),
+        'columns': columns,
+        'float_columns': float_columns,
+        'floats': frame[float_columns].to_numpy(dtype=np.float64),
+        'bool_columns': bool_columns,
+        'bools': frame[bool_columns].to_numpy(dtype=bool),
+        'others': {c: frame[c].to_numpy() for c in columns if c not in typed},
+    }
+
+
+def unpack_frame(packed: Dict[str, Any], head: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """عكس pack_frame - أعمدة head (مثل symbol, date) أولاً ثم الأعمدة بترتيبها الأصلي"""
+    data = {} if head is None else {c: head[c].to_numpy() for c in head.columns}
+    floats = dict(zip(packed['float_columns'], packed['floats'].T))
+    bools = dict(zip(packed['bool_columns'], packed['bools'].T))
+    for name in packed['columns']:
+        if name in floats:
+            data[name] = floats[name]
+        elif name in bools:
+            data[name] = bools[name]
+        else:
+            data[name] = packed['others'][name]
+    return pd.DataFrame(data)
+
+
+_KINDS = {float: 'float', int: 'int', bool: 'bool'}
+
+
+def pack_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    قواميس نتائج (float / int / bool / None) → مصفوفة float64 (سجل × مفتاح، NaN = None) + نوع كل مفتاح
+    المفاتيح بأنواع أخرى أو مختلطة أو غير موجودة في كل السجلات تبقى قيماً عادية في extras
+    """
+    keys = list(dict.fromkeys(key for record in records for key in record))
+    kinds = {}
+    for key in keys:
+        types = {type(r[key]) for r in records if key in r and r[key] is not None}
+        complete = all(key in r for r in records)
+        if complete and not types:
+            kinds[key] = 'float'
+        elif complete and len(types) == 1 and next(iter(types)) in _KINDS:
+            kinds[key] = _KINDS[next(iter(types))]
+
+    numeric = [key for key in keys if key in kinds]
+    values = np.array(
+        [[np.nan if r[key] is None else r[key] for key in numeric] for r in records],
+        dtype=np.float64,
+    ).reshape(len(records), len(numeric))
+    return {
+        'keys': keys,
+        'numeric': numeric,
+        'kinds': [kinds[key] for key in numeric],
+        'values': values,
+        'extras': [{key: r[key] for key in keys if key not in kinds and key in r} for r in records],
+    }
+
+
+def unpack_records(packed: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """عكس pack_records - نفس القواميس بنفس ترتيب المفاتيح"""
+    casts = {'float': float, 'int': int, 'bool': bool}
+    numeric = list(zip(packed['numeric'], (casts[kind] for kind in packed['kinds'])))
+    records = []
+    for row, extras in zip(packed['values'].tolist(), packed['extras']):
+        # value != value → NaN (= None)
+        values = {key: None if value != value else cast(value) for (key, cast), value in zip(numeric, row)}
+        values.update(extras)
+        records.append({key: values[key] for key in packed['keys'] if key in values})
+    return records